@@ -1,5 +1,79 @@
-from django.contrib import admin
-from .models import Role, Merchant, Category, Deal, DealCategory, Coupon
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from . import archive, expiry
+from . import search as search_index
+from .models import Role, Merchant, Category, Deal, DealArchive, DealCategory, Coupon
+
+# Дальше этого числа строки отфильтрованного списка не считаются
+COUNT_CAP = 10000
+# Сколько акций из полнотекстового индекса берёт поиск в админке
+SEARCH_LIMIT = 1000
+
+
+class CappedCountPaginator(Paginator):
+    """Пагинатор без точного COUNT(*) по большим таблицам.
+
+    Считается не больше COUNT_CAP строк. Если их больше и фильтров нет,
+    число оценивается по MAX(id) (один шаг по индексу). После удаления и
+    архивации оценка выше настоящего числа, и последние страницы пусты.
+    """
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        count = qs.order_by()[:COUNT_CAP].count()
+        if count < COUNT_CAP or qs.query.where:
+            return count
+        return max(count, qs.model._default_manager.aggregate(n=Max("pk"))["n"] or 0)
+
+
+class AutocompleteFilter(admin.RelatedFieldListFilter):
+    """Фильтр по внешнему ключу с поиском, как в autocomplete_fields.
+
+    RelatedFieldListFilter выводит в боковой панели все объекты связанной
+    модели; этот запрашивает только выбранный. У админки связанной модели
+    должны быть search_fields.
+    """
+
+    template = "admin/discounts/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.admin_site = model_admin.admin_site
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def field_choices(self, field, request, model_admin):
+        return []
+
+    def has_output(self):
+        return True
+
+    def widget(self):
+        formfield = forms.ModelChoiceField(
+            queryset=self.field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(self.field, self.admin_site),
+            required=False,
+        )
+        value = self.lookup_val[-1] if self.lookup_val else None
+        return formfield.widget.render(self.lookup_kwarg, value, attrs={"data-autocomplete-filter": ""})
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Списки для таблиц на миллионы строк: без точных счётчиков и списков всех связанных объектов"""
+
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        autocomplete = AutocompleteSelect(Deal._meta.get_field("merchant"), self.admin_site).media
+        return super().media + autocomplete + forms.Media(js=["js/admin_filters.js"])
 
 
 @admin.register(Role)
@@ -14,10 +88,12 @@ class DealCategoryInline(admin.TabularInline):
 
 
 @admin.register(Merchant)
-class MerchantAdmin(admin.ModelAdmin):
+class MerchantAdmin(LargeTableAdmin):
     list_display = ("id", "name", "contact", "user")
+    list_select_related = ("user",)
+    ordering = ("name",)
     search_fields = ("name", "contact")
-    list_filter = ("user",)
+    list_filter = (("user", AutocompleteFilter),)
     raw_id_fields = ("user",)
 
 
@@ -27,27 +103,94 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ("name",)
 
 
+def _fts_deal_ids(term):
+    return [pk for pk, _ in search_index.search(term, search_index.KIND_DEAL, SEARCH_LIMIT)]
+
+
 @admin.register(Deal)
-class DealAdmin(admin.ModelAdmin):
+class DealAdmin(LargeTableAdmin):
     list_display = ("id", "title", "merchant", "price_original", "price_discount", "get_discount_percent", "created_at")
-    list_filter = ("merchant", "created_at")
+    list_select_related = ("merchant",)
+    list_filter = (("merchant", AutocompleteFilter), "is_archived", "created_at")
     inlines = [DealCategoryInline]
-    date_hierarchy = "created_at"
     search_fields = ("title",)
-    raw_id_fields = ("merchant",)
+    search_help_text = "Поиск по полнотекстовому индексу (название, описание, партнёр, категории) или id"
+    raw_id_fields = ("merchant", "favorited_by")
     readonly_fields = ("created_at",)
-    fields = ("title", "merchant", "price_original", "price_discount", "starts_at", "expires_at", "image_url", "description", "favorited_by",)
+    fields = ("title", "merchant", "price_original", "price_discount", "starts_at", "expires_at", "is_archived", "image_url", "description", "favorited_by",)
+
+    def save_model(self, request, obj, form, change):
+        # Флаг, выставленный вручную, не трогаем
+        if "expires_at" in form.changed_data and "is_archived" not in form.changed_data:
+            expiry.reopen(obj)
+        super().save_model(request, obj, form, change)
 
-    @admin.display(description="Скидка (%)")
+    @admin.display(description="Скидка (%)", ordering="discount_pct")
     def get_discount_percent(self, obj):
-        return obj.discount_percent()
+        return obj.discount_pct
+
+    def get_search_results(self, request, queryset, search_term):
+        """Через FTS5 вместо LIKE '%...%' по всей таблице; используется и автодополнением"""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        q = Q(pk__in=_fts_deal_ids(term))
+        # isdecimal, а не isdigit: int("²") падает
+        if term.isdecimal():
+            q |= Q(pk=int(term))
+        return queryset.filter(q), False
 
 
 @admin.register(Coupon)
-class CouponAdmin(admin.ModelAdmin):
+class CouponAdmin(LargeTableAdmin):
     list_display = ("code", "id", "user", "deal", "status", "issued_at", "redeemed_at")
-    list_filter = ("status", "issued_at", "redeemed_at",)
-    date_hierarchy = "issued_at"
+    list_select_related = ("user", "deal")
+    list_filter = ("status", ("deal", AutocompleteFilter), ("user", AutocompleteFilter), "issued_at", "redeemed_at",)
     search_fields = ("code", "user__username", "deal__title",)
+    search_help_text = "Начало кода купона, точное имя пользователя или слова из названия акции"
     raw_id_fields = ("user", "deal",)
-    readonly_fields = ("issued_at",)
\ No newline at end of file
+    readonly_fields = ("issued_at", "updated_at")
+
+    def save_model(self, request, obj, form, change):
+        # Правка статуса в админке тоже должна попасть в выгрузку с since
+        obj.updated_at = timezone.now()
+        super().save_model(request, obj, form, change)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Каждое условие идёт по своему индексу, без JOIN и LIKE '%...%'"""
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        code = term.upper()
+        # Диапазон по уникальному индексу вместо LIKE 'ABC%', который в SQLite индекс не использует
+        q = Q(code__gte=code, code__lt=code + "\uffff")
+        q |= Q(user__in=get_user_model().objects.filter(username=term).values("pk"))
+        q |= Q(deal_id__in=_fts_deal_ids(term))
+        return queryset.filter(q), False
+
+
+@admin.register(DealArchive)
+class DealArchiveAdmin(admin.ModelAdmin):
+    list_display = ("id", "title", "merchant", "expires_at", "archived_at")
+    list_select_related = ("merchant",)
+    date_hierarchy = "archived_at"
+    search_fields = ("title",)
+    raw_id_fields = ("merchant",)
+    actions = ("restore_deals",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description="Вернуть из архива")
+    def restore_deals(self, request, queryset):
+        stats = archive.restore(queryset.values_list("pk", flat=True))
+        self.message_user(request, f"Возвращено акций: {stats['deals']}")
+        if stats["skipped"]:
+            self.message_user(
+                request,
+                f"Фид уже создал эти акции заново, они остались в архиве: {', '.join(map(str, stats['skipped']))}",
+                messages.WARNING,
+            )
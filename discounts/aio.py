@@ -0,0 +1,18 @@
+"""Помощники для асинхронных view"""
+from asgiref.sync import sync_to_async
+
+
+async def alist(queryset):
+    """list(queryset) через асинхронный интерфейс ORM"""
+    return [obj async for obj in queryset]
+
+
+def in_thread(func, *args):
+    """Синхронный вызов в отдельном потоке со своим соединением с БД.
+
+    Асинхронный ORM выполняет все запросы в одном общем потоке, поэтому
+    через asyncio.gather они идут по очереди. Независимые чтения вроде
+    запросов к FTS-индексу так действительно выполняются одновременно.
+    Соединения этих потоков не закрываются в конце запроса и переиспользуются.
+    """
+    return sync_to_async(func, thread_sensitive=False)(*args)
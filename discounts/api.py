@@ -0,0 +1,87 @@
+"""Данные JSON API акций: выбор полей, сериализация через values() и ETag.
+
+ETag и Last-Modified списка считаются по странице ключей
+(id, created_at, updated_at), а не по всему отбору: повторный запрос без
+изменений стоит одной короткой выборки по индексу, а поля акций не читаются.
+"""
+import hashlib
+
+from django.utils import timezone
+
+from .models import Deal, DealCategory
+
+# Поле API → поле для values()
+FIELDS = {
+    "id": "id",
+    "title": "title",
+    "merchant": None,
+    "price_original": "price_original",
+    "price_discount": "price_discount",
+    "discount_pct": "discount_pct",
+    "starts_at": "starts_at",
+    "expires_at": "expires_at",
+    "image_url": "image_url",
+    "description": "description",
+    "categories": None,
+    "is_archived": "is_archived",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+# В списках описание по умолчанию не отдаётся
+LIST_FIELDS = [f for f in FIELDS if f != "description"]
+DETAIL_FIELDS = list(FIELDS)
+
+
+def parse_fields(value, default):
+    """?fields=id,title,... → список полей; None, если есть неизвестные"""
+    if not value:
+        return default
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    if any(f not in FIELDS for f in fields):
+        return None
+    return ["id"] + [f for f in dict.fromkeys(fields) if f != "id"]
+
+
+def etag(*parts):
+    """Сильный ETag: тело ответа однозначно определяется parts"""
+    raw = "|".join(p.isoformat() if hasattr(p, "isoformat") else str(p) for p in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def serialize(queryset, fields):
+    """Список dict с выбранными полями; queryset задаёт отбор и порядок"""
+    columns = [FIELDS[f] for f in fields if FIELDS[f]]
+    if "merchant" in fields:
+        columns += ["merchant_id", "merchant__name"]
+    rows = list(queryset.values(*columns))
+
+    categories = {}
+    if "categories" in fields and rows:
+        links = (
+            DealCategory.objects.filter(deal_id__in=[r["id"] for r in rows])
+            .order_by("category__name")
+            .values_list("deal_id", "category_id", "category__name")
+        )
+        for deal_id, category_id, name in links:
+            categories.setdefault(deal_id, []).append({"id": category_id, "name": name})
+
+    result = []
+    for row in rows:
+        item = {}
+        for field in fields:
+            if field == "merchant":
+                item["merchant"] = {"id": row["merchant_id"], "name": row["merchant__name"]}
+            elif field == "categories":
+                item["categories"] = categories.get(row["id"], [])
+            else:
+                item[field] = row[FIELDS[field]]
+        result.append(item)
+    return result
+
+
+def touch(deal_ids):
+    """Отметить акции изменёнными, когда меняются связанные с ними данные.
+
+    deal_ids — список id или queryset с values_list("pk").
+    """
+    Deal.objects.filter(pk__in=deal_ids).update(updated_at=timezone.now())
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 class DiscountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'discounts'
-    verbose_name = "Discounts"
\ No newline at end of file
+    verbose_name = "Discounts"
+
+    def ready(self):
+        # instrumentation — до первого соединения, чтобы обёртка запросов попала на все
+        from . import db, instrumentation, signals  # noqa: F401
@@ -0,0 +1,163 @@
+"""Холодное хранение: давно закончившиеся акции переносятся из Deal в DealArchive.
+
+Deal остаётся маленьким, и запросы списков не читают мёртвые строки.
+Акция уходит в архив вместе с категориями, избранным и купонами
+(в DealArchive.related), а restore() возвращает её с тем же id.
+"""
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, search, suggest
+from .batch import refresh_derived
+from .caching import invalidate_home
+from .favorites import Favorite
+from .models import Category, Coupon, Deal, DealArchive, DealCategory, SimilarDeal
+
+CHUNK_SIZE = 500
+# Через сколько после окончания акция уходит из Deal
+ARCHIVE_AFTER = timedelta(days=90)
+
+# Поля, которые переносятся между Deal и DealArchive как есть
+FIELDS = (
+    "id", "title", "merchant_id", "price_original", "price_discount", "starts_at", "expires_at",
+    "created_at", "image_url", "image_hash", "image_source", "description", "external_id",
+)
+COUPON_FIELDS = ("code", "user_id", "status", "issued_at", "redeemed_at")
+
+
+def _related(deal_ids):
+    related = defaultdict(lambda: {"categories": [], "favorited_by": [], "coupons": []})
+    for deal_id, category_id in DealCategory.objects.filter(deal_id__in=deal_ids).values_list("deal_id", "category_id"):
+        related[deal_id]["categories"].append(category_id)
+    for deal_id, user_id in Favorite.objects.filter(deal_id__in=deal_ids).values_list("deal_id", "user_id"):
+        related[deal_id]["favorited_by"].append(user_id)
+    for row in Coupon.objects.filter(deal_id__in=deal_ids).values("deal_id", *COUPON_FIELDS):
+        # isoformat сам: DjangoJSONEncoder обрезал бы микросекунды
+        for field in ("issued_at", "redeemed_at"):
+            row[field] = row[field] and row[field].isoformat()
+        related[row.pop("deal_id")]["coupons"].append(row)
+    return related
+
+
+def _move(deal_ids):
+    """Переносит порцию акций; возвращает id их категорий"""
+    related = _related(deal_ids)
+    DealArchive.objects.bulk_create(
+        DealArchive(updated_at=row.pop("updated_at"), favorites_count=row.pop("favorites_count"),
+                    related=related[row["id"]], **row)
+        for row in Deal.objects.filter(pk__in=deal_ids).values(*FIELDS, "updated_at", "favorites_count")
+    )
+    # Без сигналов post_delete на каждую строку: индекс и счётчики
+    # обновляются один раз на порцию
+    for qs in (
+        DealCategory.objects.filter(deal_id__in=deal_ids),
+        Favorite.objects.filter(deal_id__in=deal_ids),
+        Coupon.objects.filter(deal_id__in=deal_ids),
+        # Соседей build_similar не архивируем: их посчитает следующий запуск
+        SimilarDeal.objects.filter(Q(deal_id__in=deal_ids) | Q(similar_id__in=deal_ids)),
+        Deal.objects.filter(pk__in=deal_ids),
+    ):
+        qs._raw_delete(qs.db)
+    search.index_deals(deal_ids)
+    suggest.refresh_deals(deal_ids)
+    return {category_id for r in related.values() for category_id in r["categories"]}
+
+
+def archive(before=None, chunk_size=CHUNK_SIZE):
+    """Переносит в DealArchive архивные акции, закончившиеся до before.
+
+    По умолчанию before — ARCHIVE_AFTER назад. Каждая порция — отдельная
+    транзакция. Возвращает словарь со статистикой.
+    """
+    before = before or timezone.now() - ARCHIVE_AFTER
+    stats = {"deals": 0, "seconds": 0.0}
+    started = time.monotonic()
+    category_ids = set()
+    while True:
+        deal_ids = list(
+            Deal.objects.filter(is_archived=True, expires_at__lte=before)
+            .order_by("pk").values_list("pk", flat=True)[:chunk_size]
+        )
+        if not deal_ids:
+            break
+        with transaction.atomic():
+            category_ids |= _move(deal_ids)
+        stats["deals"] += len(deal_ids)
+    if stats["deals"]:
+        counters.recount(category_ids)
+        invalidate_home()
+    stats["seconds"] = time.monotonic() - started
+    return stats
+
+
+def restore(deal_ids):
+    """Возвращает акции из DealArchive в Deal с прежними id.
+
+    Связи с удалёнными с тех пор категориями и пользователями пропускаются,
+    как и купоны, чей код успели выдать заново. Акции, которые фид за это
+    время создал заново с тем же (партнёр, external_id), остаются в архиве.
+    Возвращает {"deals": сколько возвращено, "skipped": id оставшихся в архиве}.
+    """
+    archived = list(DealArchive.objects.filter(pk__in=deal_ids))
+    with_ids = [a for a in archived if a.external_id]
+    taken = set(
+        Deal.objects.filter(
+            merchant_id__in={a.merchant_id for a in with_ids},
+            external_id__in={a.external_id for a in with_ids},
+        ).values_list("merchant_id", "external_id")
+    ) if with_ids else set()
+    skipped = sorted(a.pk for a in archived if (a.merchant_id, a.external_id) in taken)
+    archived = [a for a in archived if a.pk not in skipped]
+    if not archived:
+        return {"deals": 0, "skipped": skipped}
+    user_ids = {
+        user_id for a in archived
+        for user_id in a.related.get("favorited_by", []) + [c["user_id"] for c in a.related.get("coupons", [])]
+    }
+    users = set(get_user_model().objects.filter(pk__in=user_ids).values_list("pk", flat=True))
+    categories = set(
+        Category.objects.filter(pk__in={c for a in archived for c in a.related.get("categories", [])})
+        .values_list("pk", flat=True)
+    )
+
+    deals, links, favorites, coupons = [], [], [], []
+    for a in archived:
+        fans = [u for u in a.related.get("favorited_by", []) if u in users]
+        deals.append(Deal(
+            **{field: getattr(a, field) for field in FIELDS},
+            is_archived=True, favorites_count=len(fans),
+        ))
+        links += [DealCategory(deal_id=a.pk, category_id=c) for c in a.related.get("categories", []) if c in categories]
+        favorites += [Favorite(deal_id=a.pk, user_id=u) for u in fans]
+        coupons += [
+            Coupon(deal_id=a.pk, **{**c, "issued_at": parse_datetime(c["issued_at"]),
+                                    "redeemed_at": c["redeemed_at"] and parse_datetime(c["redeemed_at"])})
+            for c in a.related.get("coupons", [])
+            if c["user_id"] is None or c["user_id"] in users
+        ]
+
+    # bulk_create проставляет auto_now_add заново — исходные даты возвращаются следом
+    created = {d.pk: d.created_at for d in deals}
+    issued = {c.code: c.issued_at for c in coupons}
+    with transaction.atomic():
+        Deal.objects.bulk_create(deals)
+        for deal in deals:
+            deal.created_at = created[deal.pk]
+        Deal.objects.bulk_update(deals, ["created_at"])
+        DealCategory.objects.bulk_create(links)
+        Favorite.objects.bulk_create(favorites)
+        Coupon.objects.bulk_create(coupons, ignore_conflicts=True)
+        restored = list(Coupon.objects.filter(code__in=issued, deal_id__in=created))
+        for coupon in restored:
+            coupon.issued_at = issued[coupon.code]
+        Coupon.objects.bulk_update(restored, ["issued_at"])
+        DealArchive.objects.filter(pk__in=created).delete()
+    refresh_derived(created)
+    return {"deals": len(deals), "skipped": skipped}
@@ -0,0 +1,142 @@
+"""Сборка статики: бандлы CSS/JS на страницу, минификация, хэши в именах, .gz/.br.
+
+Всё делает collectstatic через BundleManifestStorage: бандлы из
+settings.ASSET_BUNDLES собираются в bundles/, затем Django
+(ManifestStaticFilesStorage) добавляет хэш содержимого в имена файлов,
+а рядом с каждым CSS/JS кладутся заранее сжатые копии. Файлы с хэшем
+можно отдавать с Cache-Control: max-age=31536000, immutable.
+"""
+import gzip
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+BUNDLE_DIR = "bundles"
+COMPRESSIBLE = (".css", ".js", ".svg", ".json")
+
+
+def bundles():
+    return getattr(settings, "ASSET_BUNDLES", {})
+
+
+def bundle_path(name):
+    # bundles/ на той же глубине, что css/ и js/, поэтому относительные url() не ломаются
+    return f"{BUNDLE_DIR}/{name}"
+
+
+# Строка в кавычках, комментарий, пробелы, знак без пробелов вокруг, остальное
+CSS_TOKENS = re.compile(
+    r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)|(\s+)|([{}:;,>])|([^"'/\s{}:;,>]+|.)""",
+    re.S,
+)
+STRING, COMMENT, SPACE, PUNCT = 1, 2, 3, 4
+
+
+def minify_css(text):
+    """Убирает комментарии и лишние пробелы; строки в кавычках не трогает.
+
+    Пробелы у «:» убираются только в объявлениях внутри {}: в селекторе
+    «a :hover» и «a:hover» значат разное.
+    """
+    tokens = [(m.lastindex, m.group()) for m in CSS_TOKENS.finditer(text)]
+    # Какой из знаков { ; } идёт после каждого токена: перед { двоеточие из селектора
+    following, closing = [None] * len(tokens), None
+    for i in range(len(tokens) - 1, -1, -1):
+        kind, value = tokens[i]
+        if kind == PUNCT and value in "{;}":
+            closing = value
+        following[i] = closing
+
+    out, space, tight_before, depth = [], False, True, 0
+    for i, (kind, value) in enumerate(tokens):
+        if kind == COMMENT:
+            continue
+        if kind == SPACE:
+            space = True
+            continue
+        tight = kind == PUNCT and (value != ":" or (depth > 0 and following[i] != "{"))
+        if space and not tight and not tight_before:
+            out.append(" ")
+        if value == "}" and out and out[-1] == ";":
+            out.pop()
+        out.append(value)
+        space, tight_before = False, tight
+        if kind == PUNCT:
+            depth += {"{": 1, "}": -1}.get(value, 0)
+    return "".join(out) + "\n"
+
+
+def minify_js(text):
+    """rjsmin, если установлен; иначе только отступы, пустые строки и строчные комментарии"""
+    if rjsmin is not None:
+        return rjsmin.jsmin(text) + "\n"
+    lines = (line.strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//")) + "\n"
+
+
+def build_bundle(name, sources, open_source):
+    """Склеенное и минифицированное содержимое бандла; open_source(path) → bytes"""
+    parts = [open_source(path).decode("utf-8") for path in sources]
+    if name.endswith(".css"):
+        return "".join(minify_css(part) for part in parts)
+    # ; между файлами — на случай, если файл не заканчивается точкой с запятой
+    return ";\n".join(minify_js(part) for part in parts)
+
+
+class BundleManifestStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage, который сам собирает бандлы и сжатые копии"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for name, sources in bundles().items():
+                missing = [path for path in sources if path not in paths]
+                if missing:
+                    raise ValueError(f"Бандл {name}: нет файлов {', '.join(missing)}")
+
+                def open_source(path):
+                    storage, source = paths[path]
+                    with storage.open(source) as f:
+                        return f.read()
+
+                target = bundle_path(name)
+                content = build_bundle(name, sources, open_source)
+                if self.exists(target):
+                    self.delete(target)
+                self._save(target, ContentFile(content.encode("utf-8")))
+                paths[target] = (self, target)
+
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception) and hashed_name.endswith(COMPRESSIBLE):
+                self.compress(hashed_name)
+            yield name, hashed_name, processed
+
+    def compress(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(data)))
+        for suffix, compressed in variants:
+            if len(compressed) >= len(data):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
+
+    def stored_name(self, name):
+        # Статика ещё не собрана (разработка, тесты) — отдаём исходные имена
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
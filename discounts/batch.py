@@ -0,0 +1,115 @@
+"""Пакетное изменение акций в обход save() и сигналов"""
+import copy
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters, expiry, search, suggest
+from .caching import invalidate_home
+from .models import Deal
+
+
+def safe_decimal(value, default):
+    try:
+        return Decimal(str(value)) if str(value).strip() != "" else default
+    except Exception:
+        return default
+
+
+def parse_expires(value):
+    """Дата из <input type=date> или ISO-строка → aware datetime; иначе ValidationError"""
+    try:
+        parsed = Deal._meta.get_field("expires_at").to_python(value)
+    except (TypeError, ValueError):
+        # Число или список из JSON: to_python ждёт строку
+        raise ValidationError("Некорректная дата")
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def refresh_derived(deal_ids, dates_changed=True):
+    """То, что для одиночных изменений делают сигналы, — один раз на пачку"""
+    deal_ids = list(deal_ids)
+    if not deal_ids:
+        return
+    search.index_deals(deal_ids)
+    suggest.refresh_deals(deal_ids)
+    if dates_changed:
+        counters.recount_for_deals(deal_ids)
+    invalidate_home()
+
+
+def _changes(deal, data):
+    """Применяет data к deal по правилам update_all; возвращает изменённые поля"""
+    new = {}
+    if "title" in data:
+        if data["title"] is None:
+            raise ValidationError("Название не может быть пустым")
+        new["title"] = str(data["title"])
+    for field in ("price_original", "price_discount"):
+        if field in data:
+            new[field] = safe_decimal(data[field], getattr(deal, field))
+    if data.get("expires_at"):
+        new["expires_at"] = parse_expires(data["expires_at"])
+    for field in ("image_url", "description"):
+        if field in data:
+            new[field] = data[field]
+
+    changed = []
+    for field, value in new.items():
+        if getattr(deal, field) != value:
+            setattr(deal, field, value)
+            changed.append(field)
+    if "expires_at" in changed and expiry.reopen(deal):
+        changed.append("is_archived")
+    return changed
+
+
+def apply_updates(items):
+    """Применяет список частичных изменений [{"id": ..., поле: значение}].
+
+    Все изменения пишутся в одной транзакции через bulk_update, сгруппированные
+    по набору изменённых полей. Возвращает результат для каждого элемента.
+    """
+    results = []
+    ids = [item.get("id") for item in items if isinstance(item, dict)]
+    with transaction.atomic():
+        deals = Deal.objects.in_bulk([pk for pk in ids if isinstance(pk, int)])
+        pending = {}
+        for item in items:
+            pk = item.get("id") if isinstance(item, dict) else None
+            deal = deals.get(pk) if isinstance(pk, int) else None
+            if deal is None:
+                results.append({"id": pk, "status": "error", "message": "Акция не найдена"})
+                continue
+            # Изменения проверяются на копии: неудачный элемент не портит акцию,
+            # которую уже изменили предыдущие элементы с тем же id
+            candidate = copy.copy(deal)
+            try:
+                changed = _changes(candidate, item)
+                candidate.clean_fields(exclude=[f.name for f in Deal._meta.fields if f.name not in changed])
+            except ValidationError as e:
+                results.append({"id": pk, "status": "error", "message": "; ".join(e.messages)})
+                continue
+            deals[pk] = candidate
+            if changed:
+                pending.setdefault(pk, set()).update(changed)
+            results.append({"id": pk, "status": "ok", "changed": changed})
+
+        groups = {}
+        for pk, fields in pending.items():
+            groups.setdefault(tuple(sorted(fields)), []).append(deals[pk])
+        # bulk_update не вызывает auto_now, дату изменения ставим сами
+        now = timezone.now()
+        for fields, group in groups.items():
+            for deal in group:
+                deal.updated_at = now
+            Deal.objects.bulk_update(group, fields + ("updated_at",))
+
+    changed_ids = [deal.pk for group in groups.values() for deal in group]
+    dates_changed = any("expires_at" in fields for fields in groups)
+    refresh_derived(changed_ids, dates_changed=dates_changed)
+    return results
@@ -0,0 +1,88 @@
+"""Кэш блоков главной страницы"""
+import asyncio
+import hashlib
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .aio import alist
+from .models import Deal, Category
+
+HOME_KEY = "discounts:home"
+# Верхняя граница жизни кэша; раньше он сбрасывается сигналами
+# или когда истекает одна из акций блока «Скоро заканчиваются»
+HOME_TIMEOUT = 300
+# Страница акции: ключ меняется вместе с версией, время жизни — только верхняя граница
+DEAL_PAGE_TIMEOUT = 3600
+
+
+def _home_querysets(now):
+    """Три независимых запроса блоков: лучшие скидки, скоро заканчиваются, категории"""
+    return (
+        Deal.objects.active(now).order_by("-discount_pct", "-id")[:8],
+        Deal.objects.active(now).filter(expires_at__gt=now).order_by("expires_at")[:5],
+        Category.objects.order_by("-active_deals_count", "id")[:4],
+    )
+
+
+def _build_home():
+    now = timezone.now()
+    top_deals, ending_soon, cat_stats = (list(qs) for qs in _home_querysets(now))
+    return _home_blocks(now, top_deals, ending_soon, cat_stats)
+
+
+async def _abuild_home():
+    now = timezone.now()
+    top_deals, ending_soon, cat_stats = await asyncio.gather(*map(alist, _home_querysets(now)))
+    return _home_blocks(now, top_deals, ending_soon, cat_stats)
+
+
+def _home_blocks(now, top_deals, ending_soon, cat_stats):
+    timeout = HOME_TIMEOUT
+    if ending_soon:
+        until_expiry = (ending_soon[0].expires_at - now).total_seconds()
+        timeout = max(1, min(timeout, int(until_expiry) + 1))
+
+    return {
+        "top_deals": top_deals,
+        "ending_soon": ending_soon,
+        "cat_stats": cat_stats,
+    }, timeout
+
+
+def home_blocks():
+    """Данные главной страницы из кэша или из БД"""
+    blocks = cache.get(HOME_KEY)
+    if blocks is None:
+        blocks, timeout = _build_home()
+        cache.set(HOME_KEY, blocks, timeout)
+    return blocks
+
+
+async def ahome_blocks():
+    blocks = await cache.aget(HOME_KEY)
+    if blocks is None:
+        blocks, timeout = await _abuild_home()
+        await cache.aset(HOME_KEY, blocks, timeout)
+    return blocks
+
+
+def invalidate_home():
+    cache.delete(HOME_KEY)
+
+
+def deal_version(deal, now, similar=()):
+    """Версия общей для всех посетителей части страницы акции.
+
+    updated_at меняется при правке акции, favorites_count и миниатюры
+    обновляются в обход него, а «Акция завершена» зависит от времени.
+    Похожие акции меняются после build_similar, правок и окончания соседей.
+    """
+    expired = deal.expires_at is not None and deal.expires_at < now
+    neighbours = ",".join(f"{d.pk}.{d.updated_at.timestamp():.6f}" for d in similar)
+    neighbours = hashlib.md5(neighbours.encode()).hexdigest()[:12]
+    return f"{deal.pk}.{deal.updated_at.timestamp():.6f}.{deal.favorites_count}.{deal.thumb_hash}.{int(expired)}.{neighbours}"
+
+
+def deal_page_key(version):
+    return f"discounts:deal_page:{version}"
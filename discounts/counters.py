@@ -0,0 +1,55 @@
+"""Денормализованные счётчики акций в категориях"""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Category, DealCategory, active_deal_q
+
+
+def _count_subquery(extra=None):
+    links = DealCategory.objects.filter(category=OuterRef("pk"))
+    if extra is not None:
+        links = links.filter(extra)
+    return Coalesce(
+        Subquery(
+            links.order_by().values("category").annotate(n=Count("pk")).values("n"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount(category_ids=None):
+    """Пересчитывает счётчики одним UPDATE; None — все категории.
+
+    Возвращает число обновлённых категорий.
+    """
+    categories = Category.objects.all()
+    if category_ids is not None:
+        category_ids = set(category_ids)
+        if not category_ids:
+            return 0
+        categories = categories.filter(pk__in=category_ids)
+    with transaction.atomic():
+        return categories.update(
+            deals_count=_count_subquery(),
+            active_deals_count=_count_subquery(active_deal_q("deal__")),
+        )
+
+
+def recount_for_deals(deal_ids):
+    """Пересчитывает категории, в которые входят указанные акции"""
+    category_ids = DealCategory.objects.filter(deal_id__in=deal_ids).values_list("category_id", flat=True)
+    return recount(list(category_ids))
+
+
+def drift():
+    """Категории, у которых сохранённые счётчики расходятся с фактическими"""
+    return list(
+        Category.objects.annotate(
+            real_total=_count_subquery(),
+            real_active=_count_subquery(active_deal_q("deal__")),
+        ).exclude(
+            deals_count=F("real_total"), active_deals_count=F("real_active")
+        )
+    )
@@ -0,0 +1,86 @@
+"""Выпуск, выдача и погашение купонов"""
+import secrets
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Coupon
+
+# Без похожих символов (0/O, 1/I/L), чтобы код было легко продиктовать
+ALPHABET = "23456789ABCDEFGHJKMNPQRSTUVWXYZ"
+CODE_LENGTH = 10
+BATCH_SIZE = 2000
+
+
+def generate_codes(count):
+    """Множество из count случайных уникальных кодов"""
+    codes = set()
+    while len(codes) < count:
+        codes.add("".join(secrets.choice(ALPHABET) for _ in range(CODE_LENGTH)))
+    return codes
+
+
+def issue(deal, count, user=None, batch_size=BATCH_SIZE):
+    """Выпускает count купонов акции пачками через bulk_create.
+
+    Коды, уже существующие в БД, отбрасываются и догенерируются, так что
+    каждая пачка вставляется целиком. Возвращает число выпущенных купонов.
+    """
+    issued = 0
+    while issued < count:
+        size = min(batch_size, count - issued)
+        codes = generate_codes(size)
+        taken = set(Coupon.objects.filter(code__in=codes).values_list("code", flat=True))
+        codes -= taken
+        if not codes:
+            continue
+        try:
+            with transaction.atomic():
+                Coupon.objects.bulk_create(
+                    [Coupon(code=code, deal=deal, user=user) for code in codes],
+                    batch_size=batch_size,
+                )
+        except IntegrityError:
+            # Код успел занять параллельный выпуск — повторяем пачку
+            continue
+        issued += len(codes)
+    return issued
+
+
+def assign(deal, user, attempts=5):
+    """Выдаёт пользователю свободный купон из пула акции.
+
+    Если купон этой акции у пользователя уже есть, возвращается он.
+    Захват — условный UPDATE по user IS NULL: если купон забрали
+    параллельно, строка не обновится и берётся следующий. issued_at
+    становится временем выдачи, по нему считаются дневные итоги партнёра.
+    Возвращает купон или None, если пул пуст.
+    """
+    own = Coupon.objects.filter(deal=deal, user=user).first()
+    if own is not None:
+        return own
+    for _ in range(attempts):
+        pk = (
+            Coupon.objects.filter(deal=deal, user__isnull=True, status="active")
+            .order_by("pk").values_list("pk", flat=True).first()
+        )
+        if pk is None:
+            return None
+        now = timezone.now()
+        if Coupon.objects.filter(pk=pk, user__isnull=True).update(user=user, issued_at=now, updated_at=now):
+            return Coupon.objects.get(pk=pk)
+    return None
+
+
+def redeem(code, user=None):
+    """Погашает активный купон одним условным UPDATE.
+
+    Возвращает True, если купон был активен и теперь погашен. Гонки
+    чтения-записи нет: из двух одновременных попыток успешна ровно одна.
+    Купоны пула, ещё никому не выданные, не погашаются.
+    """
+    coupons = Coupon.objects.filter(code=code, status="active", user__isnull=False)
+    if user is not None:
+        coupons = coupons.filter(user=user)
+    now = timezone.now()
+    return coupons.update(status="redeemed", redeemed_at=now, updated_at=now) == 1
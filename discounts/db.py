@@ -0,0 +1,64 @@
+"""Настройка SQLite для продакшена и маршрутизация чтения/записи.
+
+PRAGMA ставятся на каждое новое соединение (сигнал connection_created):
+WAL позволяет читать во время записи, busy_timeout заставляет ждать
+блокировку вместо мгновенного «database is locked». Чтение идёт через
+отдельное соединение DATABASE_READ_ALIAS с query_only, запись и всё
+внутри транзакций — через default.
+"""
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    # В режиме WAL NORMAL не теряет целостность, только последние транзакции при сбое питания
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    # Отрицательное значение — размер в КиБ
+    "cache_size": -32000,
+    "temp_store": "MEMORY",
+    "mmap_size": 128 * 1024 * 1024,
+}
+
+
+def read_alias():
+    alias = getattr(settings, "DATABASE_READ_ALIAS", None)
+    return alias if alias in settings.DATABASES else None
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", PRAGMAS)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        if connection.alias == read_alias():
+            cursor.execute("PRAGMA query_only = ON")
+
+
+class ReadWriteRouter:
+    """Чтение — в соединение только для чтения, запись — в default.
+
+    Внутри транзакции на default читаем оттуда же, иначе не увидим
+    собственные незафиксированные изменения.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = read_alias()
+        if alias is None or connections["default"].in_atomic_block:
+            return "default"
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Оба соединения смотрят в один файл
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == "default"
@@ -0,0 +1,72 @@
+"""Перевод закончившихся купонов и акций в архивное состояние.
+
+Работает короткими порциями: каждая порция — отдельная маленькая
+транзакция, чтобы не держать блокировку записи SQLite надолго.
+"""
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters
+from .caching import invalidate_home
+from .models import Coupon, Deal
+
+CHUNK_SIZE = 500
+
+
+def is_live(expires_at, now=None):
+    return expires_at is None or expires_at > (now or timezone.now())
+
+
+def reopen(deal, now=None):
+    """Снимает is_archived, если срок акции продлили; True, если снял.
+
+    sweep() только ставит флаг, поэтому его снимают все места, где
+    меняется expires_at.
+    """
+    if deal.is_archived and is_live(deal.expires_at, now):
+        deal.is_archived = False
+        return True
+    return False
+
+
+def _expire_coupons(deal_ids, chunk_size):
+    expired = 0
+    while True:
+        ids = list(
+            Coupon.objects.filter(deal_id__in=deal_ids, status="active")
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return expired
+        with transaction.atomic():
+            expired += Coupon.objects.filter(pk__in=ids, status="active").update(status="expired", updated_at=timezone.now())
+
+
+def sweep(now=None, chunk_size=CHUNK_SIZE, pause=0):
+    """Истекает купоны закончившихся акций и архивирует сами акции.
+
+    pause — пауза в секундах между порциями, чтобы пропускать вперёд
+    запросы сайта. Возвращает словарь со статистикой.
+    """
+    now = now or timezone.now()
+    stats = {"deals": 0, "coupons": 0, "seconds": 0.0}
+    started = time.monotonic()
+    while True:
+        deal_ids = list(
+            Deal.objects.filter(is_archived=False, expires_at__lte=now)
+            .order_by("expires_at").values_list("pk", flat=True)[:chunk_size]
+        )
+        if not deal_ids:
+            break
+        stats["coupons"] += _expire_coupons(deal_ids, chunk_size)
+        with transaction.atomic():
+            stats["deals"] += Deal.objects.filter(pk__in=deal_ids).update(is_archived=True, updated_at=now)
+            counters.recount_for_deals(deal_ids)
+        if pause:
+            time.sleep(pause)
+    if stats["deals"]:
+        invalidate_home()
+    stats["seconds"] = time.monotonic() - started
+    return stats
@@ -0,0 +1,107 @@
+"""Потоковая выгрузка акций и купонов в CSV/JSONL для аналитики.
+
+Строки читаются из БД порциями через iterator(), а наружу отдаются
+генератором, поэтому память не зависит от размера таблиц. CSV акций
+совместим с форматом импорта (importer).
+"""
+import csv
+import json
+
+from django.db.models import Q
+
+from .importer import CATEGORY_SEPARATOR
+from .models import Coupon, Deal
+
+CHUNK_SIZE = 2000
+
+DEAL_COLUMNS = [
+    "id", "external_id", "title", "merchant_id", "merchant", "price_original", "price_discount", "discount_pct",
+    "starts_at", "expires_at", "created_at", "updated_at", "is_archived", "favorites_count", "categories",
+]
+COUPON_COLUMNS = ["id", "code", "deal_id", "deal", "user_id", "username", "status", "issued_at", "redeemed_at"]
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def deal_rows(since=None, chunk_size=CHUNK_SIZE):
+    """Акции с партнёром и категориями; since — созданные или изменённые с этого момента"""
+    deals = (
+        Deal.objects.select_related("merchant")
+        .prefetch_related("categories")
+        .order_by("pk")
+    )
+    if since is not None:
+        deals = deals.filter(updated_at__gte=since)
+    for deal in deals.iterator(chunk_size=chunk_size):
+        yield {
+            "id": deal.pk,
+            "external_id": deal.external_id,
+            "title": deal.title,
+            "merchant_id": deal.merchant_id,
+            "merchant": deal.merchant.name,
+            "price_original": str(deal.price_original),
+            "price_discount": str(deal.price_discount),
+            "discount_pct": deal.discount_pct,
+            "starts_at": _iso(deal.starts_at),
+            "expires_at": _iso(deal.expires_at),
+            "created_at": _iso(deal.created_at),
+            "updated_at": _iso(deal.updated_at),
+            "is_archived": deal.is_archived,
+            "favorites_count": deal.favorites_count,
+            "categories": [c.name for c in deal.categories.all()],
+        }
+
+
+def coupon_rows(since=None, chunk_size=CHUNK_SIZE):
+    """Купоны; since — выданные, погашенные или истёкшие с этого момента"""
+    coupons = Coupon.objects.order_by("pk")
+    if since is not None:
+        # issued_at и redeemed_at — для купонов, изменённых до появления updated_at
+        coupons = coupons.filter(Q(issued_at__gte=since) | Q(redeemed_at__gte=since) | Q(updated_at__gte=since))
+    values = coupons.values_list(
+        "pk", "code", "deal_id", "deal__title", "user_id", "user__username",
+        "status", "issued_at", "redeemed_at",
+    )
+    for (pk, code, deal_id, deal, user_id, username,
+         status, issued_at, redeemed_at) in values.iterator(chunk_size=chunk_size):
+        yield {
+            "id": pk,
+            "code": code,
+            "deal_id": deal_id,
+            "deal": deal,
+            "user_id": user_id,
+            "username": username,
+            "status": status,
+            "issued_at": _iso(issued_at),
+            "redeemed_at": _iso(redeemed_at),
+        }
+
+
+EXPORTS = {
+    "deals": (deal_rows, DEAL_COLUMNS),
+    "coupons": (coupon_rows, COUPON_COLUMNS),
+}
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+def as_csv(rows, columns):
+    """Заголовок уходит сразу, ещё до первого запроса к БД"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        if isinstance(row.get("categories"), list):
+            row["categories"] = CATEGORY_SEPARATOR.join(row["categories"])
+        yield writer.writerow([row[c] for c in columns])
+
+
+def as_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
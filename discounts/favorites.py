@@ -0,0 +1,89 @@
+"""Избранное: проверки принадлежности и счётчик Deal.favorites_count"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Deal
+
+Favorite = Deal.favorited_by.through
+
+
+def is_favorite(user, deal_id):
+    """Одна проверка по уникальному индексу (deal_id, user_id)"""
+    if not user.is_authenticated:
+        return False
+    return Favorite.objects.filter(deal_id=deal_id, user_id=user.pk).exists()
+
+
+def favorite_ids(user, deals):
+    """Множество id акций из списка, которые пользователь добавил в избранное"""
+    if not user.is_authenticated:
+        return set()
+    ids = [d.pk for d in deals]
+    if not ids:
+        return set()
+    return set(
+        Favorite.objects.filter(user_id=user.pk, deal_id__in=ids).values_list("deal_id", flat=True)
+    )
+
+
+async def ais_favorite(user, deal_id):
+    if not user.is_authenticated:
+        return False
+    return await Favorite.objects.filter(deal_id=deal_id, user_id=user.pk).aexists()
+
+
+async def afavorite_ids(user, deal_ids):
+    """Как favorite_ids, но принимает id, чтобы не ждать загрузки самих акций"""
+    if not user.is_authenticated or not deal_ids:
+        return set()
+    links = Favorite.objects.filter(user_id=user.pk, deal_id__in=deal_ids).values_list("deal_id", flat=True)
+    return {pk async for pk in links}
+
+
+def recount():
+    """Пересчитывает favorites_count всех акций (после массовой загрузки)"""
+    counts = (
+        Favorite.objects.filter(deal_id=OuterRef("pk"))
+        .order_by().values("deal_id").annotate(n=Count("pk")).values("n")
+    )
+    return Deal.objects.update(
+        favorites_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+    )
+
+
+def _shift(deal_ids, delta):
+    if deal_ids:
+        Deal.objects.filter(pk__in=deal_ids).update(favorites_count=F("favorites_count") + delta)
+
+
+def track_change(instance, action, reverse, pk_set):
+    """Обновляет favorites_count по сигналу m2m_changed.
+
+    add() присылает только реально добавленные id; для remove()/clear()
+    существующие связи запоминаются на pre_-шаге, чтобы не пересчитывать
+    избранное целиком. При reverse=True instance — пользователь.
+    """
+    if action == "post_add":
+        if reverse:
+            _shift(pk_set, 1)
+        else:
+            _shift([instance.pk], len(pk_set))
+    elif action == "pre_remove":
+        if reverse:
+            links = Favorite.objects.filter(user_id=instance.pk, deal_id__in=pk_set)
+        else:
+            links = Favorite.objects.filter(deal_id=instance.pk, user_id__in=pk_set)
+        instance._removed_favorites = list(links.values_list("deal_id", flat=True))
+    elif action == "pre_clear" and reverse:
+        instance._removed_favorites = list(
+            Favorite.objects.filter(user_id=instance.pk).values_list("deal_id", flat=True)
+        )
+    elif action in ("post_remove", "post_clear"):
+        if not reverse and action == "post_clear":
+            Deal.objects.filter(pk=instance.pk).update(favorites_count=0)
+            return
+        removed = instance.__dict__.pop("_removed_favorites", [])
+        if reverse:
+            _shift(removed, -1)
+        elif removed:
+            _shift([instance.pk], -len(removed))
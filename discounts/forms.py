@@ -1,7 +1,10 @@
 from django import forms
+from . import expiry, images
 from .models import Deal
 
 class DealForm(forms.ModelForm):
+    image_file = forms.FileField(label="Или загрузить картинку", required=False)
+
     class Meta:
         model = Deal
         fields = [
@@ -20,4 +23,29 @@ class DealForm(forms.ModelForm):
                 "placeholder": "Введите описание акции...",
                 "style": "resize: vertical;",
             }),
-        }
\ No newline at end of file
+        }
+    def clean_image_file(self):
+        """Байты загруженной картинки; миниатюры пишет save(), когда вся форма верна"""
+        upload = self.cleaned_data.get("image_file")
+        if not upload:
+            return None
+        try:
+            data = images.read_source(upload)
+            images.decode(data)
+        except images.ImageError as e:
+            raise forms.ValidationError(str(e))
+        return data
+
+    def save(self, commit=True):
+        deal = super().save(commit=False)
+        data = self.cleaned_data.get("image_file")
+        if data:
+            # Загруженная картинка живёт только миниатюрами, внешнего URL у неё нет
+            deal.image_url = deal.image_source = ""
+            deal.image_hash = images.ingest(data)
+        if "expires_at" in self.changed_data:
+            expiry.reopen(deal)
+        if commit:
+            deal.save()
+            self.save_m2m()
+        return deal
@@ -0,0 +1,164 @@
+"""Картинки акций: загрузка один раз, миниатюры JPEG и WebP в MEDIA_ROOT.
+
+Файлы называются по хэшу содержимого оригинала
+(thumbs/ab/<хэш>-<ширина>.<формат>), поэтому одинаковые картинки
+хранятся один раз, а URL миниатюр строятся без обращения к диску и БД.
+Нужен Pillow; без него ingest() и команда generate_thumbnails
+сообщают об ошибке, а шаблоны показывают исходный image_url.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import urllib.request
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+# Ширины миниатюр для srcset; крупнее оригинала картинка не растягивается
+WIDTHS = (160, 320, 640)
+# Расширение → формат Pillow
+FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+QUALITY = 80
+THUMB_DIR = "thumbs"
+# Больше этого размера оригинал не скачиваем
+MAX_BYTES = 10 * 1024 * 1024
+FETCH_TIMEOUT = 10
+
+
+class ImageError(Exception):
+    pass
+
+
+def available():
+    return Image is not None
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def thumb_name(digest, width, ext):
+    return f"{THUMB_DIR}/{digest[:2]}/{digest}-{width}.{ext}"
+
+
+def thumb_url(digest, width, ext):
+    return f"{settings.MEDIA_URL}{thumb_name(digest, width, ext)}"
+
+
+def srcset(digest, ext):
+    return ", ".join(f"{thumb_url(digest, w, ext)} {w}w" for w in WIDTHS)
+
+
+def fetch_url(url, timeout=FETCH_TIMEOUT):
+    """Скачивает картинку; в тестах подменяется своим fetch"""
+    request = urllib.request.Request(url, headers={"User-Agent": "discounts-thumbnailer"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            data = response.read(MAX_BYTES + 1)
+    except (OSError, ValueError) as e:
+        raise ImageError(f"Не удалось скачать {url}: {e}")
+    if len(data) > MAX_BYTES:
+        raise ImageError(f"Картинка больше {MAX_BYTES // (1024 * 1024)} МБ: {url}")
+    return data
+
+
+def read_source(source, fetch=fetch_url):
+    """Байты оригинала: bytes, путь к файлу, загруженный файл или URL"""
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, Path):
+        return source.read_bytes()
+    if hasattr(source, "read"):
+        if hasattr(source, "size") and source.size > MAX_BYTES:
+            raise ImageError(f"Картинка больше {MAX_BYTES // (1024 * 1024)} МБ")
+        return source.read()
+    if isinstance(source, str) and source.startswith(("http://", "https://")):
+        return fetch(source)
+    raise ImageError(f"Неизвестный источник картинки: {source!r}")
+
+
+def decode(data):
+    """Оригинал в RGB с учётом поворота из EXIF; ImageError, если картинку не прочитать"""
+    if Image is None:
+        raise ImageError("Для миниатюр нужен Pillow (pip install Pillow)")
+    try:
+        with Image.open(io.BytesIO(data)) as original:
+            return ImageOps.exif_transpose(original).convert("RGB")
+    except Image.DecompressionBombError as e:
+        raise ImageError(f"Слишком большая картинка: {e}")
+    except Exception as e:
+        # Битый файл может уронить любой из декодеров Pillow, а не только OSError
+        raise ImageError(f"Не картинка: {e}")
+
+
+def render(data, media_root, digest=None):
+    """Пишет все миниатюры оригинала; возвращает хэш.
+
+    Функция верхнего уровня с простыми аргументами, чтобы её можно было
+    выполнять в ProcessPoolExecutor. Готовые файлы не пересоздаются.
+    """
+    digest = digest or content_hash(data)
+    targets = [
+        (width, ext, Path(media_root) / thumb_name(digest, width, ext))
+        for width in WIDTHS for ext in FORMATS
+    ]
+    if all(path.exists() for _, _, path in targets):
+        return digest
+    original = decode(data)
+
+    targets[0][2].parent.mkdir(parents=True, exist_ok=True)
+    for width, ext, path in targets:
+        if path.exists():
+            continue
+        image = original
+        if original.width > width:
+            height = max(1, round(original.height * width / original.width))
+            image = original.resize((width, height), Image.LANCZOS)
+        # Через временный файл, чтобы параллельный запрос не увидел половину картинки
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=f".{ext}")
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, FORMATS[ext], quality=QUALITY)
+        os.replace(tmp, path)
+    return digest
+
+
+def ingest(source, fetch=fetch_url):
+    """Одна картинка в текущем процессе (загрузка через форму)"""
+    return render(read_source(source, fetch), settings.MEDIA_ROOT)
+
+
+def ingest_many(sources, workers=None, fetch=fetch_url, pool=None):
+    """Картинки {ключ: источник} → {ключ: хэш или ImageError}.
+
+    Скачивание идёт в потоках, а уменьшение — в пуле процессов:
+    Pillow держит GIL на части операций. Чтобы не запускать процессы на
+    каждый вызов, можно передать свой pool; тогда workers не используется.
+    """
+    if Image is None:
+        raise ImageError("Для миниатюр нужен Pillow (pip install Pillow)")
+    results = {}
+    own_pool = ProcessPoolExecutor(max_workers=workers) if pool is None else nullcontext(pool)
+    with ThreadPoolExecutor(max_workers=8) as downloads, own_pool as pool:
+        fetched = {key: downloads.submit(read_source, source, fetch) for key, source in sources.items()}
+        rendering = {}
+        for key, future in fetched.items():
+            try:
+                data = future.result()
+            except (ImageError, OSError) as e:
+                results[key] = e if isinstance(e, ImageError) else ImageError(str(e))
+                continue
+            rendering[key] = pool.submit(render, data, str(settings.MEDIA_ROOT))
+        for key, future in rendering.items():
+            try:
+                results[key] = future.result()
+            except ImageError as e:
+                results[key] = e
+    return results
@@ -0,0 +1,223 @@
+"""Потоковый импорт фидов акций партнёров (CSV или JSONL).
+
+Файл читается построчно и обрабатывается порциями, поэтому память
+не зависит от размера фида. Акции с уже известной парой
+(партнёр, external_id) обновляются, остальные создаются.
+"""
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters, expiry
+from .batch import parse_expires, refresh_derived
+from .caching import invalidate_home
+from .models import Category, Deal, DealCategory, Merchant
+
+CHUNK_SIZE = 1000
+
+# Поля акции, которые берутся из фида и перезаписываются при обновлении
+FEED_FIELDS = ["title", "price_original", "price_discount", "starts_at", "expires_at", "image_url", "description"]
+
+# В CSV категории перечисляются через этот разделитель
+CATEGORY_SEPARATOR = "|"
+
+
+class RowError(Exception):
+    pass
+
+
+def read_csv(fileobj):
+    """Строки CSV как (номер строки, dict)"""
+    reader = csv.DictReader(fileobj)
+    for row in reader:
+        categories = row.get("categories") or ""
+        row["categories"] = [c for c in categories.split(CATEGORY_SEPARATOR) if c.strip()]
+        yield reader.line_num, row
+
+
+def read_jsonl(fileobj):
+    """Строки JSONL как (номер строки, dict или RowError)"""
+    for line_no, line in enumerate(fileobj, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, RowError(f"Некорректный JSON: {e}")
+            continue
+        yield line_no, row if isinstance(row, dict) else RowError("Ожидается JSON-объект")
+
+
+def _decimal(row, field):
+    try:
+        return Decimal(str(row[field]).strip())
+    except (KeyError, InvalidOperation):
+        raise RowError(f"Некорректное или пустое поле {field}")
+
+
+def _datetime(row, field):
+    value = row.get(field)
+    if not value:
+        return None
+    # В JSONL дата может прийти числом, а parse_expires ждёт строку
+    if not isinstance(value, str):
+        raise RowError(f"Некорректная дата в поле {field}")
+    try:
+        return parse_expires(value)
+    except ValidationError:
+        raise RowError(f"Некорректная дата в поле {field}")
+
+
+class DealImporter:
+    """Импорт порциями по chunk_size строк.
+
+    error_writer — csv.writer для строк с ошибками (номер строки, ошибка, исходные данные).
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, error_writer=None, progress=None):
+        self.chunk_size = chunk_size
+        self.error_writer = error_writer
+        self.progress = progress
+        self.merchants = {}
+        self.categories = {}
+        self.touched_categories = set()
+        self.stats = {"rows": 0, "created": 0, "updated": 0, "errors": 0, "seconds": 0.0}
+
+    def run(self, rows):
+        started = time.monotonic()
+        chunk = []
+        for line_no, row in rows:
+            chunk.append((line_no, row))
+            if len(chunk) >= self.chunk_size:
+                self._process(chunk)
+                chunk = []
+                self.stats["seconds"] = time.monotonic() - started
+                if self.progress:
+                    self.progress(self.stats)
+        if chunk:
+            self._process(chunk)
+        counters.recount(self.touched_categories)
+        invalidate_home()
+        self.stats["seconds"] = time.monotonic() - started
+        return self.stats
+
+    def _error(self, line_no, row, message):
+        self.stats["errors"] += 1
+        if self.error_writer is not None:
+            raw = row if isinstance(row, dict) else {}
+            self.error_writer.writerow([line_no, message, json.dumps(raw, ensure_ascii=False, default=str)])
+
+    def _resolve_merchants(self, names):
+        missing = {n for n in names if n not in self.merchants}
+        if missing:
+            for pk, name in Merchant.objects.filter(name__in=missing).order_by("pk").values_list("pk", "name"):
+                self.merchants.setdefault(name, pk)
+
+    def _resolve_categories(self, names):
+        missing = {n for n in names if n not in self.categories}
+        if not missing:
+            return
+        self.categories.update(Category.objects.filter(name__in=missing).values_list("name", "pk"))
+        for name in missing - self.categories.keys():
+            self.categories[name] = Category.objects.get_or_create(name=name)[0].pk
+
+    def _build(self, row):
+        """Акция и список id категорий из строки фида"""
+        merchant_id = self.merchants.get(str(row.get("merchant") or "").strip())
+        if merchant_id is None:
+            raise RowError(f"Неизвестный партнёр: {row.get('merchant')!r}")
+        deal = Deal(
+            merchant_id=merchant_id,
+            external_id=str(row.get("external_id") or "").strip() or None,
+            title=str(row.get("title") or "").strip(),
+            price_original=_decimal(row, "price_original"),
+            price_discount=_decimal(row, "price_discount"),
+            starts_at=_datetime(row, "starts_at"),
+            expires_at=_datetime(row, "expires_at"),
+            image_url=str(row.get("image_url") or "").strip(),
+            description=row.get("description") or None,
+        )
+        try:
+            deal.clean_fields(exclude=["merchant"])
+        except ValidationError as e:
+            raise RowError("; ".join(f"{k}: {', '.join(v)}" for k, v in e.message_dict.items()))
+        category_ids = [self.categories[str(c).strip()] for c in row.get("categories") or []]
+        return deal, category_ids
+
+    def _process(self, chunk):
+        self.stats["rows"] += len(chunk)
+        rows = [(n, r) for n, r in chunk if isinstance(r, dict)]
+        for n, r in chunk:
+            if not isinstance(r, dict):
+                self._error(n, None, str(r))
+
+        self._resolve_merchants({str(r.get("merchant") or "").strip() for _, r in rows})
+        self._resolve_categories({
+            str(c).strip() for _, r in rows
+            if isinstance(r.get("categories") or [], list)
+            for c in r.get("categories") or [] if str(c).strip()
+        })
+
+        built = {}
+        for line_no, row in rows:
+            try:
+                if not isinstance(row.get("categories") or [], list):
+                    raise RowError("Поле categories должно быть списком")
+                deal, category_ids = self._build(row)
+            except RowError as e:
+                self._error(line_no, row, str(e))
+                continue
+            # Повтор той же акции внутри порции: побеждает последняя строка
+            key = (deal.merchant_id, deal.external_id) if deal.external_id else ("line", line_no)
+            built[key] = (deal, category_ids)
+
+        with_ids = [deal for deal, _ in built.values() if deal.external_id]
+        existing = {
+            (m, e): pk for pk, m, e in Deal.objects.filter(
+                merchant_id__in={d.merchant_id for d in with_ids},
+                external_id__in={d.external_id for d in with_ids},
+            ).values_list("pk", "merchant_id", "external_id")
+        } if with_ids else {}
+
+        to_create, to_update = [], []
+        now = timezone.now()
+        for key, (deal, _) in built.items():
+            pk = existing.get(key)
+            if pk is None:
+                to_create.append(deal)
+            else:
+                deal.pk = pk
+                deal.updated_at = now
+                to_update.append(deal)
+
+        with transaction.atomic():
+            Deal.objects.bulk_create(to_create, batch_size=self.chunk_size)
+            Deal.objects.bulk_update(to_update, FEED_FIELDS + ["updated_at"], batch_size=self.chunk_size)
+            # Фид продлил акцию, которую sweep_expired уже убрал в архив
+            reopened = [deal.pk for deal in to_update if expiry.is_live(deal.expires_at, now)]
+            for i in range(0, len(reopened), self.chunk_size):
+                Deal.objects.filter(pk__in=reopened[i:i + self.chunk_size], is_archived=True).update(is_archived=False)
+            if to_update:
+                old_links = DealCategory.objects.filter(deal_id__in=[d.pk for d in to_update])
+                self.touched_categories.update(old_links.values_list("category_id", flat=True))
+                # Без сигналов post_delete на каждую связь. _raw_delete здесь
+                # безопасен: на DealCategory никто не ссылается, каскадов нет,
+                # а то, что делают обработчики (поисковый индекс, кэш главной,
+                # счётчики категорий), делается ниже: refresh_derived() на
+                # порцию и counters.recount(touched_categories) в конце run()
+                old_links._raw_delete(old_links.db)
+            links = [
+                DealCategory(deal_id=deal.pk, category_id=category_id)
+                for deal, category_ids in built.values()
+                for category_id in dict.fromkeys(category_ids)
+            ]
+            DealCategory.objects.bulk_create(links, batch_size=self.chunk_size)
+        self.touched_categories.update(link.category_id for link in links)
+        self.stats["created"] += len(to_create)
+        self.stats["updated"] += len(to_update)
+        refresh_derived([deal.pk for deal, _ in built.values()], dates_changed=False)
@@ -0,0 +1,140 @@
+"""Замер запросов: число SQL, время в БД, в шаблонах и общее время ответа.
+
+Результат отдаётся заголовком Server-Timing, а медленные запросы
+пишутся JSON-строкой в логгер discounts.slow_requests.
+
+Обёртка запросов ставится на каждое соединение (всех алиасов) при его
+создании, а текущий замер ищется через contextvar — так учитываются и
+запросы асинхронных view, которые Django выполняет в других потоках.
+"""
+import contextvars
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger("discounts.slow_requests")
+
+_current = contextvars.ContextVar("discounts_request_timing", default=None)
+
+# Сколько самых долгих запросов к БД попадает в лог
+TOP_QUERIES = 5
+
+
+class _Timing:
+    def __init__(self):
+        self.queries = []
+        self.db = 0.0
+        self.templates = 0.0
+
+
+def _timed_execute(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        timing.db += elapsed
+        timing.queries.append((elapsed, sql))
+
+
+@receiver(connection_created)
+def _wrap_connection(sender, connection, **kwargs):
+    connection.execute_wrappers.append(_timed_execute)
+
+
+class _TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timing = _current.get()
+        if timing is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing.templates += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Обычный движок шаблонов Django, который учитывает время рендеринга"""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return _TimedTemplate(template.template, self)
+
+
+class RequestTimingMiddleware:
+    # Умеет работать и в async-цепочке, иначе под ASGI Django выполнял бы
+    # асинхронные view в отдельном потоке ради этого middleware
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "TIMING_SAMPLE_RATE", 1.0)
+        self.slow_ms = getattr(settings, "TIMING_SLOW_MS", 500)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timing = _Timing()
+        token = _current.set(timing)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        timing = _Timing()
+        token = _current.set(timing)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timing, time.perf_counter() - started)
+
+    def finish(self, request, response, timing, total):
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={timing.db * 1000:.1f};desc="{len(timing.queries)} queries"',
+            f"tpl;dur={timing.templates * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ])
+
+        if total * 1000 >= self.slow_ms:
+            top = sorted(timing.queries, key=lambda q: q[0], reverse=True)[:TOP_QUERIES]
+            logger.warning(json.dumps({
+                "ts": time.time(),
+                "method": request.method,
+                "path": request.path,
+                "view": getattr(request.resolver_match, "view_name", None),
+                "status": response.status_code,
+                "total_ms": round(total * 1000, 1),
+                "db_ms": round(timing.db * 1000, 1),
+                "template_ms": round(timing.templates * 1000, 1),
+                "queries": len(timing.queries),
+                "top_queries": [{"ms": round(t * 1000, 2), "sql": sql[:500]} for t, sql in top],
+            }, ensure_ascii=False))
+        return response
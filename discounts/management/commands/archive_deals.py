@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from discounts import archive
+
+
+class Command(BaseCommand):
+    help = "Переносит давно закончившиеся акции в архивную таблицу или возвращает их оттуда"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=archive.ARCHIVE_AFTER.days,
+            help="Сколько дней после окончания акция остаётся в основной таблице",
+        )
+        parser.add_argument("--chunk-size", type=int, default=archive.CHUNK_SIZE)
+        parser.add_argument("--restore", type=int, nargs="+", metavar="ID", help="Вернуть акции с этими id")
+
+    def handle(self, *args, **options):
+        if options["restore"]:
+            stats = archive.restore(options["restore"])
+            if stats["skipped"]:
+                self.stdout.write(self.style.WARNING(
+                    f"Фид уже создал заново, остались в архиве: {' '.join(map(str, stats['skipped']))}"
+                ))
+            self.stdout.write(self.style.SUCCESS(f"✅ Возвращено из архива: {stats['deals']} акций"))
+            return
+
+        before = timezone.now() - timedelta(days=options["days"])
+        stats = archive.archive(before=before, chunk_size=options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Перенесено в архив: {stats['deals']} акций за {stats['seconds']:.2f} с")
+        )
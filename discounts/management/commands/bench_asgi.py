@@ -0,0 +1,136 @@
+import asyncio
+import io
+import logging
+import statistics
+import threading
+import time
+from urllib.parse import quote
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+
+from discounts.models import Deal
+
+# Страница: (путь синхронного view для WSGI, путь асинхронного view для ASGI)
+PAGES = {
+    "home": ("/", "/async/"),
+    "search": ("/search/", "/async/search/"),
+    "deal_detail": ("/deal/{pk}/", "/async/deal/{pk}/"),
+}
+
+
+def _summary(latencies, elapsed, errors):
+    cuts = statistics.quantiles(latencies, n=20) if len(latencies) > 1 else [0] * 19
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) if latencies else 0,
+        "p95_ms": cuts[-1],
+        "errors": errors,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает задержку и запросы/с синхронных view под WSGI (пул потоков) "
+        "и асинхронных под ASGI (один цикл событий) при одновременных запросах. "
+        "Только GET-запросы, без HTTP-сервера: вызываются сами приложения"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=3)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--query", default="скид", help="Строка поиска для страницы search")
+        parser.add_argument("--page", choices=sorted(PAGES), action="append")
+
+    def handle(self, *args, **options):
+        logging.getLogger("django.request").disabled = True
+        deal = Deal.objects.order_by("-favorites_count", "pk").first()
+        if deal is None:
+            self.stderr.write("Нет акций — сначала выполните seed_data")
+            return
+        qs = "q=" + quote(options["query"])
+        wsgi, asgi = get_wsgi_application(), get_asgi_application()
+
+        for name in options["page"] or list(PAGES):
+            sync_path, async_path = (p.format(pk=deal.pk) for p in PAGES[name])
+            query = qs if name == "search" else ""
+            results = {
+                "WSGI": self.run_wsgi(wsgi, sync_path, query, options),
+                "ASGI": asyncio.run(self.run_asgi(asgi, async_path, query, options)),
+            }
+            for server, r in results.items():
+                self.stdout.write(
+                    f"{name:>12} {server}: {r['rps']:7.0f} запр/с, p50 {r['p50_ms']:6.1f} мс, "
+                    f"p95 {r['p95_ms']:6.1f} мс, ошибок {r['errors']}"
+                )
+        self.stdout.write(self.style.SUCCESS("✅ Сравнение завершено"))
+
+    def run_wsgi(self, app, path, query, options):
+        deadline = time.monotonic() + options["seconds"]
+        latencies, errors = [], [0]
+        lock = threading.Lock()
+
+        def worker():
+            own, failed = [], 0
+            while time.monotonic() < deadline:
+                environ = {
+                    "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query,
+                    "SERVER_NAME": "localhost", "SERVER_PORT": "80", "HTTP_HOST": "localhost",
+                    "SERVER_PROTOCOL": "HTTP/1.1", "wsgi.input": io.BytesIO(), "wsgi.url_scheme": "http",
+                    "wsgi.errors": io.StringIO(),
+                }
+                status = []
+                started = time.perf_counter()
+                body = app(environ, lambda s, headers, exc_info=None: status.append(s))
+                b"".join(body)
+                body.close()
+                own.append((time.perf_counter() - started) * 1000)
+                failed += not status[0].startswith("200")
+            with lock:
+                latencies.extend(own)
+                errors[0] += failed
+            connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(options["concurrency"])]
+        started = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return _summary(latencies, time.monotonic() - started, errors[0])
+
+    async def run_asgi(self, app, path, query, options):
+        deadline = time.monotonic() + options["seconds"]
+        latencies, errors = [], [0]
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": query.encode(), "headers": [(b"host", b"localhost")],
+            "server": ("localhost", 80), "client": ("127.0.0.1", 50000),
+        }
+
+        async def worker():
+            while time.monotonic() < deadline:
+                status, sent = [], []
+
+                async def receive():
+                    # После тела запроса Django ждёт http.disconnect — клиент «не уходит»
+                    if sent:
+                        await asyncio.Future()
+                    sent.append(True)
+                    return {"type": "http.request", "body": b"", "more_body": False}
+
+                async def send(message):
+                    if message["type"] == "http.response.start":
+                        status.append(message["status"])
+
+                started = time.perf_counter()
+                await app(dict(scope), receive, send)
+                latencies.append((time.perf_counter() - started) * 1000)
+                errors[0] += status[0] != 200
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(options["concurrency"])))
+        return _summary(latencies, time.monotonic() - started, errors[0])
@@ -0,0 +1,146 @@
+import logging
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from discounts import db
+from discounts.models import Category, Deal
+
+# Исходные настройки Django: журнал отката, соединение на запрос, без маршрутизации
+PROFILES = {
+    "default": {"pragmas": {"journal_mode": "DELETE"}, "conn_max_age": 0, "read_alias": None, "transaction_mode": None},
+    "tuned": {"pragmas": db.PRAGMAS, "conn_max_age": 600, "read_alias": "replica", "transaction_mode": "IMMEDIATE"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает пропускную способность чтения при одновременной записи "
+        "(toggle_favorite) с настройками SQLite по умолчанию и с WAL/PRAGMA/роутером. "
+        "Работает на временной копии базы"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--profile", choices=sorted(PROFILES), action="append")
+
+    def handle(self, *args, **options):
+        source = Path(connections["default"].settings_dict["NAME"])
+        connections.close_all()
+        with tempfile.TemporaryDirectory() as tmp:
+            copy = Path(tmp) / "bench.sqlite3"
+            # backup(), а не копирование файла: в режиме WAL часть данных может быть в -wal
+            with sqlite3.connect(source) as src, sqlite3.connect(copy) as dst:
+                src.backup(dst)
+            results = {}
+            # Ошибки блокировки считаем сами, без трейсбеков django.request в выводе
+            logging.getLogger("django.request").disabled = True
+            for name in options["profile"] or ["default", "tuned"]:
+                results[name] = self.run_profile(copy, PROFILES[name], options)
+            connections.close_all()
+
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:>8}: чтение {r['reads_per_s']:.0f}/с (p50 {r['p50_ms']:.1f} мс, p95 {r['p95_ms']:.1f} мс), "
+                f"запись {r['writes_per_s']:.0f}/с, «database is locked»: {r['locked']}"
+            )
+        if len(results) == 2:
+            base, tuned = results["default"], results["tuned"]
+            ratio = tuned["reads_per_s"] / base["reads_per_s"] if base["reads_per_s"] else 0
+            self.stdout.write(self.style.SUCCESS(f"✅ Чтение быстрее в {ratio:.1f} раза"))
+
+    def configure(self, copy, profile):
+        connections.close_all()
+        for alias in settings.DATABASES:
+            conf = connections.settings[alias]
+            conf["NAME"] = copy
+            conf["CONN_MAX_AGE"] = profile["conn_max_age"]
+            conf["OPTIONS"].pop("transaction_mode", None)
+            if profile["transaction_mode"]:
+                conf["OPTIONS"]["transaction_mode"] = profile["transaction_mode"]
+
+    def run_profile(self, copy, profile, options):
+        self.configure(copy, profile)
+        overrides = {"SQLITE_PRAGMAS": profile["pragmas"], "DATABASE_READ_ALIAS": profile["read_alias"]}
+        with override_settings(**overrides):
+            deal_ids = list(Deal.objects.values_list("pk", flat=True)[:500])
+            urls = [reverse("discounts:deal_detail", args=[pk]) for pk in deal_ids[:100]]
+            urls += [reverse("discounts:category", args=[pk]) for pk in Category.objects.values_list("pk", flat=True)]
+            urls.append(reverse("discounts:api_deals"))
+            writers = [
+                User.objects.get_or_create(username=f"bench_writer{i}")[0] for i in range(options["writers"])
+            ]
+            connections.close_all()
+
+            deadline = time.monotonic() + options["seconds"]
+            latencies, writes, locked = [], [0], [0]
+            lock = threading.Lock()
+
+            def request(client, method, url, **extra):
+                try:
+                    getattr(client, method)(url, **extra)
+                    return True
+                except OperationalError as e:
+                    if "locked" not in str(e):
+                        raise
+                    with lock:
+                        locked[0] += 1
+                    return False
+                finally:
+                    # То же, что делает обработчик запросов Django по request_finished
+                    close_old_connections()
+
+            def reader(seed):
+                rnd = random.Random(seed)
+                client = Client(HTTP_HOST="localhost")
+                own = []
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    if request(client, "get", rnd.choice(urls)):
+                        own.append((time.perf_counter() - started) * 1000)
+                with lock:
+                    latencies.extend(own)
+                connections.close_all()
+
+            def writer(user, seed):
+                rnd = random.Random(seed)
+                client = Client(HTTP_HOST="localhost")
+                client.force_login(user)
+                while time.monotonic() < deadline:
+                    url = reverse("discounts:toggle_favorite", args=[rnd.choice(deal_ids)])
+                    if request(client, "post", url, HTTP_X_REQUESTED_WITH="XMLHttpRequest"):
+                        with lock:
+                            writes[0] += 1
+                connections.close_all()
+
+            threads = [threading.Thread(target=reader, args=(i,)) for i in range(options["readers"])]
+            threads += [threading.Thread(target=writer, args=(u, i)) for i, u in enumerate(writers)]
+            started = time.monotonic()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.monotonic() - started
+
+        cuts = statistics.quantiles(latencies, n=20) if len(latencies) > 1 else [0] * 19
+        return {
+            "reads_per_s": len(latencies) / elapsed,
+            "p50_ms": statistics.median(latencies) if latencies else 0,
+            "p95_ms": cuts[-1],
+            "writes_per_s": writes[0] / elapsed,
+            "locked": locked[0],
+        }
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from discounts import similar
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает похожие акции по общему избранному и общим категориям"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=similar.CHUNK_SIZE, help="Акций в порции")
+        parser.add_argument("--top", type=int, default=similar.TOP_K, help="Сколько соседей хранить у акции")
+
+    def handle(self, *args, **options):
+        stats = similar.build(chunk_size=options["chunk_size"], top_k=options["top"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Похожие акции для {stats['deals']} акций за {stats['seconds']:.1f} с: "
+                f"по избранному {stats['favorites']}, по категориям {stats['categories']}"
+            )
+        )
@@ -0,0 +1,52 @@
+import sys
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from discounts import exports
+from discounts.batch import parse_expires
+
+
+class Command(BaseCommand):
+    help = "Выгружает акции или купоны в CSV/JSONL (для ночных выгрузок в аналитику)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(exports.EXPORTS))
+        parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+        parser.add_argument("--since", default=None, help="Только изменения с этой даты/момента (ISO)")
+        parser.add_argument("--output", "-o", default=None, help="Файл (по умолчанию stdout)")
+        parser.add_argument("--chunk-size", type=int, default=exports.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_expires(options["since"]) if options["since"] else None
+        except ValidationError:
+            raise CommandError(f"Некорректный --since: {options['since']}")
+
+        rows_for, columns = exports.EXPORTS[options["kind"]]
+        counted = 0
+
+        def counting(rows):
+            nonlocal counted
+            for row in rows:
+                counted += 1
+                yield row
+
+        rows = counting(rows_for(since=since, chunk_size=options["chunk_size"]))
+        chunks = exports.as_jsonl(rows) if options["format"] == "jsonl" else exports.as_csv(rows, columns)
+
+        started = time.monotonic()
+        out = open(options["output"], "w", encoding="utf-8", newline="") if options["output"] else sys.stdout
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if options["output"]:
+                out.close()
+
+        if options["output"]:
+            seconds = time.monotonic() - started
+            self.stdout.write(
+                self.style.SUCCESS(f"✅ Выгружено {counted} строк в {options['output']} за {seconds:.1f} с")
+            )
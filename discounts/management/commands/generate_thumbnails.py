@@ -0,0 +1,60 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q
+
+from discounts import images
+from discounts.caching import invalidate_home
+from discounts.models import Deal
+
+
+class Command(BaseCommand):
+    help = "Скачивает картинки акций и делает миниатюры JPEG/WebP в MEDIA_ROOT"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None, help="Процессов (по умолчанию по числу ядер)")
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--force", action="store_true", help="Пересоздать и для акций с готовыми миниатюрами")
+
+    def handle(self, *args, **options):
+        if not images.available():
+            raise CommandError("Для миниатюр нужен Pillow (pip install Pillow)")
+
+        deals = Deal.objects.exclude(image_url="")
+        if not options["force"]:
+            # Миниатюр нет или они сделаны из прежнего image_url
+            deals = deals.filter(Q(image_hash="") | ~Q(image_source=F("image_url")))
+        pending = deals.order_by("pk").values_list("pk", "image_url")
+
+        stats = {"done": 0, "failed": 0}
+        started = time.monotonic()
+        last_pk = 0
+        # Один пул на весь запуск: процессы с Pillow дорого поднимать на каждую порцию
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            while True:
+                batch = dict(pending.filter(pk__gt=last_pk)[:options["batch_size"]])
+                if not batch:
+                    break
+                last_pk = max(batch)
+                results = images.ingest_many(batch, pool=pool)
+                done = []
+                for pk, result in results.items():
+                    if isinstance(result, images.ImageError):
+                        stats["failed"] += 1
+                        self.stderr.write(f"  акция {pk}: {result}")
+                    else:
+                        done.append(Deal(pk=pk, image_hash=result, image_source=batch[pk]))
+                Deal.objects.bulk_update(done, ["image_hash", "image_source"])
+                stats["done"] += len(done)
+                self.stdout.write(f"  готово: {stats['done']}, ошибок: {stats['failed']}")
+
+        if stats["done"]:
+            # В кэше главной лежат акции без новых миниатюр
+            invalidate_home()
+        seconds = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Миниатюры: {stats['done']} акций, ошибок {stats['failed']} за {seconds:.1f} с"
+            )
+        )
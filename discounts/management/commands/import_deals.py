@@ -0,0 +1,53 @@
+import csv
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from discounts import importer
+
+
+class Command(BaseCommand):
+    help = "Импортирует фид акций партнёра из CSV или JSONL (создаёт и обновляет акции)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"], default=None)
+        parser.add_argument("--chunk-size", type=int, default=importer.CHUNK_SIZE)
+        parser.add_argument(
+            "--errors", default=None,
+            help="CSV-файл для строк с ошибками (по умолчанию <path>.errors.csv)",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"Файл не найден: {path}")
+        fmt = options["format"] or ("jsonl" if path.suffix in (".jsonl", ".ndjson") else "csv")
+        errors_path = Path(options["errors"] or f"{path}.errors.csv")
+
+        def progress(stats):
+            rate = stats["rows"] / stats["seconds"] if stats["seconds"] else stats["rows"]
+            self.stdout.write(f"  строк: {stats['rows']} ({rate:.0f} строк/с), ошибок: {stats['errors']}")
+            self.stdout.flush()
+
+        with open(path, encoding="utf-8", newline="") as src, \
+                open(errors_path, "w", encoding="utf-8", newline="") as err:
+            writer = csv.writer(err)
+            writer.writerow(["line", "error", "row"])
+            rows = importer.read_jsonl(src) if fmt == "jsonl" else importer.read_csv(src)
+            stats = importer.DealImporter(
+                chunk_size=options["chunk_size"], error_writer=writer, progress=progress,
+            ).run(rows)
+
+        if not stats["errors"]:
+            errors_path.unlink()
+        rate = stats["rows"] / stats["seconds"] if stats["seconds"] else stats["rows"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Импорт завершён: строк {stats['rows']}, создано {stats['created']}, "
+                f"обновлено {stats['updated']}, ошибок {stats['errors']} "
+                f"за {stats['seconds']:.1f} с ({rate:.0f} строк/с)"
+            )
+        )
+        if stats["errors"]:
+            self.stdout.write(self.style.WARNING(f"Строки с ошибками: {errors_path}"))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from discounts import coupons
+from discounts.models import Deal
+
+
+class Command(BaseCommand):
+    help = "Выпускает пул уникальных купонов для акции"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--deal", type=int, required=True, help="id акции")
+        parser.add_argument("--count", type=int, required=True)
+        parser.add_argument("--batch-size", type=int, default=coupons.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            deal = Deal.objects.get(pk=options["deal"])
+        except Deal.DoesNotExist:
+            raise CommandError(f"Акция {options['deal']} не найдена")
+
+        started = time.monotonic()
+        issued = coupons.issue(deal, options["count"], batch_size=options["batch_size"])
+        elapsed = time.monotonic() - started
+        rate = issued / elapsed if elapsed else issued
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Выпущено {issued} купонов для «{deal}» за {elapsed:.2f} с ({rate:.0f} шт/с)"
+            )
+        )
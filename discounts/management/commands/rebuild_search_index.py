@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from discounts import search
+
+
+class Command(BaseCommand):
+    help = "Пересобирает полнотекстовый индекс поиска"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = search.rebuild(batch_size=options["batch_size"])
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Индекс поиска пересобран: {total} записей за {elapsed:.2f} с")
+        )
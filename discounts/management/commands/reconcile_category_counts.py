@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from discounts import counters
+from discounts.caching import invalidate_home
+
+
+class Command(BaseCommand):
+    help = "Сверяет и пересчитывает счётчики акций в категориях"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только показать расхождения, ничего не менять",
+        )
+
+    def handle(self, *args, **options):
+        stale = counters.drift()
+        for c in stale:
+            self.stdout.write(
+                f"{c.name}: всего {c.deals_count} → {c.real_total}, "
+                f"активных {c.active_deals_count} → {c.real_active}"
+            )
+        if options["dry_run"]:
+            self.stdout.write(f"Расхождений: {len(stale)}")
+            return
+        if stale:
+            counters.recount([c.pk for c in stale])
+            invalidate_home()
+        self.stdout.write(self.style.SUCCESS(f"✅ Исправлено категорий: {len(stale)}"))
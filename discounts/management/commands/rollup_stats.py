@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from discounts import rollups
+
+
+class Command(BaseCommand):
+    help = "Добавляет к дневным итогам партнёров купоны, выданные и погашенные после прошлого запуска"
+
+    def handle(self, *args, **options):
+        stats = rollups.rollup()
+        if stats["conflict"]:
+            self.stdout.write(self.style.WARNING("Отметку сдвинул параллельный запуск, остаток окон посчитает он"))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Итоги партнёров: {stats['rows']} строк из {stats['windows']} окон за {stats['seconds']:.2f} с, "
+                f"учтено до {timezone.localtime(rollups.updated_until()):%d.%m.%Y %H:%M}"
+            )
+        )
@@ -1,96 +1,287 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
 from django.utils import timezone
 from django.contrib.auth.models import User
-from discounts.models import Role, Merchant, Category, Deal, DealCategory
+from django.db import transaction
+from django.db.models import F
+from discounts.models import (
+    Role, Merchant, Category, Deal, DealArchive, DealCategory, Coupon, MerchantDailyStats, SimilarDeal, Watermark,
+)
+from discounts import coupons, counters, favorites, search
+from discounts.batch import parse_expires
 from decimal import Decimal
+from itertools import accumulate
 import random
+import time
+
+PARTNER_NAMES = [
+    "М.Видео", "Эльдорадо", "DNS", "Ozon", "Wildberries",
+    "Lamoda", "Спортмастер", "Детский мир", "Л'Этуаль", "Рив Гош",
+    "IKEA", "Hoff", "Metro", "Ашан", "Перекрёсток",
+    "Магнит", "Пятёрочка", "Беру", "Aliexpress", "Яндекс Маркет"
+]
+
+DEAL_TITLES = {
+    "Электроника": ["Скидка на смартфоны", "Уценка телевизоров", "Ноутбуки по акции"],
+    "Одежда": ["Распродажа футболок", "Скидки на куртки", "Платья по суперцене"],
+    "Обувь": ["Кроссовки со скидкой", "Сапоги по акции", "Туфли по спеццене"],
+    "Продукты": ["Скидка на кофе", "Сыры по акции", "Фрукты по выгодной цене"],
+    "Красота и здоровье": ["Скидки на косметику", "Парфюм по акции", "Витамины по суперцене"],
+    "Дом и сад": ["Мебель со скидкой", "Акция на посуду", "Садовые товары по суперцене"],
+    "Спорт": ["Скидка на велосипеды", "Тренажёры по акции", "Спортивная одежда со скидкой"],
+    "Игрушки": ["Конструкторы по суперцене", "Куклы со скидкой", "Настольные игры по акции"],
+    "Авто": ["Автоаксессуары со скидкой", "Шины по акции", "Масла и жидкости по суперцене"],
+    "Книги": ["Бестселлеры по акции", "Учебники со скидкой", "Фэнтези по суперцене"],
+}
+
+# Сгенерированные коды начинаются с «0» — этого символа нет в алфавите
+# coupons.ALPHABET, поэтому они не пересекаются с выпущенными купонами
+CODE_PREFIX = "0"
+
+
+def zipf_weights(n, s=1.1):
+    """Накопленные веса Ципфа: первые элементы намного «горячее» остальных"""
+    return list(accumulate(1 / (rank ** s) for rank in range(1, n + 1)))
+
+
+def seed_code(n):
+    digits = []
+    base = len(coupons.ALPHABET)
+    while True:
+        n, r = divmod(n, base)
+        digits.append(coupons.ALPHABET[r])
+        if not n:
+            break
+    return CODE_PREFIX + "".join(reversed(digits)).rjust(coupons.CODE_LENGTH - 1, coupons.ALPHABET[0])
 
 
 class Command(BaseCommand):
+    help = "Наполняет базу тестовыми данными (одинаково при одних и тех же --seed и --now)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--deals", type=int, default=30)
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--merchants", type=int, default=len(PARTNER_NAMES))
+        parser.add_argument("--coupons", type=int, default=0)
+        parser.add_argument("--favorites", type=int, default=0)
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument(
+            "--now", default=None,
+            help="Момент, от которого отсчитываются даты (ISO); по умолчанию текущее время",
+        )
+        parser.add_argument(
+            "--flush", action="store_true",
+            help="Удалить акции, партнёров, купоны и пользователей userN перед наполнением",
+        )
+        parser.add_argument("--append", action="store_true", help="Добавить данные к уже существующим")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--skip-index", action="store_true",
+            help="Не пересобирать поисковый индекс (можно сделать позже rebuild_search_index)",
+        )
 
-    def handle(self, *args, **kwargs):
-        def get_image_url(i):
-            return f"https://picsum.photos/seed/deal{i}/600/400"
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        try:
+            self.now = parse_expires(options["now"]) if options["now"] else timezone.now().replace(microsecond=0)
+        except Exception:
+            raise CommandError(f"Некорректный --now: {options['now']}")
+        started = time.monotonic()
 
-        roles = [Role.objects.get_or_create(name=n)[0] for n in ["user", "partner", "admin"]]
+        if options["flush"]:
+            self.flush()
+        elif not options["append"] and (Merchant.objects.exists() or Deal.objects.exists()):
+            self.stdout.write(self.style.WARNING("База уже наполнена; чтобы наполнить заново, добавьте --flush"))
+            return
 
-        users = []
-        for i in range(1, 21):
-            u, created = User.objects.get_or_create(
-                username=f"user{i}",
-                defaults={"email": f"user{i}@example.com"}
-            )
-            if created:
-                u.set_password("test12345")
-                u.save()
-            users.append(u)
-
-        partner_names = [
-            "М.Видео", "Эльдорадо", "DNS", "Ozon", "Wildberries",
-            "Lamoda", "Спортмастер", "Детский мир", "Л'Этуаль", "Рив Гош",
-            "IKEA", "Hoff", "Metro", "Ашан", "Перекрёсток",
-            "Магнит", "Пятёрочка", "Беру", "Aliexpress", "Яндекс Маркет"
-        ]
-
-        partners = []
-        for i, name in enumerate(partner_names, start=1):
-            p, _ = Merchant.objects.get_or_create(
-                name=name,
-                defaults={
-                    "contact": f"partner{i}@example.com",
-                    "user": random.choice(users),
-                }
-            )
-            partners.append(p)
-
-        category_names = [
-            "Электроника", "Одежда", "Обувь", "Продукты", "Красота и здоровье",
-            "Дом и сад", "Спорт", "Игрушки", "Авто", "Книги"
-        ]
-        cats = [Category.objects.get_or_create(name=name)[0] for name in category_names]
-
-        deal_titles = {
-            "Электроника": ["Скидка на смартфоны", "Уценка телевизоров", "Ноутбуки по акции"],
-            "Одежда": ["Распродажа футболок", "Скидки на куртки", "Платья по суперцене"],
-            "Обувь": ["Кроссовки со скидкой", "Сапоги по акции", "Туфли по спеццене"],
-            "Продукты": ["Скидка на кофе", "Сыры по акции", "Фрукты по выгодной цене"],
-            "Красота и здоровье": ["Скидки на косметику", "Парфюм по акции", "Витамины по суперцене"],
-            "Дом и сад": ["Мебель со скидкой", "Акция на посуду", "Садовые товары по суперцене"],
-            "Спорт": ["Скидка на велосипеды", "Тренажёры по акции", "Спортивная одежда со скидкой"],
-            "Игрушки": ["Конструкторы по суперцене", "Куклы со скидкой", "Настольные игры по акции"],
-            "Авто": ["Автоаксессуары со скидкой", "Шины по акции", "Масла и жидкости по суперцене"],
-            "Книги": ["Бестселлеры по акции", "Учебники со скидкой", "Фэнтези по суперцене"],
-        }
-
-        deals = []
-        now = timezone.now()
-        for i in range(1, 31):
-            orig = Decimal(random.randint(500, 5000))
-            disc = orig * Decimal(random.choice([0.5, 0.6, 0.7]))
-            image_url = get_image_url(i)
-
-            cat = random.choice(cats)
-            title = random.choice(deal_titles.get(cat.name, [f"Специальное предложение {i}"]))
-
-            d, _ = Deal.objects.get_or_create(
-                title=title,
-                merchant=random.choice(partners),
-                defaults={
-                    "price_original": orig,
-                    "price_discount": disc,
-                    "starts_at": now,
-                    "expires_at": now + timezone.timedelta(days=random.randint(5, 45)),
-                    "image_url": image_url
-                }
-            )
-            DealCategory.objects.get_or_create(deal=d, category=cat)
-            for c in random.sample(cats, k=1):
-                DealCategory.objects.get_or_create(deal=d, category=c)
+        for n in ["user", "partner", "admin"]:
+            Role.objects.get_or_create(name=n)
+        cats = [Category.objects.get_or_create(name=name)[0] for name in DEAL_TITLES]
+
+        user_ids = self.create_users(options["users"])
+        merchant_ids = self.create_merchants(options["merchants"], user_ids)
+        deal_ids = self.create_deals(options["deals"], merchant_ids, cats)
 
-            deals.append(d)
+        # Популярность: случайный порядок + распределение Ципфа
+        hot_deals = deal_ids[:]
+        self.rng.shuffle(hot_deals)
+        hot_weights = zipf_weights(len(hot_deals))
+
+        if options["favorites"]:
+            self.create_favorites(options["favorites"], hot_deals, hot_weights, user_ids)
+        if options["coupons"]:
+            self.create_coupons(options["coupons"], hot_deals, hot_weights, user_ids)
+
+        self.stdout.write("Пересчёт счётчиков...")
+        counters.recount()
+        favorites.recount()
+        if not options["skip_index"]:
+            self.stdout.write("Пересборка поискового индекса...")
+            search.rebuild()
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"✅ База успешно наполнена: {len(deals)} акций, {len(users)} пользователей, {len(partners)} партнёров"
+                f"✅ База успешно наполнена: {len(deal_ids)} акций, {len(user_ids)} пользователей, "
+                f"{len(merchant_ids)} партнёров за {time.monotonic() - started:.1f} с"
             )
         )
+
+    def flush(self):
+        """Удаляет то, что создаёт команда.
+
+        Без сигналов на каждую строку: зависимые таблицы чистятся раньше
+        акций и партнёров, а счётчики и поисковый индекс команда
+        пересчитывает после наполнения.
+        """
+        Favorite = Deal.favorited_by.through
+        with transaction.atomic():
+            for model in (
+                Coupon, SimilarDeal, Favorite, DealCategory, MerchantDailyStats, Watermark, Deal, DealArchive, Merchant,
+            ):
+                qs = model.objects.all()
+                qs._raw_delete(qs.db)
+            User.objects.filter(username__regex=r"^user\d+$").delete()
+        self.stdout.write("Старые данные удалены")
+
+    def insert(self, label, model, total, make_batch, after=None, **kwargs):
+        """Вставляет total строк пачками; make_batch(size) возвращает объекты пачки.
+
+        after(objs) вызывается в той же транзакции, что и вставка пачки.
+        """
+        created = []
+        done = 0
+        started = time.monotonic()
+        while done < total:
+            size = min(self.batch_size, total - done)
+            with transaction.atomic():
+                objs = model.objects.bulk_create(make_batch(size), batch_size=self.batch_size, **kwargs)
+                if after is not None:
+                    after(objs)
+            created.extend(o.pk for o in objs)
+            done += size
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"  {label}: {done}/{total} ({done / elapsed if elapsed else done:.0f} строк/с)"
+            )
+            self.stdout.flush()
+        return created
+
+    def create_users(self, total):
+        password = make_password("test12345")
+        offset = User.objects.filter(username__startswith="user").count()
+        counter = iter(range(offset + 1, offset + total + 1))
+
+        def batch(size):
+            users = []
+            for _ in range(size):
+                i = next(counter)
+                users.append(User(username=f"user{i}", email=f"user{i}@example.com", password=password))
+            return users
+
+        return self.insert("пользователи", User, total, batch)
+
+    def create_merchants(self, total, user_ids):
+        # С --append имена продолжают нумерацию, а не повторяются
+        offset = Merchant.objects.count()
+        counter = iter(range(offset, offset + total))
+
+        def batch(size):
+            merchants = []
+            for _ in range(size):
+                i = next(counter)
+                name = PARTNER_NAMES[i % len(PARTNER_NAMES)]
+                if i >= len(PARTNER_NAMES):
+                    name = f"{name} {i // len(PARTNER_NAMES) + 1}"
+                merchants.append(Merchant(
+                    name=name,
+                    contact=f"partner{i + 1}@example.com",
+                    user_id=self.rng.choice(user_ids),
+                ))
+            return merchants
+
+        return self.insert("партнёры", Merchant, total, batch)
+
+    def create_deals(self, total, merchant_ids, cats):
+        cat_weights = zipf_weights(len(cats), s=0.8)
+        merchant_weights = zipf_weights(len(merchant_ids))
+        counter = iter(range(1, total + 1))
+        links = []
+
+        def batch(size):
+            deals = []
+            for _ in range(size):
+                i = next(counter)
+                cat = self.rng.choices(cats, cum_weights=cat_weights)[0]
+                orig = Decimal(self.rng.randint(500, 5000))
+                disc = (orig * Decimal(self.rng.choice(["0.5", "0.6", "0.7", "0.8", "0.9"]))).quantize(Decimal("0.01"))
+                # Акции разбросаны по последнему году: часть уже закончилась
+                starts = self.now - timezone.timedelta(minutes=self.rng.randint(0, 365 * 24 * 60))
+                deal = Deal(
+                    title=f"{self.rng.choice(DEAL_TITLES[cat.name])} #{i}",
+                    merchant_id=self.rng.choices(merchant_ids, cum_weights=merchant_weights)[0],
+                    price_original=orig,
+                    price_discount=disc,
+                    starts_at=starts,
+                    expires_at=starts + timezone.timedelta(days=self.rng.randint(5, 90)),
+                    image_url=f"https://picsum.photos/seed/deal{i}/600/400",
+                )
+                extra = self.rng.choices(cats, cum_weights=cat_weights)[0]
+                links.append((deal, {cat, extra}))
+                deals.append(deal)
+            return deals
+
+        def add_categories(deals):
+            DealCategory.objects.bulk_create(
+                [DealCategory(deal_id=deal.pk, category_id=c.pk) for deal, deal_cats in links for c in deal_cats],
+                batch_size=self.batch_size,
+            )
+            links.clear()
+            # bulk_create ставит created_at «сейчас» (auto_now_add); разбрасываем по времени
+            for deal in deals:
+                deal.created_at = deal.starts_at
+            Deal.objects.bulk_update(deals, ["created_at"], batch_size=self.batch_size)
+
+        return self.insert("акции", Deal, total, batch, after=add_categories)
+
+    def create_favorites(self, total, hot_deals, hot_weights, user_ids):
+        Favorite = Deal.favorited_by.through
+
+        def batch(size):
+            pairs = {
+                (deal_id, self.rng.choice(user_ids))
+                for deal_id in self.rng.choices(hot_deals, cum_weights=hot_weights, k=size)
+            }
+            return [Favorite(deal_id=d, user_id=u) for d, u in pairs]
+
+        # Повторные пары пропускаются, поэтому строк может быть чуть меньше total
+        self.insert("избранное", Favorite, total, batch, ignore_conflicts=True)
+
+    def create_coupons(self, total, hot_deals, hot_weights, user_ids):
+        last = Coupon.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+        counter = iter(range(last + 1, last + total + 1))
+
+        def batch(size):
+            result = []
+            for deal_id in self.rng.choices(hot_deals, cum_weights=hot_weights, k=size):
+                n = next(counter)
+                roll = self.rng.random()
+                coupon = Coupon(
+                    code=seed_code(n),
+                    deal_id=deal_id,
+                    # Около 10% купонов лежат невыданными в пуле акции
+                    user_id=self.rng.choice(user_ids) if roll > 0.1 else None,
+                )
+                if roll > 0.7:
+                    coupon.status = "redeemed"
+                    coupon.redeemed_at = self.now - timezone.timedelta(minutes=self.rng.randint(0, 60 * 24 * 90))
+                result.append(coupon)
+            return result
+
+        def backdate(objs):
+            # issued_at от --now, а не от часов; погашенные выданы за день до погашения
+            batch_coupons = Coupon.objects.filter(pk__in=[c.pk for c in objs])
+            batch_coupons.update(issued_at=self.now)
+            batch_coupons.filter(redeemed_at__isnull=False).update(issued_at=F("redeemed_at") - timezone.timedelta(days=1))
+
+        self.insert("купоны", Coupon, total, batch, after=backdate)
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from discounts import expiry
+
+
+class Command(BaseCommand):
+    help = "Истекает купоны закончившихся акций и архивирует сами акции"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=expiry.CHUNK_SIZE)
+        parser.add_argument(
+            "--pause", type=float, default=0,
+            help="Пауза между порциями, с",
+        )
+        parser.add_argument(
+            "--every", type=int, default=0,
+            help="Повторять каждые N секунд (для запуска как фонового процесса)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            stats = expiry.sweep(chunk_size=options["chunk_size"], pause=options["pause"])
+            rows = stats["deals"] + stats["coupons"]
+            rate = rows / stats["seconds"] if stats["seconds"] else rows
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✅ В архив: {stats['deals']} акций, истекло купонов: {stats['coupons']} "
+                    f"за {stats['seconds']:.2f} с ({rate:.0f} строк/с)"
+                )
+            )
+            if not options["every"]:
+                break
+            time.sleep(options["every"])
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:55
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0003_deal_favorited_by'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deal',
+            name='discount_pct',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(price_original__gt=0, then=django.db.models.functions.comparison.Cast(django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(models.Value(100.0), '-', django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('price_discount'), '*', models.Value(100.0)), '/', models.F('price_original'))), output_field=models.FloatField()), models.IntegerField())), default=models.Value(0)), output_field=models.IntegerField(), verbose_name='Скидка (%)'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['-discount_pct', '-id'], name='deal_discount_pct_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+def normalize(text):
+    return (text or "").casefold().replace("ё", "е")
+
+
+def populate(apps, schema_editor):
+    Deal = apps.get_model("discounts", "Deal")
+    Merchant = apps.get_model("discounts", "Merchant")
+    Category = apps.get_model("discounts", "Category")
+    rows = []
+    for m in Merchant.objects.all():
+        rows.append((m.pk * 4 + 1, normalize(m.name), normalize(m.contact)))
+    for c in Category.objects.all():
+        rows.append((c.pk * 4 + 2, normalize(c.name), ""))
+    for d in Deal.objects.select_related("merchant").prefetch_related("categories"):
+        body = " ".join([d.description or "", d.merchant.name] + [c.name for c in d.categories.all()])
+        rows.append((d.pk * 4, normalize(d.title), normalize(body)))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO discounts_search (rowid, title, body) VALUES (%s, %s, %s)", rows
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0004_deal_discount_pct'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE VIRTUAL TABLE discounts_search USING fts5("
+            "title, body, tokenize = 'unicode61 remove_diacritics 2')",
+            "DROP TABLE discounts_search",
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
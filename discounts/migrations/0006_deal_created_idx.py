@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0005_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(fields=['-created_at', '-id'], name='deal_created_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:59
+
+from django.db import migrations, models
+from django.db.models import Q
+from django.utils import timezone
+
+
+def backfill(apps, schema_editor):
+    Category = apps.get_model("discounts", "Category")
+    DealCategory = apps.get_model("discounts", "DealCategory")
+    now = timezone.now()
+    active = (
+        (Q(deal__starts_at__isnull=True) | Q(deal__starts_at__lte=now))
+        & (Q(deal__expires_at__isnull=True) | Q(deal__expires_at__gt=now))
+    )
+    for category in Category.objects.all():
+        links = DealCategory.objects.filter(category=category)
+        category.deals_count = links.count()
+        category.active_deals_count = links.filter(active).count()
+        category.save(update_fields=["deals_count", "active_deals_count"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0006_deal_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='active_deals_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Активных акций'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='deals_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Всего акций'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['-active_deals_count', 'id'], name='category_active_count_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
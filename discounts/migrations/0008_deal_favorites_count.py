@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill(apps, schema_editor):
+    Deal = apps.get_model("discounts", "Deal")
+    Favorite = Deal.favorited_by.through
+    counts = (
+        Favorite.objects.filter(deal_id=OuterRef("pk"))
+        .order_by().values("deal_id").annotate(n=Count("pk")).values("n")
+    )
+    Deal.objects.update(
+        favorites_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0007_category_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deal',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
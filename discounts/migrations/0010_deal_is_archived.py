@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0009_coupon_pool'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='deal',
+            name='deal_discount_pct_idx',
+        ),
+        migrations.AddField(
+            model_name='deal',
+            name='is_archived',
+            field=models.BooleanField(default=False, verbose_name='В архиве'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['-discount_pct', '-id'], name='deal_discount_pct_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['expires_at'], name='deal_live_expires_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0010_deal_is_archived'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deal',
+            name='external_id',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Внешний ID'),
+        ),
+        migrations.AddConstraint(
+            model_name='deal',
+            constraint=models.UniqueConstraint(fields=('merchant', 'external_id'), name='deal_merchant_external_id_uniq'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:17
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill(apps, schema_editor):
+    # Иначе у всех существующих акций дата изменения — момент миграции
+    Deal = apps.get_model("discounts", "Deal")
+    Deal.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0011_deal_external_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deal',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
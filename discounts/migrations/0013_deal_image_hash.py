@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0012_deal_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deal',
+            name='image_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='Хэш картинки'),
+        ),
+        migrations.AddField(
+            model_name='deal',
+            name='image_source',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200, verbose_name='Источник миниатюр'),
+        ),
+    ]
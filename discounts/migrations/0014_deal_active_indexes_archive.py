@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0013_deal_image_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DealArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID акции')),
+                ('title', models.CharField(max_length=255, verbose_name='Название предложения')),
+                ('price_original', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена без скидки')),
+                ('price_discount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена со скидкой')),
+                ('starts_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата начала')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата окончания')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата изменения')),
+                ('image_url', models.URLField(blank=True, default='', verbose_name='Картинка (URL)')),
+                ('image_hash', models.CharField(blank=True, default='', max_length=64, verbose_name='Хэш картинки')),
+                ('image_source', models.CharField(blank=True, default='', max_length=200, verbose_name='Источник миниатюр')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='Описание продукта')),
+                ('favorites_count', models.PositiveIntegerField(default=0, verbose_name='В избранном')),
+                ('external_id', models.CharField(blank=True, max_length=100, null=True, verbose_name='Внешний ID')),
+                ('related', models.JSONField(default=dict, verbose_name='Связи')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата переноса в архив')),
+            ],
+            options={
+                'verbose_name': 'Акция в архиве',
+                'verbose_name_plural': 'Архив акций',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='deal',
+            name='deal_discount_pct_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='deal',
+            name='deal_live_expires_idx',
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['-discount_pct', '-id', 'expires_at', 'starts_at'], name='deal_active_discount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['expires_at', 'starts_at'], name='deal_active_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deal',
+            index=models.Index(condition=models.Q(('is_archived', False)), fields=['-created_at', '-id', 'expires_at', 'starts_at'], name='deal_active_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='dealarchive',
+            name='merchant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='discounts.merchant', verbose_name='Партнёр'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0014_deal_active_indexes_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarDeal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('source', models.CharField(choices=[('favorites', 'Общее избранное'), ('categories', 'Общие категории')], max_length=20, verbose_name='Источник')),
+                ('deal', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='discounts.deal', verbose_name='Предложение')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='discounts.deal', verbose_name='Похожее предложение')),
+            ],
+            options={
+                'verbose_name': 'Похожее предложение',
+                'verbose_name_plural': 'Похожие предложения',
+                'constraints': [models.UniqueConstraint(fields=('deal', 'rank'), name='similar_deal_rank_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0015_similar_deals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MerchantDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('coupons_issued', models.PositiveIntegerField(default=0, verbose_name='Выдано купонов')),
+                ('coupons_redeemed', models.PositiveIntegerField(default=0, verbose_name='Погашено купонов')),
+                ('favorites', models.PositiveIntegerField(blank=True, null=True, verbose_name='В избранном')),
+            ],
+            options={
+                'verbose_name': 'Итоги партнёра за день',
+                'verbose_name_plural': 'Итоги партнёров по дням',
+            },
+        ),
+        migrations.CreateModel(
+            name='Watermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Задача')),
+                ('value', models.DateTimeField(verbose_name='Обработано до')),
+            ],
+            options={
+                'verbose_name': 'Отметка обработки',
+                'verbose_name_plural': 'Отметки обработки',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(condition=models.Q(('user__isnull', False)), fields=['issued_at'], name='coupon_issued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(condition=models.Q(('redeemed_at__isnull', False)), fields=['redeemed_at'], name='coupon_redeemed_idx'),
+        ),
+        migrations.AddField(
+            model_name='merchantdailystats',
+            name='merchant',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='discounts.merchant', verbose_name='Партнёр'),
+        ),
+        migrations.AddConstraint(
+            model_name='merchantdailystats',
+            constraint=models.UniqueConstraint(fields=('merchant', 'day'), name='merchant_stats_day_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discounts', '0016_merchant_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата изменения'),
+        ),
+    ]
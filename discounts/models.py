@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models import Case, Exists, F, OuterRef, Q, Value, When
+from django.db.models.functions import Cast, Round
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -29,14 +32,40 @@ class Merchant(models.Model):
 
 class Category(models.Model):
     name = models.CharField("Категория", max_length=100, unique=True)
+    # Счётчики поддерживаются сигналами и командой reconcile_category_counts
+    deals_count = models.PositiveIntegerField("Всего акций", default=0, editable=False)
+    active_deals_count = models.PositiveIntegerField("Активных акций", default=0, editable=False)
 
     class Meta:
         verbose_name = "Категория"
         verbose_name_plural = "Категории"
+        indexes = [
+            models.Index(fields=["-active_deals_count", "id"], name="category_active_count_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
+def active_deal_q(prefix="", now=None):
+    """Условие «акция действует сейчас» для запросов от модели с путём prefix"""
+    now = now or timezone.now()
+    return (
+        (Q(**{f"{prefix}starts_at__isnull": True}) | Q(**{f"{prefix}starts_at__lte": now}))
+        & (Q(**{f"{prefix}expires_at__isnull": True}) | Q(**{f"{prefix}expires_at__gt": now}))
+    )
+
+
+class DealQuerySet(models.QuerySet):
+    def active(self, now=None):
+        """Действующие акции; идёт по частичным индексам is_archived = false"""
+        return self.filter(active_deal_q(now=now), is_archived=False)
+
+    def in_category(self, category):
+        """Акции категории без JOIN: с EXISTS SQLite идёт по индексу сортировки
+        (deal_active_created_idx) и не сортирует все связи категории"""
+        return self.filter(Exists(DealCategory.objects.filter(category=category, deal=OuterRef("pk"))))
+
+
 class Deal(models.Model):
     title = models.CharField("Название предложения", max_length=255)
     merchant = models.ForeignKey(Merchant, on_delete=models.CASCADE, verbose_name="Партнёр")
@@ -45,18 +74,79 @@ class Deal(models.Model):
     starts_at = models.DateTimeField("Дата начала", null=True, blank=True)
     expires_at = models.DateTimeField("Дата окончания", null=True, blank=True)
     created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+    # Меняется при любом изменении данных, которые отдаёт API (см. discounts/api.py);
+    # bulk_update и update() должны проставлять его явно
+    updated_at = models.DateTimeField("Дата изменения", auto_now=True, db_index=True)
     categories = models.ManyToManyField("Category", through="DealCategory", verbose_name="Категории")
     image_url = models.URLField("Картинка (URL)", blank=True, default="")
+    # Хэш миниатюр в MEDIA_ROOT (discounts/images.py) и image_url, из которого
+    # они сделаны: после смены image_url старые миниатюры не показываются
+    image_hash = models.CharField("Хэш картинки", max_length=64, blank=True, default="", editable=False)
+    image_source = models.CharField("Источник миниатюр", max_length=200, blank=True, default="", editable=False)
     description = models.TextField("Описание продукта", blank=True, null=True)
     favorited_by = models.ManyToManyField(User, related_name="favorite_deals", blank=True, verbose_name="Добавили в избранное")
+    # Поддерживается сигналом m2m_changed, см. discounts/favorites.py
+    favorites_count = models.PositiveIntegerField("В избранном", default=0, editable=False)
+    # Ставится командой sweep_expired у закончившихся акций; давно закончившиеся
+    # команда archive_deals переносит в DealArchive
+    is_archived = models.BooleanField("В архиве", default=False)
+    # Идентификатор акции в фиде партнёра, по нему import_deals обновляет акции
+    external_id = models.CharField("Внешний ID", max_length=100, blank=True, null=True)
+    # Процент скидки считается самой БД, чтобы сортировка шла по индексу
+    discount_pct = models.GeneratedField(
+        expression=Case(
+            When(
+                price_original__gt=0,
+                then=Cast(
+                    Round(
+                        Value(100.0) - F("price_discount") * Value(100.0) / F("price_original"),
+                        output_field=models.FloatField(),
+                    ),
+                    models.IntegerField(),
+                ),
+            ),
+            default=Value(0),
+        ),
+        output_field=models.IntegerField(),
+        db_persist=True,
+        verbose_name="Скидка (%)",
+    )
+
+    objects = DealQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Предложение"
         verbose_name_plural = "Предложения"
+        indexes = [
+            # Индексы active(): даты в хвосте индекса, чтобы условие по ним
+            # проверялось без чтения строк таблицы
+            models.Index(
+                fields=["-discount_pct", "-id", "expires_at", "starts_at"], name="deal_active_discount_idx",
+                condition=models.Q(is_archived=False),
+            ),
+            models.Index(
+                fields=["expires_at", "starts_at"], name="deal_active_expires_idx",
+                condition=models.Q(is_archived=False),
+            ),
+            models.Index(
+                fields=["-created_at", "-id", "expires_at", "starts_at"], name="deal_active_created_idx",
+                condition=models.Q(is_archived=False),
+            ),
+            # Ключ keyset-пагинации списков
+            models.Index(fields=["-created_at", "-id"], name="deal_created_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["merchant", "external_id"], name="deal_merchant_external_id_uniq"),
+        ]
 
     def __str__(self):
         return self.title
 
+    @property
+    def thumb_hash(self):
+        """Хэш миниатюр, если они сделаны из текущего image_url"""
+        return self.image_hash if self.image_hash and self.image_source == self.image_url else ""
+
     def discount_percent(self):
         """Возвращает целый процент скидки"""
         if self.price_original and self.price_original > 0:
@@ -64,9 +154,37 @@ class Deal(models.Model):
             return int(round(discount))
         return 0
 
-    @property
-    def discount_pct(self):
-        return self.discount_percent()
+class DealArchive(models.Model):
+    """Давно закончившаяся акция, вынесенная из Deal (discounts/archive.py).
+
+    Первичный ключ тот же, что был у акции, поэтому restore() возвращает её
+    по прежнему адресу. Категории, избранное и купоны хранятся в related.
+    """
+    id = models.BigIntegerField("ID акции", primary_key=True)
+    title = models.CharField("Название предложения", max_length=255)
+    merchant = models.ForeignKey(Merchant, on_delete=models.CASCADE, verbose_name="Партнёр")
+    price_original = models.DecimalField("Цена без скидки", max_digits=10, decimal_places=2)
+    price_discount = models.DecimalField("Цена со скидкой", max_digits=10, decimal_places=2)
+    starts_at = models.DateTimeField("Дата начала", null=True, blank=True)
+    expires_at = models.DateTimeField("Дата окончания", null=True, blank=True)
+    created_at = models.DateTimeField("Дата создания")
+    updated_at = models.DateTimeField("Дата изменения")
+    image_url = models.URLField("Картинка (URL)", blank=True, default="")
+    image_hash = models.CharField("Хэш картинки", max_length=64, blank=True, default="")
+    image_source = models.CharField("Источник миниатюр", max_length=200, blank=True, default="")
+    description = models.TextField("Описание продукта", blank=True, null=True)
+    favorites_count = models.PositiveIntegerField("В избранном", default=0)
+    external_id = models.CharField("Внешний ID", max_length=100, blank=True, null=True)
+    related = models.JSONField("Связи", default=dict)
+    archived_at = models.DateTimeField("Дата переноса в архив", auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Акция в архиве"
+        verbose_name_plural = "Архив акций"
+
+    def __str__(self):
+        return self.title
+
 
 class DealCategory(models.Model):
     deal = models.ForeignKey(Deal, on_delete=models.CASCADE)
@@ -83,15 +201,82 @@ class DealCategory(models.Model):
 class Coupon(models.Model):
     STATUS_CHOICES = [("active", "Активен"), ("redeemed", "Использован"), ("expired", "Истёк")]
     code = models.CharField("Код купона", max_length=50, unique=True)
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Пользователь")
+    # Пустой user — купон выпущен в пул акции и ещё никому не выдан
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, verbose_name="Пользователь")
     deal = models.ForeignKey(Deal, on_delete=models.CASCADE, verbose_name="Предложение")
     status = models.CharField("Статус", max_length=20, choices=STATUS_CHOICES, default="active")
     issued_at = models.DateTimeField("Дата выдачи", auto_now_add=True)
     redeemed_at = models.DateTimeField("Дата использования", null=True, blank=True)
+    # Когда купон последний раз выдали, погасили или истекли (для выгрузки с since).
+    # Ставится явно в тех же update(); у купонов, не менявшихся после создания, пусто
+    updated_at = models.DateTimeField("Дата изменения", null=True, blank=True)
 
     class Meta:
         verbose_name = "Купон"
         verbose_name_plural = "Купоны"
+        indexes = [
+            # Поиск свободного купона в пуле акции
+            models.Index(fields=["deal", "user"], name="coupon_deal_user_idx"),
+            # Окна свежих строк для дневных итогов (discounts/rollups.py)
+            models.Index(fields=["issued_at"], name="coupon_issued_idx", condition=models.Q(user__isnull=False)),
+            models.Index(fields=["redeemed_at"], name="coupon_redeemed_idx", condition=models.Q(redeemed_at__isnull=False)),
+        ]
+
+    def __str__(self):
+        return f"{self.code} ({self.status})"
+
+class SimilarDeal(models.Model):
+    """Похожие акции, посчитанные командой build_similar (discounts/similar.py)"""
+    SOURCE_CHOICES = [("favorites", "Общее избранное"), ("categories", "Общие категории")]
+    # Отдельный индекс по deal не нужен: его заменяет similar_deal_rank_uniq
+    deal = models.ForeignKey(Deal, on_delete=models.CASCADE, related_name="+", db_index=False, verbose_name="Предложение")
+    similar = models.ForeignKey(Deal, on_delete=models.CASCADE, related_name="similar_to", verbose_name="Похожее предложение")
+    rank = models.PositiveSmallIntegerField("Место")
+    score = models.FloatField("Сходство")
+    source = models.CharField("Источник", max_length=20, choices=SOURCE_CHOICES)
+
+    class Meta:
+        verbose_name = "Похожее предложение"
+        verbose_name_plural = "Похожие предложения"
+        constraints = [
+            # По нему страница акции читает соседей по порядку
+            models.UniqueConstraint(fields=["deal", "rank"], name="similar_deal_rank_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.deal_id} → {self.similar_id}"
+
+
+class MerchantDailyStats(models.Model):
+    """Дневные итоги партнёра, их копит команда rollup_stats (discounts/rollups.py)"""
+    # Отдельный индекс по merchant не нужен: его заменяет merchant_stats_day_uniq
+    merchant = models.ForeignKey(Merchant, on_delete=models.CASCADE, related_name="+", db_index=False, verbose_name="Партнёр")
+    day = models.DateField("День")
+    coupons_issued = models.PositiveIntegerField("Выдано купонов", default=0)
+    coupons_redeemed = models.PositiveIntegerField("Погашено купонов", default=0)
+    # Сумма favorites_count акций партнёра при последнем запуске за день;
+    # пусто, если в этот день rollup_stats не запускался
+    favorites = models.PositiveIntegerField("В избранном", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Итоги партнёра за день"
+        verbose_name_plural = "Итоги партнёров по дням"
+        constraints = [
+            models.UniqueConstraint(fields=["merchant", "day"], name="merchant_stats_day_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.merchant_id} {self.day}"
+
+
+class Watermark(models.Model):
+    """До какого момента инкрементальная задача уже обработала строки"""
+    name = models.CharField("Задача", max_length=50, primary_key=True)
+    value = models.DateTimeField("Обработано до")
+
+    class Meta:
+        verbose_name = "Отметка обработки"
+        verbose_name_plural = "Отметки обработки"
 
     def __str__(self):
-        return f"{self.code} ({self.status})"
\ No newline at end of file
+        return f"{self.name}: {self.value}"
@@ -0,0 +1,67 @@
+"""Keyset-пагинация: страница выбирается по ключу последней строки, а не по OFFSET"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+PAGE_SIZE = 24
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Разбирает токен страницы; испорченный токен означает первую страницу"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) and len(values) == 2 else None
+
+
+def paginate_by_created(queryset, cursor, page_size=PAGE_SIZE):
+    """Страница queryset в порядке (-created_at, -id).
+
+    Возвращает (объекты, токен следующей страницы или None).
+    Для .values() в выборке должны быть created_at и id.
+    Общее число строк не считается.
+    """
+    queryset = queryset.order_by("-created_at", "-id")
+    after = decode_cursor(cursor)
+    if after:
+        created_at, pk = parse_datetime(str(after[0])), after[1]
+        if created_at is not None and isinstance(pk, int):
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+    items = list(queryset[:page_size + 1])
+    if len(items) <= page_size:
+        return items, None
+    items = items[:page_size]
+    last = items[-1]
+    # queryset может быть и .values() со строками-словарями
+    created_at, pk = (last["created_at"], last["id"]) if isinstance(last, dict) else (last.created_at, last.pk)
+    return items, encode_cursor([created_at.isoformat(), pk])
+
+
+def paginate_ranked(fetch, cursor, page_size=PAGE_SIZE):
+    """Страница результатов поиска в порядке релевантности.
+
+    fetch(limit, after) возвращает [(id, score)] после пары after=(score, id).
+    Возвращает (список id, токен следующей страницы или None).
+    """
+    after = decode_cursor(cursor)
+    if after and not (isinstance(after[0], (int, float)) and isinstance(after[1], int)):
+        after = None
+    hits = fetch(page_size + 1, after)
+    if len(hits) <= page_size:
+        return [pk for pk, _ in hits], None
+    hits = hits[:page_size]
+    pk, score = hits[-1]
+    return [pk for pk, _ in hits], encode_cursor([score, pk])
@@ -0,0 +1,172 @@
+"""Дневные итоги партнёров: выданные и погашенные купоны, избранное.
+
+rollup() читает только купоны, выданные или погашенные после отметки
+Watermark(WATERMARK), и прибавляет их к строкам MerchantDailyStats.
+Окно заканчивается на SETTLE раньше текущего момента: issued_at и
+redeemed_at ставятся до коммита, и строки ещё не закрытых транзакций не
+должны оказаться позади отметки. Итоги окна и новая отметка пишутся
+в одной транзакции, а отметка сдвигается, только если она всё ещё там,
+откуда начато окно: из двух одновременных запусков окно учтёт один.
+
+У избранного нет времени добавления, поэтому в строку текущего дня
+пишется снимок суммы favorites_count по акциям партнёра, а прирост за
+день — разница соседних снимков. В сумму входят и акции в архиве, иначе
+перенос в архив выглядел бы как потеря избранного.
+"""
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Coupon, Deal, DealArchive, MerchantDailyStats, Watermark
+
+WATERMARK = "merchant_stats"
+SETTLE = timedelta(minutes=1)
+# Больше за один проход не берётся: первый запуск идёт по истории частями
+WINDOW = timedelta(days=7)
+DASHBOARD_DAYS = 90
+MAX_DAYS = 366
+BATCH_SIZE = 500
+
+# Поле времени → условие, при котором купон считается (оно же условие частичного индекса)
+EVENTS = {
+    "issued_at": {"user__isnull": False},
+    "redeemed_at": {},
+}
+
+
+def _counts(start, end):
+    """{(merchant_id, день): {поле: число купонов}} по событиям в окне (start, end]"""
+    counts = defaultdict(dict)
+    for field, condition in EVENTS.items():
+        rows = (
+            Coupon.objects.filter(**condition, **{f"{field}__gt": start, f"{field}__lte": end})
+            .order_by()
+            .values(merchant_id=F("deal__merchant_id"), day=TruncDate(field))
+            .annotate(n=Count("pk"))
+            .values_list("merchant_id", "day", "n")
+        )
+        for merchant_id, day, n in rows:
+            counts[merchant_id, day][field] = n
+    return counts
+
+
+def _add(counts):
+    """Прибавляет счётчики окна к дневным строкам"""
+    existing = {}
+    merchant_ids = sorted({merchant_id for merchant_id, _ in counts})
+    days = {day for _, day in counts}
+    for i in range(0, len(merchant_ids), BATCH_SIZE):
+        rows = MerchantDailyStats.objects.filter(
+            merchant_id__in=merchant_ids[i:i + BATCH_SIZE], day__range=(min(days), max(days)),
+        )
+        existing.update(((row.merchant_id, row.day), row) for row in rows if (row.merchant_id, row.day) in counts)
+
+    new = []
+    for (merchant_id, day), n in counts.items():
+        row = existing.get((merchant_id, day))
+        if row is None:
+            new.append(MerchantDailyStats(
+                merchant_id=merchant_id, day=day,
+                coupons_issued=n.get("issued_at", 0), coupons_redeemed=n.get("redeemed_at", 0),
+            ))
+        else:
+            row.coupons_issued += n.get("issued_at", 0)
+            row.coupons_redeemed += n.get("redeemed_at", 0)
+    MerchantDailyStats.objects.bulk_update(existing.values(), ["coupons_issued", "coupons_redeemed"], batch_size=BATCH_SIZE)
+    MerchantDailyStats.objects.bulk_create(new, batch_size=BATCH_SIZE)
+
+
+def _first_event():
+    """Время самого раннего события минус 1 мкс (окна открыты слева); None, если купонов нет"""
+    times = [
+        Coupon.objects.filter(**condition).aggregate(first=Min(field))["first"]
+        for field, condition in EVENTS.items()
+    ]
+    times = [t for t in times if t is not None]
+    return min(times) - timedelta(microseconds=1) if times else None
+
+
+def snapshot_favorites(day):
+    """Пишет в строки дня текущую сумму favorites_count по акциям каждого партнёра, включая архив"""
+    totals = Counter()
+    # В одной транзакции, чтобы акция, которую как раз переносят в архив, не посчиталась дважды
+    with transaction.atomic():
+        for model in (Deal, DealArchive):
+            rows = model.objects.order_by().values("merchant_id").annotate(n=Sum("favorites_count")).values_list("merchant_id", "n")
+            for merchant_id, n in rows:
+                totals[merchant_id] += n
+        MerchantDailyStats.objects.bulk_create(
+            [MerchantDailyStats(merchant_id=merchant_id, day=day, favorites=n) for merchant_id, n in totals.items()],
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=["merchant", "day"],
+            update_fields=["favorites"],
+        )
+
+
+def rollup(now=None):
+    """Доводит итоги до now - SETTLE и снимает избранное. Возвращает словарь со статистикой"""
+    now = now or timezone.now()
+    end = now - SETTLE
+    stats = {"windows": 0, "rows": 0, "conflict": False, "seconds": 0.0}
+    started = time.monotonic()
+
+    start = updated_until()
+    if start is None:
+        # Одновременный первый запуск получит ту же строку, а не вторую отметку
+        mark, _ = Watermark.objects.get_or_create(name=WATERMARK, defaults={"value": _first_event() or end})
+        start = mark.value
+    while True:
+        stop = min(start + WINDOW, end)
+        with transaction.atomic():
+            # Сначала отметка: параллельный запуск ждёт её блокировку и потом не найдёт start
+            if not Watermark.objects.filter(name=WATERMARK, value=start).update(value=max(start, stop)):
+                stats["conflict"] = True
+                break
+            if stop > start:
+                counts = _counts(start, stop)
+                _add(counts)
+                stats["rows"] += len(counts)
+                stats["windows"] += 1
+        if stop >= end:
+            break
+        start = stop
+
+    snapshot_favorites(timezone.localdate(now))
+    stats["seconds"] = time.monotonic() - started
+    return stats
+
+
+def dashboard(merchant, days=DASHBOARD_DAYS, today=None):
+    """Строки за последние days дней по возрастанию дат и итоги за период.
+
+    У строк есть favorites_added — прирост избранного с предыдущего снимка
+    в периоде (None, если сравнивать не с чем).
+    """
+    today = today or timezone.localdate()
+    rows = list(
+        MerchantDailyStats.objects.filter(merchant=merchant, day__gt=today - timedelta(days=days)).order_by("day")
+    )
+    previous = None
+    for row in rows:
+        row.favorites_added = None
+        if row.favorites is not None:
+            if previous is not None:
+                row.favorites_added = row.favorites - previous
+            previous = row.favorites
+    totals = {
+        "coupons_issued": sum(row.coupons_issued for row in rows),
+        "coupons_redeemed": sum(row.coupons_redeemed for row in rows),
+        "favorites": previous,
+    }
+    return rows, totals
+
+
+def updated_until():
+    """До какого момента учтены купоны; None, если rollup ещё не запускался"""
+    return Watermark.objects.filter(name=WATERMARK).values_list("value", flat=True).first()
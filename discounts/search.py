@@ -0,0 +1,160 @@
+"""Полнотекстовый поиск по акциям, партнёрам и категориям (SQLite FTS5)"""
+import re
+
+from django.db import connection, transaction
+
+from .models import Deal, Merchant, Category
+
+TABLE = "discounts_search"
+
+# Каждый объект занимает одну строку индекса; тип зашит в rowid,
+# чтобы обновление и удаление шли по первичному ключу, а не сканом
+KIND_DEAL, KIND_MERCHANT, KIND_CATEGORY = 0, 1, 2
+_KINDS = 4
+
+# Вес заголовка в bm25 выше, чем у остального текста
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text):
+    """Приводит текст к виду, в котором он хранится в индексе"""
+    return (text or "").casefold().replace("ё", "е")
+
+
+def _rowid(kind, pk):
+    return pk * _KINDS + kind
+
+
+def build_match(q):
+    """Строит выражение MATCH: каждое слово ищется по префиксу"""
+    words = _WORD_RE.findall(normalize(q))
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def _write(rows):
+    """Заменяет строки индекса; rows — список (rowid, title, body)"""
+    if not rows:
+        return
+    # Одна транзакция на пачку: в autocommit каждая строка стоила бы fsync
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(r[0],) for r in rows])
+        cursor.executemany(
+            f"INSERT INTO {TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+            [(rowid, normalize(title), normalize(body)) for rowid, title, body in rows],
+        )
+
+
+def _remove(rowids):
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(r,) for r in rowids])
+
+
+def _deal_rows(deal_ids):
+    deals = (
+        Deal.objects.filter(pk__in=deal_ids)
+        .select_related("merchant")
+        .prefetch_related("categories")
+    )
+    rows = []
+    for deal in deals:
+        body = " ".join(
+            [deal.description or "", deal.merchant.name]
+            + [c.name for c in deal.categories.all()]
+        )
+        rows.append((_rowid(KIND_DEAL, deal.pk), deal.title, body))
+    return rows
+
+
+def index_deals(deal_ids):
+    """Переиндексирует акции (включая имя партнёра и категории)"""
+    deal_ids = list(deal_ids)
+    if not deal_ids:
+        return
+    rows = _deal_rows(deal_ids)
+    found = {r[0] for r in rows}
+    _remove([_rowid(KIND_DEAL, pk) for pk in deal_ids if _rowid(KIND_DEAL, pk) not in found])
+    _write(rows)
+
+
+def index_merchant(merchant):
+    _write([(_rowid(KIND_MERCHANT, merchant.pk), merchant.name, merchant.contact or "")])
+    index_deals(Deal.objects.filter(merchant=merchant).values_list("pk", flat=True))
+
+
+def index_category(category):
+    _write([(_rowid(KIND_CATEGORY, category.pk), category.name, "")])
+    index_deals(Deal.objects.filter(categories=category).values_list("pk", flat=True))
+
+
+def remove_deal(pk):
+    _remove([_rowid(KIND_DEAL, pk)])
+
+
+def remove_merchant(pk):
+    _remove([_rowid(KIND_MERCHANT, pk)])
+
+
+def remove_category(pk):
+    _remove([_rowid(KIND_CATEGORY, pk)])
+
+
+def rebuild(batch_size=1000):
+    """Полностью пересобирает индекс. Возвращает число проиндексированных строк"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+    total = 0
+    for merchant in Merchant.objects.only("pk", "name", "contact").iterator():
+        _write([(_rowid(KIND_MERCHANT, merchant.pk), merchant.name, merchant.contact or "")])
+        total += 1
+    for category in Category.objects.only("pk", "name").iterator():
+        _write([(_rowid(KIND_CATEGORY, category.pk), category.name, "")])
+        total += 1
+    ids = list(Deal.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(ids), batch_size):
+        rows = _deal_rows(ids[start:start + batch_size])
+        _write(rows)
+        total += len(rows)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return total
+
+
+def search(q, kind, limit, after=None):
+    """Возвращает [(id, score)] объектов типа kind по убыванию релевантности (bm25).
+
+    after — пара (score, id) последней строки предыдущей страницы.
+    """
+    match = build_match(q)
+    if not match:
+        return []
+    score = f"bm25({TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT})"
+    sql = (
+        f"SELECT rowid, {score} AS score FROM {TABLE} "
+        f"WHERE {TABLE} MATCH %s AND rowid %% {_KINDS} = %s"
+    )
+    params = [match, kind]
+    if after is not None:
+        sql += " AND (score > %s OR (score = %s AND rowid > %s))"
+        params += [after[0], after[0], _rowid(kind, after[1])]
+    sql += " ORDER BY score, rowid LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(rowid // _KINDS, score) for rowid, score in cursor.fetchall()]
+
+
+def count(q, kind, limit):
+    """Число совпадений типа kind, но не больше limit"""
+    match = build_match(q)
+    if not match:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM {TABLE} "
+            f"WHERE {TABLE} MATCH %s AND rowid %% {_KINDS} = %s LIMIT %s)",
+            [match, kind, limit],
+        )
+        return cursor.fetchone()[0]
@@ -0,0 +1,162 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import api, counters, favorites, search, suggest
+from .caching import invalidate_home
+from .models import Deal, Merchant, Category, DealCategory
+
+
+@receiver(post_save, sender=Deal)
+def deal_saved(sender, instance, **kwargs):
+    search.index_deals([instance.pk])
+
+
+@receiver(post_delete, sender=Deal)
+def deal_deleted(sender, instance, **kwargs):
+    search.remove_deal(instance.pk)
+
+
+@receiver(post_save, sender=Merchant)
+def merchant_saved(sender, instance, **kwargs):
+    search.index_merchant(instance)
+
+
+@receiver(post_delete, sender=Merchant)
+def merchant_deleted(sender, instance, **kwargs):
+    search.remove_merchant(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    search.index_category(instance)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    search.remove_category(instance.pk)
+
+
+@receiver(post_save, sender=DealCategory)
+@receiver(post_delete, sender=DealCategory)
+def deal_category_changed(sender, instance, **kwargs):
+    search.index_deals([instance.deal_id])
+
+
+@receiver(m2m_changed, sender=Deal.categories.through)
+def deal_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """categories.set()/add() из формы не вызывают post_save у DealCategory"""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        search.index_deals([instance.pk])
+    elif action == "post_clear":
+        search.index_category(instance)
+    else:
+        search.index_deals(pk_set or [])
+
+
+@receiver(post_save, sender=Deal)
+@receiver(post_delete, sender=Deal)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=DealCategory)
+@receiver(post_delete, sender=DealCategory)
+def home_data_changed(sender, **kwargs):
+    invalidate_home()
+
+
+@receiver(m2m_changed, sender=Deal.categories.through)
+def home_categories_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_home()
+
+
+@receiver(post_save, sender=DealCategory)
+@receiver(post_delete, sender=DealCategory)
+def category_counts_link_changed(sender, instance, **kwargs):
+    counters.recount([instance.category_id])
+
+
+@receiver(post_save, sender=Deal)
+def category_counts_deal_saved(sender, instance, created, **kwargs):
+    """Смена дат акции меняет число активных акций в её категориях"""
+    if not created:
+        counters.recount_for_deals([instance.pk])
+
+
+@receiver(m2m_changed, sender=Deal.categories.through)
+def category_counts_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            counters.recount([instance.pk])
+    elif action == "pre_clear":
+        instance._cleared_category_ids = list(
+            DealCategory.objects.filter(deal=instance).values_list("category_id", flat=True)
+        )
+    elif action == "post_clear":
+        counters.recount(getattr(instance, "_cleared_category_ids", []))
+    elif action in ("post_add", "post_remove"):
+        counters.recount(pk_set or [])
+
+
+@receiver(m2m_changed, sender=Deal.favorited_by.through)
+def favorites_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    favorites.track_change(instance, action, reverse, pk_set)
+
+
+@receiver(post_save, sender=Merchant)
+def api_merchant_saved(sender, instance, created, **kwargs):
+    """Имя партнёра входит в ответ API по его акциям"""
+    if not created:
+        api.touch(Deal.objects.filter(merchant=instance).values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Category)
+def api_category_saved(sender, instance, created, **kwargs):
+    if not created:
+        api.touch(DealCategory.objects.filter(category=instance).values_list("deal_id", flat=True))
+
+
+@receiver(post_save, sender=DealCategory)
+@receiver(post_delete, sender=DealCategory)
+def api_deal_category_changed(sender, instance, **kwargs):
+    api.touch([instance.deal_id])
+
+
+@receiver(m2m_changed, sender=Deal.categories.through)
+def api_deal_categories_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Отметка ставится после изменения связей, иначе клиент закэширует старое под новым ETag"""
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            api.touch([instance.pk])
+    elif action == "pre_clear":
+        instance._cleared_deal_ids = list(
+            DealCategory.objects.filter(category=instance).values_list("deal_id", flat=True)
+        )
+    elif action == "post_clear":
+        api.touch(instance.__dict__.pop("_cleared_deal_ids", []))
+    elif action in ("post_add", "post_remove"):
+        api.touch(pk_set or [])
+
+
+@receiver(post_save, sender=Deal)
+def suggest_deal_saved(sender, instance, **kwargs):
+    suggest.deal_saved(instance)
+
+
+@receiver(post_save, sender=Merchant)
+def suggest_merchant_saved(sender, instance, **kwargs):
+    suggest.merchant_saved(instance)
+
+
+@receiver(post_save, sender=Category)
+def suggest_category_saved(sender, instance, **kwargs):
+    suggest.category_saved(instance)
+
+
+@receiver(post_delete, sender=Deal)
+@receiver(post_delete, sender=Merchant)
+@receiver(post_delete, sender=Category)
+def suggest_removed(sender, instance, **kwargs):
+    kind = {Deal: suggest.KIND_DEAL, Merchant: suggest.KIND_MERCHANT, Category: suggest.KIND_CATEGORY}[sender]
+    suggest.removed(kind, instance.pk)
@@ -0,0 +1,208 @@
+"""Похожие акции: косинусная близость по общему избранному.
+
+Акция — вектор пользователей, добавивших её в избранное, а сходство двух
+акций — число общих пользователей / sqrt(произведение их favorites_count).
+Команда build_similar считает его порциями по chunk_size акций: для
+порции выбираются пользователи, добавившие её акции в избранное, а их
+избранное читается по IN_BATCH пользователей и сразу складывается в
+счётчик пар. У популярной акции берутся только последние
+MAX_USERS_PER_DEAL пользователей, а общих пользователей с соседями
+становится больше пропорционально. Пользователи, у которых в избранном
+больше MAX_USER_FAVORITES акций, пропускаются: они связывают всё со всем
+и дают больше всего пар. Так на акцию приходится не больше
+MAX_USERS_PER_DEAL * MAX_USER_FAVORITES пар, сколько бы ни было акций и
+пользователей. Если соседей по избранному меньше top_k, остальные места
+заполняются по общим категориям.
+"""
+import heapq
+import math
+import time
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .favorites import Favorite
+from .models import Deal, DealCategory, SimilarDeal
+
+TOP_K = 8
+CHUNK_SIZE = 1000
+# Сколько id передаётся в одном IN (...)
+IN_BATCH = 500
+MAX_USER_FAVORITES = 500
+MAX_USERS_PER_DEAL = 200
+# Если общих пользователей меньше, сходство считается случайным
+MIN_COMMON = 2
+# Сколько популярных акций каждой категории проверяется при дозаполнении
+CATEGORY_CANDIDATES = 200
+# Сколько готовых списков соседей по набору категорий держать в памяти
+CATEGORY_CACHE_SIZE = 10000
+SOURCE_FAVORITES, SOURCE_CATEGORIES = "favorites", "categories"
+
+
+def similar_deals(deal_id, now=None):
+    """Действующие похожие акции по порядку; один запрос по similar_deal_rank_uniq"""
+    return Deal.objects.active(now).filter(similar_to__deal_id=deal_id).order_by("similar_to__rank")
+
+
+def _live(now):
+    """Действующие и будущие акции"""
+    return Deal.objects.filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now), is_archived=False)
+
+
+def _batches(ids):
+    ids = list(ids)
+    for i in range(0, len(ids), IN_BATCH):
+        yield ids[i:i + IN_BATCH]
+
+
+def _rank(neighbour):
+    score, pk, _ = neighbour
+    return score, -pk
+
+
+def _sampled_users(chunk):
+    """{user_id: акции порции}: по MAX_USERS_PER_DEAL последних добавивших каждую акцию"""
+    sampled = defaultdict(set)
+    for batch in _batches(chunk):
+        recent = (
+            Favorite.objects.filter(deal_id__in=batch)
+            .annotate(n=Window(RowNumber(), partition_by=F("deal_id"), order_by=F("pk").desc()))
+            .filter(n__lte=MAX_USERS_PER_DEAL)
+            .values_list("user_id", "deal_id")
+        )
+        for user_id, deal_id in recent:
+            sampled[user_id].add(deal_id)
+    return sampled
+
+
+def _cooccurrence(sampled):
+    """Counter {(a, b): число общих пользователей} для акций a из выборки"""
+    counts = Counter()
+    for batch in _batches(sampled):
+        light = (
+            Favorite.objects.filter(user_id__in=batch).values("user_id")
+            .annotate(n=Count("pk")).filter(n__lte=MAX_USER_FAVORITES).values("user_id")
+        )
+        by_user = defaultdict(list)
+        for user_id, deal_id in Favorite.objects.filter(user_id__in=light).values_list("user_id", "deal_id"):
+            by_user[user_id].append(deal_id)
+        for user_id, deals in by_user.items():
+            for a in sampled[user_id]:
+                counts.update((a, b) for b in deals if b != a)
+    return counts
+
+
+def _favorite_neighbours(chunk, now, top_k):
+    """{a: [(сходство, b, источник)]} по общему избранному; chunk — {id: favorites_count}"""
+    sampled = _sampled_users(chunk)
+    sizes = Counter(a for deals in sampled.values() for a in deals)
+    counts = _cooccurrence(sampled)
+    norms = {}
+    for batch in _batches({b for _, b in counts}):
+        norms.update(_live(now).filter(pk__in=batch).values_list("pk", "favorites_count"))
+
+    found = defaultdict(list)
+    for (a, b), common in counts.items():
+        if common >= MIN_COMMON and b in norms:
+            # Общих среди всех добавивших a — пропорционально выборке
+            common = common * max(chunk[a], sizes[a]) / sizes[a]
+            # max(): favorites_count мог отстать от таблицы избранного
+            score = common / math.sqrt(max(chunk[a], common) * max(norms[b], common))
+            found[a].append((score, b, SOURCE_FAVORITES))
+    return {a: heapq.nlargest(top_k, neighbours, key=_rank) for a, neighbours in found.items()}
+
+
+class _CategoryIndex:
+    """Популярные действующие акции категорий и их категории; грузится по мере надобности.
+
+    У акций с одинаковым набором категорий одни и те же соседи, поэтому
+    список считается один раз на набор.
+    """
+
+    def __init__(self, now):
+        self.now = now
+        self.top = {}
+        self.categories = defaultdict(set)
+        self.ranked = {}
+
+    def _load(self, category_ids):
+        for category_id in category_ids - self.top.keys():
+            self.top[category_id] = list(
+                _live(self.now).in_category(category_id)
+                .order_by("-favorites_count", "-pk").values_list("pk", flat=True)[:CATEGORY_CANDIDATES]
+            )
+        missing = {pk for c in category_ids for pk in self.top[c]} - self.categories.keys()
+        for batch in _batches(missing):
+            for deal_id, category_id in DealCategory.objects.filter(deal_id__in=batch).values_list("deal_id", "category_id"):
+                self.categories[deal_id].add(category_id)
+
+    def neighbours(self, deal_ids, top_k):
+        """{a: [(сходство, b, источник)]}: косинус по наборам категорий"""
+        own = defaultdict(set)
+        for batch in _batches(deal_ids):
+            for deal_id, category_id in DealCategory.objects.filter(deal_id__in=batch).values_list("deal_id", "category_id"):
+                own[deal_id].add(category_id)
+        self._load(set().union(*own.values()))
+        result = {}
+        for a, categories in own.items():
+            key = frozenset(categories)
+            if key not in self.ranked:
+                if len(self.ranked) >= CATEGORY_CACHE_SIZE:
+                    self.ranked.clear()
+                candidates = {b for c in categories for b in self.top[c]}
+                scored = (
+                    (len(categories & self.categories[b]) / math.sqrt(len(categories) * len(self.categories[b])), b, SOURCE_CATEGORIES)
+                    for b in candidates
+                )
+                # На одного больше: сама акция тоже может оказаться в списке
+                self.ranked[key] = heapq.nlargest(top_k + 1, scored, key=_rank)
+            result[a] = [n for n in self.ranked[key] if n[1] != a][:top_k]
+        return result
+
+
+def build(chunk_size=CHUNK_SIZE, top_k=TOP_K):
+    """Пересчитывает SimilarDeal для действующих и будущих акций.
+
+    Каждая порция — отдельная транзакция, так что страницы акций всё время
+    показывают либо старых, либо новых соседей. Возвращает словарь со статистикой.
+    """
+    now = timezone.now()
+    stats = {"deals": 0, "favorites": 0, "categories": 0, "seconds": 0.0}
+    started = time.monotonic()
+    categories = _CategoryIndex(now)
+    live = _live(now).order_by("pk").values_list("pk", "favorites_count")
+    last_pk = 0
+    while True:
+        chunk = dict(live.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+        last_pk = max(chunk)
+
+        found = _favorite_neighbours(chunk, now, top_k)
+        fallback = categories.neighbours([a for a in chunk if len(found.get(a, ())) < top_k], top_k)
+        rows = []
+        for a in chunk:
+            neighbours = found.get(a, [])
+            seen = {b for _, b, _ in neighbours}
+            neighbours += [n for n in fallback.get(a, ()) if n[1] not in seen][:top_k - len(neighbours)]
+            rows += [
+                SimilarDeal(deal_id=a, similar_id=b, rank=rank, score=score, source=source)
+                for rank, (score, b, source) in enumerate(neighbours)
+            ]
+            for _, _, source in neighbours:
+                stats[source] += 1
+
+        with transaction.atomic():
+            old = SimilarDeal.objects.filter(deal_id__in=list(chunk))
+            old._raw_delete(old.db)
+            SimilarDeal.objects.bulk_create(rows)
+        stats["deals"] += len(chunk)
+
+    # Закончившимся акциям соседи больше не нужны
+    stale = SimilarDeal.objects.filter(Q(deal__expires_at__lte=now) | Q(deal__is_archived=True))
+    stale.delete()
+    stats["seconds"] = time.monotonic() - started
+    return stats
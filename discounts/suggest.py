@@ -0,0 +1,225 @@
+"""Подсказки поиска из памяти процесса, без обращения к БД.
+
+Индекс — отсортированный список ключей (начала слов названий акций,
+партнёров и категорий в виде normalize()); префикс ищется бинарным
+поиском. Для коротких префиксов, под которые попадают тысячи ключей,
+лучшие по весу объекты запоминаются в _top и сбрасываются при изменении
+любого из них.
+
+Индекс загружается при старте (wsgi/asgi) или при первом запросе,
+а дальше обновляется сигналами и refresh_deals() в этом процессе.
+Изменения из других процессов подхватывает перезагрузка в фоне раз
+в MAX_AGE секунд.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+
+from django.db import DatabaseError, connections
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Category, Deal, Merchant
+from .search import _WORD_RE, normalize
+
+KIND_DEAL, KIND_MERCHANT, KIND_CATEGORY = "deal", "merchant", "category"
+LIMIT = 8
+# Больше стольких ключей под префиксом — берём лучшие из _top, а не перебираем все
+SCAN_LIMIT = 200
+TOP_SIZE = 50
+MAX_KEY = 40
+MAX_AGE = 600
+
+
+@dataclass
+class Item:
+    kind: str
+    pk: int
+    label: str
+    weight: int
+    starts_at: object = None
+    expires_at: object = None
+
+    def keys(self):
+        text = normalize(self.label)
+        return {(text[m.start():][:MAX_KEY], self.kind, self.pk) for m in _WORD_RE.finditer(text)}
+
+    def is_live(self, now):
+        return (self.starts_at is None or self.starts_at <= now) and (self.expires_at is None or self.expires_at > now)
+
+
+def _rank(item):
+    return item.weight, -item.pk
+
+
+class PrefixIndex:
+    def __init__(self, items=()):
+        self._lock = threading.Lock()
+        self._items = {}
+        self._keys = []
+        self._top = {}
+        for item in items:
+            self._items[item.kind, item.pk] = item
+            self._keys.extend(item.keys())
+        self._keys.sort()
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        with self._lock:
+            self._drop(item.kind, item.pk)
+            self._items[item.kind, item.pk] = item
+            for key in item.keys():
+                insort(self._keys, key)
+                self._forget(key[0])
+
+    def remove(self, kind, pk):
+        with self._lock:
+            self._drop(kind, pk)
+
+    def _drop(self, kind, pk):
+        old = self._items.pop((kind, pk), None)
+        if old is None:
+            return
+        for key in old.keys():
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+            self._forget(key[0])
+
+    def _forget(self, text):
+        for end in range(1, len(text) + 1):
+            self._top.pop(text[:end], None)
+
+    def _range(self, prefix):
+        """Границы ключей, начинающихся с prefix"""
+        return bisect_left(self._keys, (prefix,)), bisect_left(self._keys, (prefix + "\U0010ffff",))
+
+    def _matches(self, lo, hi):
+        return {self._keys[i][1:]: self._items[self._keys[i][1:]] for i in range(lo, hi)}.values()
+
+    def suggest(self, q, limit=LIMIT, now=None):
+        prefix = normalize(q).strip()[:MAX_KEY]
+        if not prefix:
+            return []
+        now = now or timezone.now()
+        with self._lock:
+            lo, hi = self._range(prefix)
+            if hi - lo <= SCAN_LIMIT:
+                return heapq.nlargest(limit, (item for item in self._matches(lo, hi) if item.is_live(now)), key=_rank)
+            top = self._top.get(prefix)
+            live = [item for item in top or () if item.is_live(now)]
+            # Пересчёт, если кэша нет или из него успели истечь нужные акции
+            if top is None or len(live) < min(limit, len(top)):
+                live = self._top[prefix] = heapq.nlargest(
+                    TOP_SIZE, (item for item in self._matches(lo, hi) if item.is_live(now)), key=_rank,
+                )
+            return live[:limit]
+
+
+def deal_item(pk, title, favorites_count, starts_at, expires_at):
+    return Item(KIND_DEAL, pk, title, favorites_count, starts_at, expires_at)
+
+
+DEAL_VALUES = ("pk", "title", "favorites_count", "starts_at", "expires_at")
+
+
+def _deals():
+    """Действующие и будущие акции (по deal_active_expires_idx)"""
+    return Deal.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()), is_archived=False,
+    ).values_list(*DEAL_VALUES)
+
+
+def build():
+    """Индекс по действующим и будущим акциям, партнёрам и категориям"""
+    items = [deal_item(*row) for row in _deals().iterator()]
+    items += [
+        Item(KIND_MERCHANT, pk, name, deals)
+        for pk, name, deals in Merchant.objects.annotate(n=Count("deal")).values_list("pk", "name", "n")
+    ]
+    items += [
+        Item(KIND_CATEGORY, pk, name, active)
+        for pk, name, active in Category.objects.values_list("pk", "name", "active_deals_count")
+    ]
+    return PrefixIndex(items)
+
+
+_index = None
+_reloading = threading.Lock()
+
+
+def load():
+    global _index
+    _index = build()
+    return _index
+
+
+def warm():
+    """Загрузка при старте сервера; до migrate индекс построится при первом запросе"""
+    try:
+        load()
+    except DatabaseError:
+        pass
+
+
+def _reload_in_background():
+    if not _reloading.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            load()
+        finally:
+            connections.close_all()
+            _reloading.release()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def suggest(q, limit=LIMIT):
+    # Пустой PrefixIndex ложен, поэтому сравнение с None
+    index = _index if _index is not None else load()
+    if time.monotonic() - index.loaded_at > MAX_AGE:
+        _reload_in_background()
+    return index.suggest(q, limit)
+
+
+def refresh_deals(deal_ids):
+    """Обновляет акции в индексе после пакетных изменений в обход сигналов"""
+    if _index is None:
+        return
+    deal_ids = set(deal_ids)
+    for row in _deals().filter(pk__in=deal_ids):
+        _index.put(deal_item(*row))
+        deal_ids.discard(row[0])
+    for pk in deal_ids:
+        _index.remove(KIND_DEAL, pk)
+
+
+def deal_saved(deal):
+    if _index is None:
+        return
+    if deal.is_archived:
+        _index.remove(KIND_DEAL, deal.pk)
+    else:
+        _index.put(deal_item(*(getattr(deal, field) for field in DEAL_VALUES)))
+
+
+def merchant_saved(merchant):
+    if _index is not None:
+        _index.put(Item(KIND_MERCHANT, merchant.pk, merchant.name, Deal.objects.filter(merchant=merchant).count()))
+
+
+def category_saved(category):
+    if _index is not None:
+        _index.put(Item(KIND_CATEGORY, category.pk, category.name, category.active_deals_count))
+
+
+def removed(kind, pk):
+    if _index is not None:
+        _index.remove(kind, pk)
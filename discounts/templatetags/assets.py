@@ -0,0 +1,19 @@
+from django import template
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from discounts.assets import bundle_path, bundles
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle(name):
+    """Собранный бандл с хэшем в имени, а до сборки и при DEBUG — исходные файлы по одному"""
+    built = bundle_path(name) in getattr(staticfiles_storage, "hashed_files", {})
+    paths = [bundle_path(name)] if built and not settings.DEBUG else bundles()[name]
+    if name.endswith(".css"):
+        return format_html_join("\n", '<link href="{}" rel="stylesheet">', ((static(p),) for p in paths))
+    return format_html_join("\n", '<script src="{}"></script>', ((static(p),) for p in paths))
@@ -0,0 +1,26 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+from discounts import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def deal_picture(deal, sizes="320px", img_id="", lazy=True):
+    """<picture> с миниатюрами WebP и JPEG, а без них — <img> с исходным image_url"""
+    attrs = format_html(' id="{}"', img_id) if img_id else ""
+    if lazy:
+        attrs = format_html('{} loading="lazy"', attrs)
+    digest = deal.thumb_hash
+    if not digest:
+        src = deal.image_url or static("images/placeholder.jpg")
+        return format_html('<img src="{}" alt="{}"{}>', src, deal.title, attrs)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}"{}></picture>',
+        images.srcset(digest, "webp"), sizes,
+        images.thumb_url(digest, images.WIDTHS[1], "jpg"), images.srcset(digest, "jpg"), sizes,
+        deal.title, attrs,
+    )
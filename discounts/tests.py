@@ -1,3 +1,778 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import statistics
+import tempfile
+import time
+import unittest
+import unittest.mock
+from contextlib import nullcontext
+from io import BytesIO, StringIO
+from pathlib import Path
 
-# Create your tests here.
\ No newline at end of file
+from django.conf import settings
+from django.contrib.admin import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.template import Context, Template
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import archive, assets, counters, coupons, expiry, exports, favorites, images, importer, rollups, search, similar, suggest
+from .admin import CappedCountPaginator
+from .batch import apply_updates
+from .forms import DealForm
+from .models import Category, Coupon, Deal, DealArchive, Merchant, MerchantDailyStats, SimilarDeal
+from .pagination import decode_cursor, encode_cursor, paginate_by_created, paginate_ranked
+
+# Размеры наборов данных (число акций); каждый следующий досеивается к предыдущему
+SIZES = [20, 100, 400]
+REPEAT = 10
+# Отчёт пишется, только если задан путь: обычный прогон тестов не оставляет файлов
+REPORT_PATH = os.environ.get("BENCH_REPORT")
+
+
+class ViewQueryScalingTests(TestCase):
+    """Число SQL-запросов каждой страницы не должно расти вместе с объёмом данных.
+
+    Если задана переменная окружения BENCH_REPORT, заодно пишет в этот файл
+    отчёт (запросы, время в БД, перцентили времени ответа).
+    """
+
+    report = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if not REPORT_PATH:
+            return
+        with open(REPORT_PATH, "w", encoding="utf-8") as f:
+            json.dump(cls.report, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    def seed(self, deals):
+        call_command(
+            "seed_data", deals=deals, users=max(5, deals // 4), merchants=10,
+            coupons=deals * 2, favorites=deals * 3, seed=deals, append=True, stdout=StringIO(),
+        )
+
+    def endpoints(self, user):
+        hot_category = Category.objects.order_by("-deals_count").first()
+        hot_deal = Deal.objects.order_by("-favorites_count").first()
+        return {
+            "home": ("get", reverse("discounts:home"), {}),
+            "search": ("get", reverse("discounts:search") + "?q=скид", {}),
+            "search_json": ("get", reverse("discounts:search") + "?q=скид&format=json", {}),
+            "category": ("get", reverse("discounts:category", args=[hot_category.pk]), {}),
+            "deal_detail": ("get", reverse("discounts:deal_detail", args=[hot_deal.pk]), {}),
+            "api_deals": ("get", reverse("discounts:api_deals"), {}),
+            "api_deal": ("get", reverse("discounts:api_deal", args=[hot_deal.pk]), {}),
+            "my_favorites": ("get", reverse("discounts:my_favorites"), {}),
+            # Два переключения подряд возвращают исходное состояние
+            "toggle_favorite": (
+                "post",
+                reverse("discounts:toggle_favorite", args=[hot_deal.pk]),
+                {"x-requested-with": "XMLHttpRequest"},
+            ),
+        }
+
+    def measure(self, method, url, headers):
+        queries, db_time, latencies = [], [], []
+        for _ in range(REPEAT):
+            # Главная кэшируется; меряем холодный путь
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                response = getattr(self.client, method)(url, headers=headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+            self.assertLess(response.status_code, 400, url)
+            queries.append(len(ctx.captured_queries))
+            db_time.append(sum(float(q["time"]) for q in ctx.captured_queries) * 1000)
+        cuts = statistics.quantiles(latencies, n=20)
+        return {
+            "queries": max(queries),
+            "db_ms": round(statistics.mean(db_time), 3),
+            "p50_ms": round(statistics.median(latencies), 3),
+            "p95_ms": round(cuts[-1], 3),
+            "max_ms": round(max(latencies), 3),
+        }
+
+    def test_query_counts_do_not_grow_with_data(self):
+        user = User.objects.create_user("bench", password="bench12345")
+        self.client.force_login(user)
+        seeded = 0
+        for size in SIZES:
+            self.seed(size - seeded)
+            seeded = size
+            # У пользователя должны быть избранные, иначе часть запросов не выполнится
+            user.favorite_deals.add(*Deal.objects.order_by("pk")[:5])
+            for name, (method, url, headers) in self.endpoints(user).items():
+                self.report.setdefault(name, {})[str(size)] = self.measure(method, url, headers)
+
+        for name, runs in self.report.items():
+            counts = {size: run["queries"] for size, run in runs.items()}
+            with self.subTest(endpoint=name):
+                self.assertEqual(
+                    len(set(counts.values())), 1,
+                    f"{name}: число запросов растёт с объёмом данных: {counts}",
+                )
+
+
+@unittest.skipUnless(images.available(), "нужен Pillow")
+class SearchIndexTests(TestCase):
+    def ids(self, q, kind=search.KIND_DEAL):
+        return [pk for pk, _ in search.search(q, kind, 10)]
+
+    def test_index_follows_deals_merchants_and_categories(self):
+        merchant = Merchant.objects.create(name="Ёлочный базар", user=User.objects.create_user("owner"))
+        deal = Deal.objects.create(title="Гирлянда", merchant=merchant, price_original=100, price_discount=50)
+        other = Deal.objects.create(
+            title="Игрушки", description="Подходят к гирлянде", merchant=merchant, price_original=100, price_discount=50,
+        )
+        # Совпадение в названии весит больше, чем в описании
+        self.assertEqual(self.ids("гирл"), [deal.pk, other.pk])
+        self.assertEqual(self.ids("елоч", search.KIND_MERCHANT), [merchant.pk])
+        self.assertEqual(search.count("елочный", search.KIND_DEAL, 10), 2)
+        self.assertEqual(self.ids("!!!"), [])
+
+        category = Category.objects.create(name="Праздник")
+        deal.categories.add(category)
+        self.assertEqual(self.ids("праздн"), [deal.pk])
+        self.assertEqual(self.ids("праздн", search.KIND_CATEGORY), [category.pk])
+
+        deal.title = "Мишура"
+        deal.save()
+        self.assertEqual(self.ids("мишур"), [deal.pk])
+        self.assertEqual(self.ids("гирл"), [other.pk])
+        merchant.name = "Новогодний рынок"
+        merchant.save()
+        # Одинаковый вес — по возрастанию id
+        self.assertEqual(self.ids("рынок"), [deal.pk, other.pk])
+        deal.delete()
+        self.assertEqual(self.ids("праздн"), [])
+        self.assertEqual(search.rebuild(), 3)
+        self.assertEqual(self.ids("подход"), [other.pk])
+
+
+class KeysetPaginationTests(TestCase):
+    def test_pages_cover_ties_and_bad_cursors_mean_first_page(self):
+        merchant = Merchant.objects.create(name="Кофейня", user=User.objects.create_user("owner"))
+        category = Category.objects.create(name="Кофе")
+        deals = [
+            Deal.objects.create(title=f"Акция {i}", merchant=merchant, price_original=100, price_discount=50)
+            for i in range(5)
+        ]
+        for deal in deals:
+            deal.categories.add(category)
+        # Одинаковое время создания: порядок и граница страницы держатся на id
+        Deal.objects.update(created_at=timezone.now())
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = paginate_by_created(Deal.objects.all(), cursor, page_size=2)
+            seen += [deal.pk for deal in page]
+            if cursor is None:
+                break
+        self.assertEqual(seen, sorted((deal.pk for deal in deals), reverse=True))
+
+        first = paginate_by_created(Deal.objects.all(), None, page_size=2)
+        bad = ["%%%", "bm90IGpzb24", encode_cursor({"a": 1}), encode_cursor(["вчера", 1]), encode_cursor(["2030-01-01", "1"])]
+        for token in bad:
+            self.assertEqual(paginate_by_created(Deal.objects.all(), token, page_size=2), first, token)
+        self.assertIsNone(decode_cursor("%%%"))
+
+        url = reverse("discounts:category", args=[category.pk])
+        self.assertEqual(len(self.client.get(url, {"cursor": "%%%", "format": "json"}).json()["deals"]), 5)
+
+        afters = []
+
+        def fetch(limit, after):
+            afters.append(after)
+            return [(pk, 1.5) for pk in range(1, limit + 1)]
+
+        self.assertEqual(paginate_ranked(fetch, encode_cursor(["x", 1]), page_size=2), ([1, 2], encode_cursor([1.5, 2])))
+        paginate_ranked(fetch, encode_cursor([1.5, 2]), page_size=2)
+        self.assertEqual(afters, [None, [1.5, 2]])
+
+
+class CategoryCountersTests(TestCase):
+    def counts(self, category):
+        category.refresh_from_db()
+        return category.deals_count, category.active_deals_count
+
+    def test_counters_follow_links_dates_and_deletes(self):
+        merchant = Merchant.objects.create(name="Кофейня", user=User.objects.create_user("owner"))
+        coffee, tea = Category.objects.create(name="Кофе"), Category.objects.create(name="Чай")
+        live, other = (
+            Deal.objects.create(title=title, merchant=merchant, price_original=100, price_discount=50)
+            for title in ("Латте", "Пуэр")
+        )
+        live.categories.add(coffee, tea)
+        tea.deal_set.add(other)
+        self.assertEqual((self.counts(coffee), self.counts(tea)), ((1, 1), (2, 2)))
+
+        live.expires_at = timezone.now() - timezone.timedelta(days=1)
+        live.save()
+        self.assertEqual((self.counts(coffee), self.counts(tea)), ((1, 0), (2, 1)))
+
+        live.categories.remove(tea)
+        self.assertEqual(self.counts(tea), (1, 1))
+        live.categories.clear()
+        self.assertEqual(self.counts(coffee), (0, 0))
+        tea.deal_set.clear()
+        self.assertEqual(self.counts(tea), (0, 0))
+
+        live.categories.add(coffee)
+        live.delete()
+        self.assertEqual(self.counts(coffee), (0, 0))
+        self.assertEqual(counters.drift(), [])
+
+
+class ThumbnailTests(TestCase):
+    """Миниатюры строятся из картинки, полученной подменённым fetch"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = Path(media.name)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def jpeg(self, color="red", size=(1200, 800)):
+        from PIL import Image
+        buf = BytesIO()
+        Image.new("RGB", size, color).save(buf, "JPEG")
+        return buf.getvalue()
+
+    def test_ingest_writes_all_variants_under_content_hash(self):
+        data = self.jpeg()
+        fetched = []
+
+        def fetch(url):
+            fetched.append(url)
+            return data
+
+        digest = images.ingest("https://example.com/a.jpg", fetch=fetch)
+        self.assertEqual(fetched, ["https://example.com/a.jpg"])
+        self.assertEqual(digest, images.content_hash(data))
+        for width in images.WIDTHS:
+            for ext in images.FORMATS:
+                path = self.media_root / images.thumb_name(digest, width, ext)
+                self.assertTrue(path.exists(), path)
+        # Та же картинка из другого источника — те же файлы
+        self.assertEqual(images.ingest(data), digest)
+
+    def test_ingest_many_reports_errors_per_item(self):
+        good = self.jpeg("blue")
+
+        def fetch(url):
+            if "broken" in url:
+                raise images.ImageError("404")
+            return good if "good" in url else b"not an image"
+
+        results = images.ingest_many(
+            {1: "https://x/good.jpg", 2: "https://x/broken.jpg", 3: "https://x/text.jpg"},
+            workers=2, fetch=fetch,
+        )
+        self.assertEqual(results[1], images.content_hash(good))
+        self.assertIsInstance(results[2], images.ImageError)
+        self.assertIsInstance(results[3], images.ImageError)
+
+    def test_oversized_image_is_an_image_error(self):
+        from PIL import Image
+        data = self.jpeg(size=(300, 300))
+        with unittest.mock.patch.object(Image, "MAX_IMAGE_PIXELS", 100):
+            with self.assertRaises(images.ImageError):
+                images.render(data, self.media_root)
+
+    def test_invalid_form_writes_no_thumbnails(self):
+        upload = SimpleUploadedFile("a.jpg", self.jpeg(), content_type="image/jpeg")
+        form = DealForm({"title": ""}, {"image_file": upload})
+        self.assertFalse(form.is_valid())
+        self.assertNotIn("image_file", form.errors)
+        self.assertFalse((self.media_root / images.THUMB_DIR).exists())
+
+    def test_picture_tag_uses_thumbnails_only_for_current_url(self):
+        deal = Deal(title="Кофе", image_url="https://x/a.jpg", image_hash="ab" * 16, image_source="https://x/a.jpg")
+        template = Template("{% load deal_images %}{% deal_picture deal %}")
+        html = template.render(Context({"deal": deal}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn(images.thumb_url(deal.image_hash, images.WIDTHS[-1], "webp"), html)
+
+        deal.image_url = "https://x/b.jpg"
+        html = template.render(Context({"deal": deal}))
+        self.assertNotIn("<picture>", html)
+        self.assertIn("https://x/b.jpg", html)
+
+
+class ArchiveTests(TestCase):
+    def test_archive_and_restore_keep_links(self):
+        user = User.objects.create_user("fan")
+        merchant = Merchant.objects.create(name="Кофейня", user=user)
+        category = Category.objects.create(name="Кофе")
+        now = timezone.now()
+        old = Deal.objects.create(
+            title="Старая", merchant=merchant, price_original=100, price_discount=50,
+            expires_at=now - timezone.timedelta(days=200),
+        )
+        live = Deal.objects.create(
+            title="Текущая", merchant=merchant, price_original=100, price_discount=80,
+            expires_at=now + timezone.timedelta(days=5),
+        )
+        for deal in (old, live):
+            deal.categories.add(category)
+        old.favorited_by.add(user)
+        Coupon.objects.create(code="OLD-1", user=user, deal=old)
+
+        self.assertEqual(list(Deal.objects.active()), [live])
+        expiry.sweep()
+        self.assertEqual(archive.archive()["deals"], 1)
+        self.assertFalse(Deal.objects.filter(pk=old.pk).exists())
+        self.assertFalse(Coupon.objects.exists())
+        category.refresh_from_db()
+        self.assertEqual((category.deals_count, category.active_deals_count), (1, 1))
+
+        self.assertEqual(archive.restore([old.pk]), {"deals": 1, "skipped": []})
+        restored = Deal.objects.get(pk=old.pk)
+        self.assertEqual(restored.created_at, old.created_at)
+        self.assertEqual(list(restored.categories.all()), [category])
+        self.assertEqual(list(restored.favorited_by.all()), [user])
+        self.assertEqual(restored.favorites_count, 1)
+        self.assertEqual(Coupon.objects.get(deal=restored).status, "expired")
+        self.assertFalse(DealArchive.objects.exists())
+        self.assertEqual(list(Deal.objects.active()), [live])
+
+    def test_restore_skips_deals_the_feed_recreated(self):
+        merchant = Merchant.objects.create(name="Кофейня", user=User.objects.create_user("owner"))
+        fields = {"merchant": merchant, "external_id": "F-1", "price_original": 100, "price_discount": 50}
+        old = Deal.objects.create(
+            title="Старая", is_archived=True, expires_at=timezone.now() - timezone.timedelta(days=200), **fields,
+        )
+        archive.archive()
+        again = Deal.objects.create(title="Снова в фиде", **fields)
+
+        out = StringIO()
+        call_command("archive_deals", restore=[old.pk], stdout=out)
+        self.assertIn(str(old.pk), out.getvalue())
+        self.assertIn("0 акций", out.getvalue())
+        self.assertTrue(DealArchive.objects.filter(pk=old.pk).exists())
+        self.assertEqual(list(Deal.objects.all()), [again])
+
+        self.client.force_login(User.objects.create_superuser("root", "root@example.com", "x"))
+        response = self.client.post(
+            reverse("admin:discounts_dealarchive_changelist"),
+            {"action": "restore_deals", "_selected_action": [old.pk]}, follow=True,
+        )
+        self.assertContains(response, "остались в архиве")
+
+
+class SuggestTests(TestCase):
+    def setUp(self):
+        suggest._index = None
+        self.addCleanup(setattr, suggest, "_index", None)
+        user = User.objects.create_user("owner")
+        self.merchant = Merchant.objects.create(name="Кофейня Ёлка", user=user)
+        self.deal = Deal.objects.create(
+            title="Кофе в зёрнах", merchant=self.merchant, price_original=100, price_discount=50,
+        )
+
+    def test_prefix_lookup_without_queries_and_signal_updates(self):
+        suggest.load()
+        with self.assertNumQueries(0):
+            labels = [item.label for item in suggest.suggest("ко")]
+            self.assertEqual(labels, ["Кофейня Ёлка", "Кофе в зёрнах"])
+            self.assertEqual([item.pk for item in suggest.suggest("зерн")], [self.deal.pk])
+            self.assertEqual([item.kind for item in suggest.suggest("елк")], [suggest.KIND_MERCHANT])
+
+        self.deal.title = "Чай"
+        self.deal.save()
+        self.assertEqual([item.label for item in suggest.suggest("ча")], ["Чай"])
+        self.assertEqual(suggest.suggest("зерн"), [])
+        self.deal.delete()
+        self.assertEqual(suggest.suggest("ча"), [])
+
+        response = self.client.get(reverse("discounts:suggest"), {"q": "коф"})
+        self.assertEqual(response.json()["suggestions"][0]["kind"], suggest.KIND_MERCHANT)
+
+    def test_empty_index_is_not_rebuilt_and_bad_limit_is_ignored(self):
+        suggest._index = suggest.PrefixIndex()
+        with self.assertNumQueries(0):
+            self.assertEqual(suggest.suggest("ко"), [])
+        response = self.client.get(reverse("discounts:suggest"), {"q": "коф", "limit": "²"})
+        self.assertEqual(response.status_code, 200)
+
+
+class AdminScaleTests(TestCase):
+    def test_coupon_changelist_search_uses_code_username_and_fts(self):
+        admin = User.objects.create_superuser("root", "root@example.com", "x")
+        owner = User.objects.create_user("owner")
+        merchants = [Merchant.objects.create(name=f"Партнёр {i}", user=owner) for i in range(30)]
+        deal = Deal.objects.create(title="Кроссовки", merchant=merchants[0], price_original=100, price_discount=50)
+        Coupon.objects.create(code="ABCD2345", deal=deal)
+        Coupon.objects.create(code="ZZZZ2345", deal=deal, user=owner)
+        Coupon.objects.create(code="QQQQ2345", deal=Deal.objects.create(
+            title="Чайник", merchant=merchants[1], price_original=10, price_discount=5,
+        ))
+        self.client.force_login(admin)
+        url = reverse("admin:discounts_coupon_changelist")
+
+        for q, codes in (("abc", ["ABCD2345"]), ("owner", ["ZZZZ2345"]), ("кроссовки", ["ABCD2345", "ZZZZ2345"])):
+            response = self.client.get(url, {"q": q})
+            self.assertEqual(sorted(c.code for c in response.context["cl"].result_list), codes)
+
+        # Фильтр по партнёру не выводит всех партнёров в боковой панели
+        response = self.client.get(reverse("admin:discounts_deal_changelist"))
+        self.assertNotContains(response, "Партнёр 29")
+        self.assertEqual(self.client.get(reverse("admin:discounts_deal_changelist"), {"q": "²"}).status_code, 200)
+
+    def test_small_table_count_is_exact_despite_gaps_in_ids(self):
+        owner = User.objects.create_user("owner")
+        merchant = Merchant.objects.create(name="Партнёр", user=owner)
+        deals = [
+            Deal.objects.create(title=f"Акция {i}", merchant=merchant, price_original=10, price_discount=5)
+            for i in range(5)
+        ]
+        Deal.objects.filter(pk__in=[deal.pk for deal in deals[1:]]).delete()
+        self.assertEqual(CappedCountPaginator(Deal.objects.order_by("pk"), 20).count, 1)
+
+
+class DealPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        merchant = Merchant.objects.create(name="Пекарня", user=User.objects.create_user("owner"))
+        self.deal = Deal.objects.create(title="Хлеб", merchant=merchant, price_original=100, price_discount=50)
+        self.url = reverse("discounts:deal_detail", args=[self.deal.pk])
+
+    def test_cached_page_conditional_get_and_new_version_on_edit(self):
+        first = self.client.get(self.url)
+        self.assertContains(first, "Хлеб")
+        self.assertIn("Last-Modified", first)
+        # Акция и её похожие акции
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(self.url).content, first.content)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+
+        self.deal.title = "Батон"
+        self.deal.save()
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertContains(changed, "Батон")
+
+        self.client.force_login(User.objects.create_user("buyer"))
+        page = self.client.get(self.url)
+        self.assertContains(page, "Батон")
+        self.assertNotIn("Last-Modified", page)
+        self.assertIn("private", page["Cache-Control"])
+
+
+class SimilarDealsTests(TestCase):
+    def test_cofavorites_first_then_category_fallback(self):
+        merchant = Merchant.objects.create(name="Кино", user=User.objects.create_user("owner"))
+        films, popcorn, cola, other = (
+            Deal.objects.create(title=title, merchant=merchant, price_original=100, price_discount=50)
+            for title in ("Фильм", "Попкорн", "Кола", "Шины")
+        )
+        for name in ("a", "b"):
+            User.objects.create_user(name).favorite_deals.add(films, popcorn)
+        User.objects.create_user("c").favorite_deals.add(films, cola)
+        category = Category.objects.create(name="Еда")
+        popcorn.categories.add(category)
+        cola.categories.add(category)
+
+        similar.build(chunk_size=2)
+        # Кола связана с фильмом только одним пользователем — это меньше MIN_COMMON
+        self.assertEqual(list(similar.similar_deals(films.pk)), [popcorn])
+        self.assertEqual(
+            list(SimilarDeal.objects.filter(deal=cola).values_list("similar_id", "source")),
+            [(popcorn.pk, similar.SOURCE_CATEGORIES)],
+        )
+        self.assertFalse(SimilarDeal.objects.filter(deal=other).exists())
+        self.assertContains(self.client.get(reverse("discounts:deal_detail", args=[films.pk])), "Попкорн")
+
+        out = StringIO()
+        call_command("build_similar", chunk_size=2, stdout=out)
+        self.assertIn("по избранному 2", out.getvalue())
+        self.assertEqual(list(similar.similar_deals(films.pk)), [popcorn])
+
+    def test_popular_deal_samples_latest_users(self):
+        merchant = Merchant.objects.create(name="Кино", user=User.objects.create_user("owner"))
+        films = Deal.objects.create(title="Фильм", merchant=merchant, price_original=100, price_discount=50)
+        fans = [User.objects.create_user(f"fan{i}") for i in range(4)]
+        for fan in fans:
+            fan.favorite_deals.add(films)
+        with unittest.mock.patch.object(similar, "MAX_USERS_PER_DEAL", 2):
+            sampled = similar._sampled_users({films.pk: 4})
+        self.assertEqual(sampled, {fan.pk: {films.pk} for fan in fans[2:]})
+
+
+class MerchantRollupTests(TestCase):
+    def test_incremental_rollup_counts_only_new_events(self):
+        owner = User.objects.create_user("owner")
+        merchant = Merchant.objects.create(name="Пиццерия", user=owner)
+        deal = Deal.objects.create(title="Пицца", merchant=merchant, price_original=100, price_discount=50)
+        buyer = User.objects.create_user("buyer")
+        coupons.issue(deal, 3)
+        code = coupons.assign(deal, buyer).code
+        coupons.redeem(code)
+        deal.favorited_by.add(buyer)
+
+        later = timezone.now() + rollups.SETTLE
+        rollups.rollup(now=later)
+        # Повторный запуск с тем же концом окна ничего не добавляет
+        rollups.rollup(now=later)
+        row = MerchantDailyStats.objects.get(merchant=merchant, day=timezone.localdate(later))
+        self.assertEqual((row.coupons_issued, row.coupons_redeemed, row.favorites), (1, 1, 1))
+
+        coupons.assign(deal, User.objects.create_user("second"))
+        rollups.rollup(now=timezone.now() + rollups.SETTLE)
+        row.refresh_from_db()
+        self.assertEqual(row.coupons_issued, 2)
+
+        self.client.force_login(owner)
+        data = self.client.get(reverse("discounts:merchant_dashboard", args=[merchant.pk]), {"format": "json"}).json()
+        self.assertEqual(data["totals"]["coupons_issued"], 2)
+        self.client.force_login(buyer)
+        self.assertEqual(self.client.get(reverse("discounts:merchant_dashboard", args=[merchant.pk])).status_code, 404)
+
+    def test_overlapping_run_does_not_count_twice(self):
+        merchant = Merchant.objects.create(name="Пиццерия", user=User.objects.create_user("owner"))
+        deal = Deal.objects.create(title="Пицца", merchant=merchant, price_original=100, price_discount=50)
+        coupons.issue(deal, 1)
+        coupons.assign(deal, User.objects.create_user("buyer"))
+        rollups.rollup(now=timezone.now())
+        later = timezone.now() + rollups.SETTLE
+        read, other = rollups.updated_until, {}
+
+        def read_then_race():
+            start = read()
+            if not other:
+                # Другой запуск успевает сдвинуть отметку после того, как эта её прочитала
+                other["started"] = True
+                other.update(rollups.rollup(now=later))
+            return start
+
+        with unittest.mock.patch.object(rollups, "updated_until", read_then_race):
+            stats = rollups.rollup(now=later)
+        self.assertTrue(stats["conflict"])
+        self.assertEqual((other["windows"], other["conflict"]), (1, False))
+        self.assertEqual(MerchantDailyStats.objects.get(merchant=merchant).coupons_issued, 1)
+
+    def test_archived_deals_keep_their_favorites(self):
+        merchant = Merchant.objects.create(name="Пиццерия", user=User.objects.create_user("owner"))
+        old = Deal.objects.create(
+            title="Пицца", merchant=merchant, price_original=100, price_discount=50,
+            expires_at=timezone.now() - timezone.timedelta(days=400), is_archived=True,
+        )
+        old.favorited_by.add(User.objects.create_user("fan"))
+        favorites.recount()
+        today = timezone.localdate()
+        rollups.snapshot_favorites(today)
+        archive.archive(timezone.now())
+        self.assertFalse(Deal.objects.filter(pk=old.pk).exists())
+        rollups.snapshot_favorites(today)
+        self.assertEqual(MerchantDailyStats.objects.get(merchant=merchant).favorites, 1)
+
+
+class CouponRedeemTests(TestCase):
+    def test_pool_coupon_and_bad_code_are_rejected(self):
+        merchant = Merchant.objects.create(name="Кафе", user=User.objects.create_user("owner"))
+        deal = Deal.objects.create(title="Обед", merchant=merchant, price_original=100, price_discount=50)
+        coupons.issue(deal, 1)
+        code = Coupon.objects.get().code
+        self.assertFalse(coupons.redeem(code))
+
+        self.client.force_login(User.objects.create_user("cashier", is_staff=True))
+        url = reverse("discounts:coupon_redeem")
+        response = self.client.post(url, data=json.dumps({"code": 5}), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        coupons.assign(deal, User.objects.create_user("buyer"))
+        self.assertEqual(self.client.post(url, {"code": code.lower()}).status_code, 200)
+
+
+class ExpiryReopenTests(TestCase):
+    def test_extended_deal_leaves_archive(self):
+        merchant = Merchant.objects.create(name="Кино", user=User.objects.create_user("owner"))
+        deal = Deal.objects.create(
+            title="Сеанс", merchant=merchant, price_original=100, price_discount=50,
+            expires_at=timezone.now() - timezone.timedelta(days=1),
+        )
+        expiry.sweep()
+        later = (timezone.now() + timezone.timedelta(days=10)).isoformat()
+        self.assertEqual(apply_updates([{"id": deal.pk, "expires_at": later}])[0]["changed"], ["expires_at", "is_archived"])
+        self.assertEqual(list(Deal.objects.active()), [deal])
+
+        Deal.objects.filter(pk=deal.pk).update(is_archived=True)
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        url = reverse("discounts:update_all", args=[deal.pk])
+        self.client.post(url, data=json.dumps({"expires_at": later}), content_type="application/json")
+        deal.refresh_from_db()
+        self.assertFalse(deal.is_archived)
+
+        Deal.objects.filter(pk=deal.pk).update(is_archived=True, expires_at=timezone.now() - timezone.timedelta(days=1))
+        deal.refresh_from_db()
+        request = RequestFactory().post("/")
+        request.user = User.objects.create_superuser("root", "root@example.com", "x")
+        model_admin = site._registry[Deal]
+        data = {
+            "title": deal.title, "merchant": merchant.pk, "price_original": "100", "price_discount": "50",
+            "expires_at_0": "2099-01-01", "expires_at_1": "00:00", "is_archived": "on",
+        }
+        form = model_admin.get_form(request, deal)(data, instance=deal)
+        self.assertTrue(form.is_valid(), form.errors)
+        model_admin.save_model(request, form.save(commit=False), form, change=True)
+        deal.refresh_from_db()
+        self.assertFalse(deal.is_archived)
+
+
+class BatchUpdateTests(TestCase):
+    def test_failed_duplicate_does_not_leak_into_saved_deal(self):
+        merchant = Merchant.objects.create(name="Аптека", user=User.objects.create_user("owner"))
+        deal = Deal.objects.create(title="Витамины", merchant=merchant, price_original=100, price_discount=50)
+        results = apply_updates([
+            {"id": deal.pk, "title": "Витамин C"},
+            {"id": deal.pk, "title": "x" * 300, "description": "не сохранится"},
+            {"id": deal.pk, "title": None},
+            {"id": deal.pk, "price_discount": "40"},
+            {"id": deal.pk, "expires_at": 5},
+            {"id": deal.pk, "expires_at": ["2030-01-01"]},
+        ])
+        self.assertEqual([r["status"] for r in results], ["ok", "error", "error", "ok", "error", "error"])
+        deal.refresh_from_db()
+        self.assertEqual((deal.title, deal.description, deal.price_discount), ("Витамин C", None, 40))
+
+
+class DealImportViewTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=Path(media.name))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_non_utf8_feed_is_a_form_error_and_paths_stay_relative(self):
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        url = reverse("discounts:deal_import")
+        feed = BytesIO("merchant,title\nНет,Акция\n".encode("cp1251"))
+        feed.name = "feed.csv"
+        response = self.client.post(url, {"feed": feed})
+        self.assertContains(response, "UTF-8")
+        self.assertFalse(Deal.objects.exists())
+
+        feed = BytesIO("merchant,title\nНет,Акция\n".encode("utf-8"))
+        feed.name = "feed.csv"
+        response = self.client.post(url, {"feed": feed})
+        self.assertContains(response, "MEDIA/imports/")
+        self.assertNotContains(response, str(settings.MEDIA_ROOT))
+
+
+class DealImporterTests(TestCase):
+    def test_numeric_date_in_jsonl_is_a_bad_row(self):
+        Merchant.objects.create(name="Пекарня", user=User.objects.create_user("owner"))
+        feed = StringIO(
+            '{"merchant": "Пекарня", "external_id": "1", "title": "Хлеб", "price_original": 10, '
+            '"price_discount": 5, "expires_at": 1700000000}\n'
+            '{"merchant": "Пекарня", "external_id": "2", "title": "Батон", "price_original": 10, '
+            '"price_discount": 5, "expires_at": "2030-01-01"}\n'
+        )
+        errors = StringIO()
+        stats = importer.DealImporter(error_writer=csv.writer(errors)).run(importer.read_jsonl(feed))
+        self.assertEqual((stats["created"], stats["errors"]), (1, 1))
+        self.assertIn("expires_at", errors.getvalue())
+        self.assertEqual(list(Deal.objects.values_list("title", flat=True)), ["Батон"])
+
+
+class CouponExportTests(TestCase):
+    def test_since_includes_coupons_expired_by_the_sweeper(self):
+        merchant = Merchant.objects.create(name="Каток", user=User.objects.create_user("owner"))
+        deal = Deal.objects.create(title="Каток", merchant=merchant, price_original=100, price_discount=50)
+        coupons.issue(deal, 2)
+        Coupon.objects.update(issued_at=timezone.now() - timezone.timedelta(days=30))
+        since = timezone.now()
+        self.assertEqual(list(exports.coupon_rows(since=since)), [])
+
+        Deal.objects.filter(pk=deal.pk).update(expires_at=since)
+        expiry.sweep(now=since + timezone.timedelta(seconds=1))
+        self.assertEqual([row["status"] for row in exports.coupon_rows(since=since)], ["expired", "expired"])
+
+
+class ApiConditionalTests(TestCase):
+    def test_list_etag_follows_served_page_and_bad_ints_are_ignored(self):
+        merchant = Merchant.objects.create(name="Книги", user=User.objects.create_user("owner"))
+        deal = Deal.objects.create(title="Роман", merchant=merchant, price_original=100, price_discount=50)
+        url = reverse("discounts:api_deals")
+        first = self.client.get(url, {"limit": "1"})
+        self.assertEqual(self.client.get(url, {"limit": "1"}, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+
+        deal.title = "Повесть"
+        deal.save()
+        changed = self.client.get(url, {"limit": "1"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.json()["deals"][0]["title"], "Повесть")
+
+        for params in ({"limit": "²"}, {"category": "²"}, {"merchant": "²"}):
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+
+
+class ReadRoutingTests(TransactionTestCase):
+    """TestCase всегда внутри транзакции, поэтому чтение с replica проверяется здесь"""
+
+    databases = {"default", "replica"}
+
+    def test_reads_go_to_replica_except_inside_transactions(self):
+        merchant = Merchant.objects.create(name="Цветы", user=User.objects.create_user("owner"))
+        for in_transaction, expected in ((False, "replica"), (True, "default")):
+            with transaction.atomic() if in_transaction else nullcontext():
+                with CaptureQueriesContext(connections["default"]) as default, \
+                        CaptureQueriesContext(connections["replica"]) as replica:
+                    self.assertEqual(Merchant.objects.get(pk=merchant.pk).name, "Цветы")
+            used = {"default": len(default), "replica": len(replica)}
+            self.assertEqual(used, {expected: 1, ({"default", "replica"} - {expected}).pop(): 0})
+
+
+class MinifyCssTests(TestCase):
+    def test_keeps_strings_and_descendant_pseudo_classes(self):
+        css = 'a :hover , b > c { color : red ; content: "a : b ;}" ; }\n@media (max-width: 600px) { .x :focus { margin : 0 auto ; } }'
+        self.assertEqual(
+            assets.minify_css(css),
+            'a :hover,b>c{color:red;content:"a : b ;}"}@media (max-width: 600px){.x :focus{margin:0 auto}}\n',
+        )
+
+
+class AsyncViewsTests(TransactionTestCase):
+    """in_thread читает FTS из других потоков, а они не видят транзакцию TestCase"""
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("fan")
+        merchant = Merchant.objects.create(name="Кофейня", user=self.user)
+        self.deal = Deal.objects.create(title="Кофе в зёрнах", merchant=merchant, price_original=100, price_discount=50)
+        self.deal.favorited_by.add(self.user)
+        # Сброс таблиц между тестами не трогает FTS-индекс
+        search.rebuild()
+
+    async def check_pages(self, client):
+        response = await client.get(reverse("discounts:home_async"))
+        self.assertContains(response, "Кофе в зёрнах")
+        response = await client.get(reverse("discounts:search_async"), {"q": "кофе"})
+        self.assertEqual((response.context["deals_count"], response.context["merchants_count"]), (1, 1))
+        self.assertEqual(response.context["deals"], [self.deal])
+        response = await client.get(reverse("discounts:deal_detail_async", args=[self.deal.pk]))
+        self.assertContains(response, "Кофе в зёрнах")
+        response = await client.get(reverse("discounts:deal_detail_async", args=[self.deal.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+        return await client.get(reverse("discounts:search_async"), {"q": "кофе", "format": "json"})
+
+    async def test_anonymous(self):
+        response = await self.check_pages(AsyncClient())
+        self.assertFalse(response.json()["deals"][0]["is_favorite"])
+
+    async def test_logged_in(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await self.check_pages(client)
+        self.assertTrue(response.json()["deals"][0]["is_favorite"])
@@ -6,6 +6,7 @@ app_name = "discounts"
 urlpatterns = [
     path("", views.home, name="home"),
     path("search/", views.search, name="search"),
+    path("search/suggest/", views.suggestions, name="suggest"),
     path("category/<int:pk>/", views.category, name="category"),
     path("deal/<int:pk>/", views.deal_detail, name="deal_detail"),
     path("deal/<int:pk>/favorite/", views.toggle_favorite, name="toggle_favorite"),
@@ -15,4 +16,15 @@ urlpatterns = [
     path("deal/<int:pk>/delete/", views.deal_delete, name="deal_delete"),
     path("deal/create/", views.deal_create, name="deal_create"),
     path("deal/<int:pk>/update_all/", views.update_all, name="update_all"),
+    path("deals/update_batch/", views.update_batch, name="update_batch"),
+    path("deals/import/", views.deal_import, name="deal_import"),
+    path("export/<str:kind>/", views.export, name="export"),
+    path("deal/<int:pk>/coupon/", views.coupon_claim, name="coupon_claim"),
+    path("coupons/redeem/", views.coupon_redeem, name="coupon_redeem"),
+    path("merchant/<int:pk>/stats/", views.merchant_dashboard, name="merchant_dashboard"),
+    path("async/", views.home_async, name="home_async"),
+    path("async/search/", views.search_async, name="search_async"),
+    path("async/deal/<int:pk>/", views.deal_detail_async, name="deal_detail_async"),
+    path("api/deals/", views.api_deals, name="api_deals"),
+    path("api/deals/<int:pk>/", views.api_deal, name="api_deal"),
 ]
\ No newline at end of file
@@ -1,73 +1,116 @@
+import asyncio
+
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.utils import timezone
-from django.db.models import Count, Q
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login as auth_login
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+import codecs
+import csv
+import io
 import json
+from urllib.parse import urlencode
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import user_passes_test
-from decimal import Decimal
+from django.views.decorators.http import condition, require_GET, require_POST
 
 from .models import Deal, Category, Merchant
 from .forms import DealForm
+from . import api, coupons, expiry, exports, importer, rollups, similar, suggest
+from .batch import apply_updates, parse_expires, safe_decimal
+from . import search as search_index
+from .aio import alist, in_thread
+from .caching import DEAL_PAGE_TIMEOUT, ahome_blocks, deal_page_key, deal_version, home_blocks
+from .favorites import afavorite_ids, ais_favorite, favorite_ids, is_favorite
+from .pagination import PAGE_SIZE, paginate_by_created, paginate_ranked
 
 
 def home(request):
     """Главная страница с блоками акций"""
-    top_deals = sorted(
-        Deal.objects.all(),
-        key=lambda d: d.discount_percent(),
-        reverse=True
-    )[:8]
+    return render(request, "home.html", home_blocks())
 
-    ending_soon = Deal.objects.filter(
-        expires_at__gt=timezone.now()
-    ).order_by("expires_at")[:5]
 
-    cat_stats = Category.objects.annotate(
-        active_count=Count("dealcategory")
-    ).order_by("-active_count")[:4]
+# Больше этого числа совпадений не считаем, в шаблоне будет «1000+»
+SEARCH_COUNT_LIMIT = 1000
+# Сколько магазинов и категорий показывать в выдаче поиска
+SEARCH_SIDE_LIMIT = 20
+
+
+def _deal_json(deal, fav_ids=frozenset()):
+    return {
+        "id": deal.pk,
+        "title": deal.title,
+        "merchant": deal.merchant.name,
+        "price_original": str(deal.price_original),
+        "price_discount": str(deal.price_discount),
+        "discount_pct": deal.discount_pct,
+        "expires_at": deal.expires_at.isoformat() if deal.expires_at else None,
+        "image_url": deal.image_url,
+        "favorites_count": deal.favorites_count,
+        "is_favorite": deal.pk in fav_ids,
+        "url": reverse("discounts:deal_detail", args=[deal.pk]),
+    }
+
+
+def _wants_json(request):
+    return request.GET.get("format") == "json"
 
-    return render(request, "home.html", {
-        "top_deals": top_deals,
-        "ending_soon": ending_soon,
-        "cat_stats": cat_stats,
-    })
+
+def _int_param(value, default=None):
+    """Целое из параметра запроса; default, если это не число.
+
+    Не str.isdigit(): она пропускает символы вроде «²», на которых int() падает.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
 
 
 def search(request):
     """Поиск акций, магазинов и категорий"""
     q = request.GET.get("q", "").strip()
-    deals = Deal.objects.none()
-    merchants = Merchant.objects.none()
-    categories = Category.objects.none()
+    deals = merchants = categories = []
+    next_cursor = None
 
     deals_count = merchants_count = categories_count = 0
 
     if q:
-        deals = (
-            Deal.objects.select_related("merchant")
-            .prefetch_related("categories")
-            .filter(
-                Q(title__contains=q)
-                | Q(description__contains=q)
-                | Q(merchant__name__contains=q)
-                | Q(categories__name__contains=q)
+        deals_count = search_index.count(q, search_index.KIND_DEAL, SEARCH_COUNT_LIMIT + 1)
+        merchants_count = search_index.count(q, search_index.KIND_MERCHANT, SEARCH_COUNT_LIMIT + 1)
+        categories_count = search_index.count(q, search_index.KIND_CATEGORY, SEARCH_COUNT_LIMIT + 1)
+
+        if deals_count:
+            deal_ids, next_cursor = paginate_ranked(
+                lambda limit, after: search_index.search(q, search_index.KIND_DEAL, limit, after),
+                request.GET.get("cursor"),
             )
-            .distinct()
-            .order_by("-created_at")
-        )
-        
-        merchants = Merchant.objects.filter(
-            Q(name__contains=q) | Q(contact__contains=q)
-        ).order_by("name")
-        categories = Category.objects.filter(name__contains=q).order_by("name")
+            deals = _in_order(
+                Deal.objects.select_related("merchant").prefetch_related("categories"),
+                deal_ids,
+            )
+        if merchants_count:
+            hits = search_index.search(q, search_index.KIND_MERCHANT, SEARCH_SIDE_LIMIT)
+            merchants = _in_order(Merchant.objects.all(), [pk for pk, _ in hits])
+        if categories_count:
+            hits = search_index.search(q, search_index.KIND_CATEGORY, SEARCH_SIDE_LIMIT)
+            categories = _in_order(Category.objects.all(), [pk for pk, _ in hits])
 
-        deals_count = deals.count()
-        merchants_count = merchants.count()
-        categories_count = categories.count()
+    fav_ids = favorite_ids(request.user, deals)
+
+    if _wants_json(request):
+        return JsonResponse({
+            "q": q,
+            "deals": [_deal_json(d, fav_ids) for d in deals],
+            "next": next_cursor,
+        })
 
     total_count = deals_count + merchants_count + categories_count
 
@@ -83,51 +126,222 @@ def search(request):
             "merchants_count": merchants_count,
             "categories_count": categories_count,
             "total_count": total_count,
+            "count_limit": SEARCH_COUNT_LIMIT,
+            "next_cursor": next_cursor,
+            "fav_ids": fav_ids,
         },
     )
 
 
+# Больше стольких подсказок за раз не отдаём
+SUGGEST_LIMIT_MAX = 20
+
+
+def _suggestion_url(item):
+    if item.kind == suggest.KIND_DEAL:
+        return reverse("discounts:deal_detail", args=[item.pk])
+    if item.kind == suggest.KIND_CATEGORY:
+        return reverse("discounts:category", args=[item.pk])
+    return f"{reverse('discounts:search')}?{urlencode({'q': item.label})}"
+
+
+@require_GET
+def suggestions(request):
+    """Подсказки для строки поиска из индекса в памяти, без запросов к БД"""
+    q = request.GET.get("q", "")
+    limit = _int_param(request.GET.get("limit"), 0)
+    limit = min(limit, SUGGEST_LIMIT_MAX) if limit > 0 else suggest.LIMIT
+    return JsonResponse({
+        "q": q,
+        "suggestions": [
+            {"kind": item.kind, "id": item.pk, "label": item.label, "url": _suggestion_url(item)}
+            for item in suggest.suggest(q, limit)
+        ],
+    })
+
+
+def _in_order(queryset, ids):
+    """Объекты queryset в порядке ids (порядок релевантности из индекса)"""
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
+
+
 def category(request, pk):
     """Страница категории с акциями"""
     category = get_object_or_404(Category, pk=pk)
-    deals = Deal.objects.filter(categories=category)
+    deals, next_cursor = paginate_by_created(
+        Deal.objects.active().in_category(category).select_related("merchant"),
+        request.GET.get("cursor"),
+    )
+    fav_ids = favorite_ids(request.user, deals)
+    if _wants_json(request):
+        return JsonResponse({
+            "category": {"id": category.pk, "name": category.name},
+            "deals": [_deal_json(d, fav_ids) for d in deals],
+            "next": next_cursor,
+        })
     return render(request, "category.html", {
         "category": category,
         "deals": deals,
+        "next_cursor": next_cursor,
+        "fav_ids": fav_ids,
     })
 
 
+def _deal_page(request, deal, is_fav, similar_deals, now):
+    """Страница акции с ETag/Last-Modified и кэшем по версии акции.
+
+    Анониму страница целиком отдаётся из кэша. Остальным из кэша берутся
+    фрагменты ({% cache %} в шаблоне), а кнопки избранного и администратора
+    рисуются заново. Last-Modified только у анонимов: избранное
+    пользователя не меняет updated_at, его учитывает только ETag.
+    """
+    version = deal_version(deal, now, similar_deals)
+    user = request.user
+    anonymous = not user.is_authenticated
+    etag = quote_etag(api.etag(version, user.pk, is_fav, user.is_staff, request.META.get("CSRF_COOKIE", "")))
+    last_modified = deal.updated_at.timestamp() if anonymous else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        key = deal_page_key(version) if anonymous and not request.GET else None
+        content = cache.get(key) if key else None
+        if content is None:
+            response = render(request, "deal_detail.html", {
+                "deal": deal,
+                "is_fav": is_fav,
+                "similar_deals": similar_deals,
+                "now": now,
+                "deal_version": version,
+                "deal_cache_timeout": DEAL_PAGE_TIMEOUT,
+            })
+            if key:
+                cache.set(key, response.content, DEAL_PAGE_TIMEOUT)
+        else:
+            response = HttpResponse(content)
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+    # Браузер хранит страницу, но каждый раз сверяет её по ETag
+    patch_cache_control(response, no_cache=True, private=not anonymous)
+    return response
+
+
 def deal_detail(request, pk):
     """Детальная страница акции"""
     deal = get_object_or_404(Deal, pk=pk)
-    is_fav = False
-    if request.user.is_authenticated:
-        is_fav = request.user in deal.favorited_by.all()
+    now = timezone.now()
+    similar_deals = list(similar.similar_deals(deal.pk, now)[:similar.TOP_K])
+    return _deal_page(request, deal, is_favorite(request.user, deal.pk), similar_deals, now)
 
-    return render(request, "deal_detail.html", {
-        "deal": deal,
-        "is_fav": is_fav,
-    })
 
+# Асинхронные варианты home, search и deal_detail для ASGI: независимые
+# запросы выполняются одновременно. Всё, что нужно шаблону, загружается
+# заранее — ленивые обращения к БД из async-кода запрещены.
 
-@login_required
-def toggle_favorite(request, pk):
-    """Добавить или убрать акцию из избранного"""
-    deal = get_object_or_404(Deal, pk=pk)
+async def _auser(request):
+    """Пользователь без синхронного обращения к сессии; его же видит шаблон"""
+    user = await request.auser()
+    request.user = user
+    return user
 
-    if request.user in deal.favorited_by.all():
-        deal.favorited_by.remove(request.user)
-    else:
-        deal.favorited_by.add(request.user)
 
-    return redirect("discounts:deal_detail", pk=deal.pk)
+async def home_async(request):
+    await _auser(request)
+    return render(request, "home.html", await ahome_blocks())
+
+
+async def search_async(request):
+    user = await _auser(request)
+    q = request.GET.get("q", "").strip()
+    deals = merchants = categories = []
+    next_cursor = None
+    counts = [0, 0, 0]
+    kinds = (search_index.KIND_DEAL, search_index.KIND_MERCHANT, search_index.KIND_CATEGORY)
+    deal_ids = []
+
+    if q:
+        page = in_thread(
+            paginate_ranked,
+            lambda limit, after: search_index.search(q, search_index.KIND_DEAL, limit, after),
+            request.GET.get("cursor"),
+        )
+        side = [in_thread(search_index.search, q, kind, SEARCH_SIDE_LIMIT) for kind in kinds[1:]]
+        results = await asyncio.gather(
+            *(in_thread(search_index.count, q, kind, SEARCH_COUNT_LIMIT + 1) for kind in kinds), page, *side
+        )
+        counts = results[:3]
+        (deal_ids, next_cursor), merchant_hits, category_hits = results[3:]
+
+        deals, merchants, categories = await asyncio.gather(
+            Deal.objects.select_related("merchant").prefetch_related("categories").ain_bulk(deal_ids),
+            Merchant.objects.ain_bulk([pk for pk, _ in merchant_hits]),
+            Category.objects.ain_bulk([pk for pk, _ in category_hits]),
+        )
+        deals = [deals[pk] for pk in deal_ids if pk in deals]
+        merchants = [merchants[pk] for pk, _ in merchant_hits if pk in merchants]
+        categories = [categories[pk] for pk, _ in category_hits if pk in categories]
+
+    fav_ids = await afavorite_ids(user, deal_ids)
+    deals_count, merchants_count, categories_count = counts
+
+    if _wants_json(request):
+        return JsonResponse({
+            "q": q,
+            "deals": [_deal_json(d, fav_ids) for d in deals],
+            "next": next_cursor,
+        })
+
+    return render(
+        request,
+        "search.html",
+        {
+            "q": q,
+            "deals": deals,
+            "merchants": merchants,
+            "categories": categories,
+            "deals_count": deals_count,
+            "merchants_count": merchants_count,
+            "categories_count": categories_count,
+            "total_count": deals_count + merchants_count + categories_count,
+            "count_limit": SEARCH_COUNT_LIMIT,
+            "next_cursor": next_cursor,
+            "fav_ids": fav_ids,
+        },
+    )
+
+
+async def deal_detail_async(request, pk):
+    user = await _auser(request)
+    try:
+        now = timezone.now()
+        deal, is_fav, similar_deals = await asyncio.gather(
+            Deal.objects.aget(pk=pk), ais_favorite(user, pk), alist(similar.similar_deals(pk, now)[:similar.TOP_K]),
+        )
+    except Deal.DoesNotExist:
+        raise Http404("Акция не найдена")
+    # Без обращений к БД: всё нужное уже загружено
+    return _deal_page(request, deal, is_fav, similar_deals, now)
 
 
 @login_required
 def my_favorites(request):
     """Список избранных акций"""
-    favorites = Deal.objects.filter(favorited_by=request.user)
-    return render(request, "favorites.html", {"favorites": favorites})
+    favorites, next_cursor = paginate_by_created(
+        Deal.objects.filter(favorited_by=request.user).select_related("merchant"),
+        request.GET.get("cursor"),
+    )
+    if _wants_json(request):
+        # Все акции этой страницы — избранные
+        ids = {deal.pk for deal in favorites}
+        return JsonResponse({
+            "deals": [_deal_json(deal, ids) for deal in favorites],
+            "next": next_cursor,
+        })
+    return render(request, "favorites.html", {
+        "favorites": favorites,
+        "next_cursor": next_cursor,
+    })
 
 
 def signup(request):
@@ -205,18 +419,13 @@ def update_all(request, pk):
 
             deal.title = data.get('title', deal.title)
 
-            def safe_decimal(value, default):
-                try:
-                    return Decimal(str(value)) if str(value).strip() != "" else default
-                except Exception:
-                    return default
-
             deal.price_original = safe_decimal(data.get('price_original'), deal.price_original)
             deal.price_discount = safe_decimal(data.get('price_discount'), deal.price_discount)
 
             expires = data.get('expires_at')
             if expires:
-                deal.expires_at = expires
+                deal.expires_at = parse_expires(expires)
+                expiry.reopen(deal)
 
             deal.image_url = data.get('image_url', deal.image_url)
             deal.description = data.get('description', deal.description)
@@ -230,7 +439,180 @@ def update_all(request, pk):
 
     return JsonResponse({'status': 'error'}, status=405)
 
-from django.http import JsonResponse
+
+# Ограничение размера одной пачки update_batch
+BATCH_LIMIT = 1000
+
+
+@user_passes_test(lambda u: u.is_staff)
+@csrf_exempt
+def update_batch(request):
+    """AJAX-обновление сразу многих акций: JSON-массив частичных изменений с полем id"""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error'}, status=405)
+    try:
+        items = json.loads(request.body)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    if not isinstance(items, list):
+        return JsonResponse({'status': 'error', 'message': 'Ожидается JSON-массив'}, status=400)
+    if len(items) > BATCH_LIMIT:
+        return JsonResponse(
+            {'status': 'error', 'message': f'Не больше {BATCH_LIMIT} акций за раз'}, status=400
+        )
+    return JsonResponse({'status': 'ok', 'results': apply_updates(items)})
+
+
+# Сколько ошибок импорта показать на странице; полный список — в файле
+IMPORT_ERRORS_SHOWN = 50
+
+
+def _is_utf8(upload):
+    """Проверяет кодировку загруженного файла потоком, не читая его в память целиком"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        for chunk in upload.chunks():
+            decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    finally:
+        upload.seek(0)
+    return True
+
+
+@user_passes_test(lambda u: u.is_staff)
+def deal_import(request):
+    """Загрузка фида акций (CSV/JSONL) через сайт"""
+    context = {}
+    if request.method == "POST" and request.FILES.get("feed"):
+        upload = request.FILES["feed"]
+        # Проверяем до импорта: ошибка посреди потока оставила бы фид загруженным наполовину
+        if not _is_utf8(upload):
+            return render(request, "deal_import.html", {"upload_error": "Файл должен быть в кодировке UTF-8"})
+        errors_dir = settings.MEDIA_ROOT / "imports"
+        errors_dir.mkdir(parents=True, exist_ok=True)
+        errors_path = errors_dir / f"{timezone.now():%Y%m%d-%H%M%S}-{upload.name}.errors.csv"
+
+        # Файл читается потоком, а не целиком в память
+        src = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+        rows = importer.read_jsonl(src) if upload.name.endswith((".jsonl", ".ndjson")) else importer.read_csv(src)
+        with open(errors_path, "w", encoding="utf-8", newline="") as err:
+            writer = csv.writer(err)
+            writer.writerow(["line", "error", "row"])
+            stats = importer.DealImporter(error_writer=writer).run(rows)
+
+        errors = []
+        if stats["errors"]:
+            with open(errors_path, encoding="utf-8", newline="") as err:
+                reader = csv.reader(err)
+                next(reader)
+                for line, message, _ in reader:
+                    errors.append((line, message))
+                    if len(errors) >= IMPORT_ERRORS_SHOWN:
+                        break
+        else:
+            errors_path.unlink()
+        # Путь на сервере не показываем, только имя внутри MEDIA_ROOT
+        errors_name = errors_path.relative_to(settings.MEDIA_ROOT).as_posix()
+        context = {"stats": stats, "errors": errors, "errors_name": errors_name}
+
+    return render(request, "deal_import.html", context)
+
+
+@user_passes_test(lambda u: u.is_staff)
+def export(request, kind):
+    """Потоковая выгрузка акций или купонов: ?format=csv|jsonl&since=<дата или ISO>"""
+    if kind not in exports.EXPORTS:
+        return JsonResponse({"status": "error", "message": "Неизвестная выгрузка"}, status=404)
+    fmt = request.GET.get("format", "csv")
+    if fmt not in ("csv", "jsonl"):
+        return JsonResponse({"status": "error", "message": "Формат: csv или jsonl"}, status=400)
+    try:
+        since = parse_expires(request.GET["since"]) if request.GET.get("since") else None
+    except ValidationError:
+        return JsonResponse({"status": "error", "message": "Некорректный since"}, status=400)
+
+    rows_for, columns = exports.EXPORTS[kind]
+    rows = rows_for(since=since)
+    if fmt == "jsonl":
+        response = StreamingHttpResponse(exports.as_jsonl(rows), content_type="application/x-ndjson; charset=utf-8")
+    else:
+        response = StreamingHttpResponse(exports.as_csv(rows, columns), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{kind}-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"'
+    return response
+
+
+@login_required
+@require_POST
+def coupon_claim(request, pk):
+    """Выдать пользователю купон акции"""
+    deal = get_object_or_404(Deal, pk=pk)
+    coupon = coupons.assign(deal, request.user)
+    if coupon is None:
+        return JsonResponse({"status": "error", "message": "Купоны закончились"}, status=409)
+    return JsonResponse({"status": "ok", "code": coupon.code})
+
+
+@user_passes_test(lambda u: u.is_staff)
+@require_POST
+def coupon_redeem(request):
+    """Погасить купон по коду (для кассы партнёра)"""
+    code = request.POST.get("code")
+    if code is None:
+        try:
+            code = json.loads(request.body).get("code")
+        except (ValueError, AttributeError):
+            code = None
+    if not code or not isinstance(code, str):
+        return JsonResponse({"status": "error", "message": "Не указан код"}, status=400)
+    if not coupons.redeem(code.strip().upper()):
+        return JsonResponse(
+            {"status": "error", "message": "Купон не найден или уже использован"}, status=409
+        )
+    return JsonResponse({"status": "redeemed"})
+
+
+@login_required
+def merchant_dashboard(request, pk):
+    """Статистика партнёра по дням из MerchantDailyStats: владельцу и персоналу"""
+    merchant = get_object_or_404(Merchant, pk=pk)
+    if merchant.user_id != request.user.pk and not request.user.is_staff:
+        raise Http404("Партнёр не найден")
+    try:
+        days = min(max(int(request.GET.get("days", rollups.DASHBOARD_DAYS)), 1), rollups.MAX_DAYS)
+    except ValueError:
+        days = rollups.DASHBOARD_DAYS
+    rows, totals = rollups.dashboard(merchant, days)
+    updated_until = rollups.updated_until()
+
+    if _wants_json(request):
+        return JsonResponse({
+            "merchant": merchant.pk,
+            "updated_until": updated_until and updated_until.isoformat(),
+            "totals": totals,
+            "days": [
+                {
+                    "day": row.day.isoformat(),
+                    "coupons_issued": row.coupons_issued,
+                    "coupons_redeemed": row.coupons_redeemed,
+                    "favorites": row.favorites,
+                    "favorites_added": row.favorites_added,
+                }
+                for row in rows
+            ],
+        })
+
+    top_deals = Deal.objects.filter(merchant=merchant).order_by("-favorites_count", "-pk")[:10]
+    return render(request, "merchant_dashboard.html", {
+        "merchant": merchant,
+        "rows": rows,
+        "totals": totals,
+        "days": days,
+        "updated_until": updated_until,
+        "top_deals": top_deals,
+    })
+
 
 @login_required
 def toggle_favorite(request, pk):
@@ -238,7 +620,7 @@ def toggle_favorite(request, pk):
     deal = get_object_or_404(Deal, pk=pk)
 
     if request.method in ["POST", "GET"]:
-        if request.user in deal.favorited_by.all():
+        if is_favorite(request.user, deal.pk):
             deal.favorited_by.remove(request.user)
             result = {"status": "removed"}
         else:
@@ -251,4 +633,92 @@ def toggle_favorite(request, pk):
         referer = request.META.get("HTTP_REFERER")
         if referer:
             return redirect(referer)
-        return redirect("discounts:home")
\ No newline at end of file
+        return redirect("discounts:home")
+
+# Максимальный размер страницы API
+API_PAGE_LIMIT = 100
+
+
+def _api_deals_queryset(request):
+    deals = Deal.objects.all()
+    if request.GET.get("archived") != "1":
+        deals = deals.filter(is_archived=False)
+    for param, lookup in (("category", "categories"), ("merchant", "merchant_id")):
+        value = request.GET.get(param, "")
+        if value:
+            deals = deals.filter(**{lookup: _int_param(value, 0)})
+    return deals
+
+
+def _api_page(request):
+    """Страница ключей списка API (id, created_at, updated_at) и курсор следующей.
+
+    Выбирается один раз на запрос: по ней считается ETag, и её же отдаёт api_deals.
+    """
+    if not hasattr(request, "_api_page"):
+        limit = _int_param(request.GET.get("limit"), 0)
+        limit = min(limit, API_PAGE_LIMIT) if limit > 0 else PAGE_SIZE
+        request._api_page = paginate_by_created(
+            _api_deals_queryset(request).values("id", "created_at", "updated_at"), request.GET.get("cursor"), limit,
+        )
+    return request._api_page
+
+
+def _api_state(request, pk=None):
+    """(ETag, Last-Modified) ответа API; None, если отвечать нечем (400/404).
+
+    Считается один раз на запрос: его используют и etag_func, и last_modified_func.
+    """
+    if not hasattr(request, "_api_state"):
+        request._api_state = (None, None)
+        fields = api.parse_fields(request.GET.get("fields"), api.DETAIL_FIELDS if pk else api.LIST_FIELDS)
+        if fields is None:
+            return request._api_state
+        if pk is None:
+            # Только отданная страница: состав, время изменения её акций и курсор дальше
+            page, next_cursor = _api_page(request)
+            last = max((row["updated_at"] for row in page), default=None)
+            key = [",".join(str(row["id"]) for row in page), next_cursor]
+            key += [request.GET.get(p, "") for p in ("archived", "category", "merchant", "cursor", "limit")]
+        else:
+            last = Deal.objects.filter(pk=pk).values_list("updated_at", flat=True).first()
+            key = []
+            if last is None:
+                return request._api_state
+        request._api_state = (api.etag(pk, last, *fields, *key), last)
+    return request._api_state
+
+
+@require_GET
+@condition(
+    etag_func=lambda request: _api_state(request)[0],
+    last_modified_func=lambda request: _api_state(request)[1],
+)
+def api_deals(request):
+    """JSON-список акций: ?fields=&category=&merchant=&archived=1&cursor=&limit="""
+    fields = api.parse_fields(request.GET.get("fields"), api.LIST_FIELDS)
+    if fields is None:
+        return JsonResponse(
+            {"status": "error", "message": f"Доступные поля: {', '.join(api.FIELDS)}"}, status=400
+        )
+    page, next_cursor = _api_page(request)
+    deals = Deal.objects.filter(pk__in=[row["id"] for row in page]).order_by("-created_at", "-id")
+    return JsonResponse({"deals": api.serialize(deals, fields), "next": next_cursor})
+
+
+@require_GET
+@condition(
+    etag_func=lambda request, pk: _api_state(request, pk)[0],
+    last_modified_func=lambda request, pk: _api_state(request, pk)[1],
+)
+def api_deal(request, pk):
+    """JSON одной акции: ?fields="""
+    fields = api.parse_fields(request.GET.get("fields"), api.DETAIL_FIELDS)
+    if fields is None:
+        return JsonResponse(
+            {"status": "error", "message": f"Доступные поля: {', '.join(api.FIELDS)}"}, status=400
+        )
+    deals = api.serialize(Deal.objects.filter(pk=pk), fields)
+    if not deals:
+        return JsonResponse({"status": "error", "message": "Акция не найдена"}, status=404)
+    return JsonResponse(deals[0])
@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'discounts_site.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
+
+# Индекс подсказок поиска строится до первого запроса
+from discounts import suggest  # noqa: E402
+
+suggest.warm()
\ No newline at end of file
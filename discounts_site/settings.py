@@ -18,6 +18,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'discounts.instrumentation.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -31,7 +32,8 @@ ROOT_URLCONF = 'discounts_site.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Тот же DjangoTemplates, но с замером времени рендеринга
+        'BACKEND': 'discounts.instrumentation.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -47,10 +49,38 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'discounts_site.wsgi.application'
 
+# PRAGMA (WAL, busy_timeout и др.) ставит discounts.db на каждое соединение.
+# Соединения живут между запросами; IMMEDIATE сразу берёт блокировку записи,
+# поэтому транзакция ждёт busy_timeout, а не падает с «database is locked»
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+        },
+    },
+    # Тот же файл, но соединение только для чтения (PRAGMA query_only)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_READ_ALIAS = 'replica'
+DATABASE_ROUTERS = ['discounts.db.ReadWriteRouter']
+
+# Для нескольких процессов на одной машине можно взять
+# django.core.cache.backends.filebased.FileBasedCache с LOCATION
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'discounts',
     }
 }
 
@@ -68,6 +98,29 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+# collectstatic собирает сюда бандлы с хэшами и их .gz/.br копии (discounts.assets).
+# Веб-сервер отдаёт /static/ отсюда с gzip_static/brotli_static и
+# Cache-Control: max-age=31536000, immutable
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'discounts.assets.BundleManifestStorage'},
+}
+
+# Бандлы для {% bundle %}: имя → исходные файлы в порядке подключения
+ASSET_BUNDLES = {
+    'base.css': ['css/main.css'],
+    'home.css': ['css/main.css', 'css/home.css'],
+    'search.css': ['css/main.css', 'css/search.css'],
+    'category.css': ['css/main.css', 'css/category.css'],
+    'deal.css': ['css/main.css', 'css/deal.css'],
+    'deal_edit.css': ['css/main.css', 'css/deal_edit.css'],
+    'favorites.css': ['css/main.css', 'css/favorites.css'],
+    'base.js': ['js/suggest.js'],
+    'deal.js': ['js/edit_deal.js'],
+    'favorites.js': ['js/favorites.js'],
+}
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -75,4 +128,35 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_REDIRECT_URL = reverse_lazy("discounts:home")
-LOGOUT_REDIRECT_URL = reverse_lazy("discounts:home")
\ No newline at end of file
+LOGOUT_REDIRECT_URL = reverse_lazy("discounts:home")
+
+# Замер запросов (discounts.instrumentation): доля замеряемых запросов
+# и порог, начиная с которого запрос пишется в лог медленных
+TIMING_SAMPLE_RATE = 1.0 if DEBUG else 0.05
+TIMING_SLOW_MS = 500
+
+LOG_DIR = BASE_DIR / 'logs'
+LOG_DIR.mkdir(exist_ok=True)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'raw': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_requests': {
+            'class': 'logging.FileHandler',
+            'filename': LOG_DIR / 'slow_requests.jsonl',
+            'formatter': 'raw',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'discounts.slow_requests': {
+            'handlers': ['slow_requests'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
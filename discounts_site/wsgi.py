@@ -13,4 +13,9 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'discounts_site.settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Индекс подсказок поиска строится до первого запроса
+from discounts import suggest  # noqa: E402
+
+suggest.warm()
\ No newline at end of file
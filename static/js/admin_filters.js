@@ -0,0 +1,17 @@
+// Фильтры AutocompleteFilter: выбор в поле перезагружает список с новым параметром
+"use strict";
+{
+  const $ = django.jQuery;
+  $(function() {
+    $("select[data-autocomplete-filter]").on("change", function() {
+      const url = new URL(window.location.href);
+      if (this.value) {
+        url.searchParams.set(this.name, this.value);
+      } else {
+        url.searchParams.delete(this.name);
+      }
+      url.searchParams.delete("p");
+      window.location.href = url.toString();
+    });
+  });
+}
@@ -40,7 +40,11 @@ document.addEventListener("DOMContentLoaded", () => {
       document.getElementById("deal-new").textContent = data.price_discount + " ₽";
       document.getElementById("deal-expire").innerHTML =
         `<i class="fa fa-calendar"></i> Действует до ${data.expires_at.split("-").reverse().join(".")}`;
-      document.getElementById("deal-image").src = data.image_url;
+      const image = document.getElementById("deal-image");
+      // Миниатюры из srcset сделаны из старой картинки
+      image.closest("picture")?.querySelectorAll("source").forEach((source) => source.remove());
+      image.removeAttribute("srcset");
+      image.src = data.image_url;
       document.getElementById("description-text").textContent = data.description;
     } else {
       const errorData = await response.json();
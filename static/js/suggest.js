@@ -0,0 +1,56 @@
+// Подсказки в строке поиска: /search/suggest/ отвечает из индекса в памяти
+document.addEventListener("DOMContentLoaded", () => {
+  document.querySelectorAll("form[role=search] input[name=q][data-suggest-url]").forEach((input) => {
+    const form = input.form;
+    const list = document.createElement("ul");
+    list.className = "suggest-list";
+    list.hidden = true;
+    form.classList.add("has-suggest");
+    form.appendChild(list);
+    input.setAttribute("autocomplete", "off");
+
+    let timer = null;
+    let controller = null;
+
+    const close = () => {
+      list.hidden = true;
+      list.innerHTML = "";
+    };
+
+    input.addEventListener("input", () => {
+      clearTimeout(timer);
+      const q = input.value.trim();
+      if (!q) return close();
+      timer = setTimeout(async () => {
+        if (controller) controller.abort();
+        controller = new AbortController();
+        try {
+          const url = `${input.dataset.suggestUrl}?q=${encodeURIComponent(q)}`;
+          const response = await fetch(url, { signal: controller.signal });
+          if (!response.ok) return close();
+          const data = await response.json();
+          list.innerHTML = "";
+          data.suggestions.forEach((s) => {
+            const li = document.createElement("li");
+            const a = document.createElement("a");
+            a.href = s.url;
+            a.textContent = s.label;
+            a.className = `suggest-${s.kind}`;
+            li.appendChild(a);
+            list.appendChild(li);
+          });
+          list.hidden = !data.suggestions.length;
+        } catch (e) {
+          if (e.name !== "AbortError") close();
+        }
+      }, 120);
+    });
+
+    input.addEventListener("keydown", (e) => {
+      if (e.key === "Escape") close();
+    });
+    document.addEventListener("click", (e) => {
+      if (!form.contains(e.target)) close();
+    });
+  });
+});